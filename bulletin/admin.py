@@ -1,6 +1,174 @@
-from django.contrib import admin
+import datetime
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.utils.html import format_html
-from .models import Organization, Image, News, Event, Special, Promotion, Resource
+from .models import (
+    City,
+    Organization,
+    Image,
+    News,
+    Event,
+    Special,
+    Promotion,
+    Resource,
+    ArchivedEvent,
+    ArchivedSpecial,
+    ArchivedPromotion,
+    Subscriber,
+    EventFeed,
+)
+from .paginators import EstimatedCountPaginator
+
+
+class CityScopedAdmin(admin.ModelAdmin):
+    """Limit changelists and choices to the city being served and stamp new objects with it."""
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_city(request.city)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.related_model is Organization:
+            kwargs['queryset'] = Organization.objects.for_city(request.city)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.related_model is Organization:
+            kwargs['queryset'] = Organization.objects.for_city(request.city)
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+    def save_model(self, request, obj, form, change):
+        if obj.tenant_id is None:
+            obj.tenant = request.city
+        super().save_model(request, obj, form, change)
+
+
+class ScalableAdmin(CityScopedAdmin):
+    """
+    Changelists and change forms that stay fast with very large tables.
+
+    With ``ADMIN_SCALABLE_MODE`` on, relations listed in
+    ``scalable_autocomplete_fields`` use search-as-you-type widgets instead of
+    rendering every row into a ``<select>``, changelists avoid full
+    ``COUNT(*)`` queries, and the ``organization`` list filter (which lists
+    every organization) is replaced by searching on its name.
+    """
+
+    scalable_autocomplete_fields = ()
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_autocomplete_fields(self, request):
+        if settings.ADMIN_SCALABLE_MODE:
+            return self.scalable_autocomplete_fields
+        return super().get_autocomplete_fields(request)
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if settings.ADMIN_SCALABLE_MODE:
+            return tuple(f for f in list_filter if f != 'organization')
+        return list_filter
+
+
+class BulkActionForm(ActionForm):
+    days = forms.IntegerField(
+        required=False,
+        label="Days",
+        help_text="For shifting or extending dates",
+        widget=forms.NumberInput(attrs={'style': 'width: 5em'}),
+    )
+
+
+class BulkContentActions:
+    """
+    Changelist actions that edit every selected row with one query (see
+    bulletin.bulk). Admins list the ones that apply in ``actions`` and name
+    the fields they work on.
+
+    Every manage.py command loads this module (admin autodiscovery), so
+    ``bulk`` is imported by the actions that use it.
+    """
+
+    action_form = BulkActionForm
+    # Shifted together by "Shift dates"; the first one anchors clones
+    bulk_date_fields = ()
+    # Pushed back by "Extend"
+    bulk_end_field = None
+
+    def _report(self, request, verb, count):
+        opts = self.model._meta
+        noun = opts.verbose_name if count == 1 else opts.verbose_name_plural
+        self.message_user(request, f"{verb} {count} {noun}.", messages.SUCCESS)
+
+    def _days(self, request):
+        try:
+            days = int(request.POST.get('days', ''))
+        except ValueError:
+            days = 0
+        if not days:
+            self.message_user(request, "Enter a number of days next to the action.", messages.ERROR)
+        return days
+
+    @admin.action(description="Publish selected %(verbose_name_plural)s", permissions=['change'])
+    def publish(self, request, queryset):
+        from . import bulk
+
+        self._report(request, "Published", bulk.update_content(queryset, is_published=True))
+
+    @admin.action(description="Unpublish selected %(verbose_name_plural)s", permissions=['change'])
+    def unpublish(self, request, queryset):
+        from . import bulk
+
+        self._report(request, "Unpublished", bulk.update_content(queryset, is_published=False))
+
+    @admin.action(
+        description="Shift dates of selected %(verbose_name_plural)s by N days",
+        permissions=['change'],
+    )
+    def shift_dates(self, request, queryset):
+        from . import bulk
+
+        days = self._days(request)
+        if days:
+            self._report(
+                request, "Rescheduled", bulk.shift_dates(queryset, self.bulk_date_fields, days)
+            )
+
+    @admin.action(
+        description="Extend selected %(verbose_name_plural)s by N days", permissions=['change']
+    )
+    def extend(self, request, queryset):
+        from . import bulk
+
+        days = self._days(request)
+        if days:
+            # Open-ended rows have nothing to extend
+            queryset = queryset.exclude(**{f'{self.bulk_end_field}__isnull': True})
+            self._report(
+                request, "Extended", bulk.shift_dates(queryset, [self.bulk_end_field], days)
+            )
+
+    @admin.action(
+        description="Clone selected %(verbose_name_plural)s to next week", permissions=['add']
+    )
+    def clone_next_week(self, request, queryset):
+        from . import bulk
+
+        clones = bulk.clone_content(queryset, self.bulk_date_fields, datetime.timedelta(weeks=1))
+        self._report(request, "Created", len(clones))
+
+    @admin.action(
+        description="Clone selected %(verbose_name_plural)s to next month", permissions=['add']
+    )
+    def clone_next_month(self, request, queryset):
+        from dateutil.relativedelta import relativedelta
+
+        from . import bulk
+
+        clones = bulk.clone_content(queryset, self.bulk_date_fields, relativedelta(months=1))
+        self._report(request, "Created", len(clones))
 
 
 class ImageInline(admin.TabularInline):
@@ -45,12 +213,47 @@ class ResourceImageInline(admin.TabularInline):
     verbose_name_plural = "Images"
 
 
+class EventFeedInline(admin.TabularInline):
+    model = EventFeed
+    extra = 0
+    fields = (
+        'url',
+        'format',
+        'is_active',
+        'publish_events',
+        'last_status',
+        'last_checked_at',
+        'last_duration_ms',
+        'last_event_count',
+        'last_error',
+    )
+    readonly_fields = (
+        'last_status',
+        'last_checked_at',
+        'last_duration_ms',
+        'last_event_count',
+        'last_error',
+    )
+    verbose_name = "Event feed"
+    verbose_name_plural = "Event feeds (imported by import_feeds)"
+
+
+@admin.register(City)
+class CityAdmin(admin.ModelAdmin):
+    list_display = ('name', 'state', 'domain', 'timezone', 'is_default')
+    search_fields = ('name', 'domain')
+    prepopulated_fields = {'slug': ('name',)}
+
+
 @admin.register(Organization)
-class OrganizationAdmin(admin.ModelAdmin):
+class OrganizationAdmin(CityScopedAdmin):
     list_display = ('name', 'category', 'city', 'state', 'website_link', 'created_at')
     list_filter = ('category', 'state', 'city')
     search_fields = ('name', 'description', 'city')
     readonly_fields = ('created_at', 'updated_at')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    inlines = [EventFeedInline]
 
     fieldsets = (
         ('Basic Information', {
@@ -87,22 +290,31 @@ class ImageAdmin(admin.ModelAdmin):
     list_filter = ('uploaded_at',)
     search_fields = ('caption', 'alt_text')
     readonly_fields = ('uploaded_at', 'image_preview')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
     def image_preview(self, obj):
+        # Let the browser fetch thumbnails only as they scroll into view
         if obj.image:
-            return format_html('<img src="{}" style="max-height: 100px;" />', obj.image.url)
+            return format_html(
+                '<img src="{}" loading="lazy" decoding="async" style="max-height: 100px;" />',
+                obj.image.url,
+            )
         return "-"
     image_preview.short_description = "Preview"
 
 
 @admin.register(News)
-class NewsAdmin(admin.ModelAdmin):
+class NewsAdmin(BulkContentActions, ScalableAdmin):
     list_display = ('title', 'organization', 'published_date', 'is_published', 'author')
     list_filter = ('is_published', 'published_date', 'organization')
-    search_fields = ('title', 'content', 'summary')
+    list_select_related = ('organization', 'author')
+    search_fields = ('title', 'content', 'summary', 'organization__name')
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ('created_at', 'updated_at')
     filter_horizontal = ('images',)
+    scalable_autocomplete_fields = ('organization', 'author', 'images')
+    actions = ['publish', 'unpublish']
 
     fieldsets = (
         ('Content', {
@@ -127,13 +339,17 @@ class NewsAdmin(admin.ModelAdmin):
 
 
 @admin.register(Event)
-class EventAdmin(admin.ModelAdmin):
+class EventAdmin(BulkContentActions, ScalableAdmin):
     list_display = ('title', 'start_date', 'end_date', 'city', 'organization', 'is_published')
     list_filter = ('is_published', 'start_date', 'city', 'state')
+    list_select_related = ('organization',)
     search_fields = ('title', 'description', 'venue_name', 'city')
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ('created_at', 'updated_at')
     filter_horizontal = ('images',)
+    scalable_autocomplete_fields = ('organization', 'images')
+    actions = ['publish', 'unpublish', 'shift_dates', 'clone_next_week', 'clone_next_month']
+    bulk_date_fields = ('start_date', 'end_date')
 
     fieldsets = (
         ('Content', {
@@ -162,13 +378,25 @@ class EventAdmin(admin.ModelAdmin):
 
 
 @admin.register(Special)
-class SpecialAdmin(admin.ModelAdmin):
+class SpecialAdmin(BulkContentActions, ScalableAdmin):
     list_display = ('title', 'organization', 'start_date', 'end_date', 'is_active', 'is_published')
     list_filter = ('is_published', 'start_date', 'organization')
+    list_select_related = ('organization',)
     search_fields = ('title', 'description', 'organization__name')
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ('created_at', 'updated_at', 'is_active')
     filter_horizontal = ('images',)
+    scalable_autocomplete_fields = ('organization', 'images')
+    actions = [
+        'publish',
+        'unpublish',
+        'shift_dates',
+        'extend',
+        'clone_next_week',
+        'clone_next_month',
+    ]
+    bulk_date_fields = ('start_date', 'end_date')
+    bulk_end_field = 'end_date'
 
     fieldsets = (
         ('Content', {
@@ -195,13 +423,18 @@ class SpecialAdmin(admin.ModelAdmin):
 
 
 @admin.register(Promotion)
-class PromotionAdmin(admin.ModelAdmin):
+class PromotionAdmin(BulkContentActions, ScalableAdmin):
     list_display = ('title', 'organization', 'recurrence_type', 'valid_from', 'valid_until', 'is_published')
     list_filter = ('is_published', 'recurrence_type', 'organization')
+    list_select_related = ('organization',)
     search_fields = ('title', 'description', 'organization__name')
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ('created_at', 'updated_at')
     filter_horizontal = ('images',)
+    scalable_autocomplete_fields = ('organization', 'images')
+    actions = ['publish', 'unpublish', 'shift_dates', 'extend']
+    bulk_date_fields = ('valid_from', 'valid_until')
+    bulk_end_field = 'valid_until'
 
     fieldsets = (
         ('Content', {
@@ -227,13 +460,15 @@ class PromotionAdmin(admin.ModelAdmin):
 
 
 @admin.register(Resource)
-class ResourceAdmin(admin.ModelAdmin):
+class ResourceAdmin(ScalableAdmin):
     list_display = ('title', 'resource_type', 'published_date', 'is_published', 'author')
     list_filter = ('is_published', 'resource_type', 'published_date')
+    list_select_related = ('author',)
     search_fields = ('title', 'content', 'summary')
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ('created_at', 'updated_at')
     filter_horizontal = ('organizations', 'images')
+    scalable_autocomplete_fields = ('organizations', 'author', 'images')
 
     fieldsets = (
         ('Content', {
@@ -255,3 +490,63 @@ class ResourceAdmin(admin.ModelAdmin):
         if not obj.author:
             obj.author = request.user
         super().save_model(request, obj, form, change)
+
+
+@admin.register(Subscriber)
+class SubscriberAdmin(CityScopedAdmin):
+    list_display = ('email', 'is_active', 'last_digest_week', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('email',)
+    readonly_fields = ('last_digest_week', 'created_at')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+class ArchivedContentAdmin(ScalableAdmin):
+    """Archived rows are created by ``archive_expired``, not by hand."""
+
+    list_display = ('title', 'organization', 'archived_at', 'is_published')
+    list_filter = ('is_published', 'archived_at')
+    list_select_related = ('organization',)
+    search_fields = ('title', 'slug', 'organization__name')
+    readonly_fields = ('created_at', 'updated_at', 'archived_at')
+    scalable_autocomplete_fields = ('organization', 'images')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ArchivedEvent)
+class ArchivedEventAdmin(ArchivedContentAdmin):
+    list_display = (
+        'title',
+        'start_date',
+        'end_date',
+        'organization',
+        'archived_at',
+        'is_published',
+    )
+
+
+@admin.register(ArchivedSpecial)
+class ArchivedSpecialAdmin(ArchivedContentAdmin):
+    list_display = (
+        'title',
+        'organization',
+        'start_date',
+        'end_date',
+        'archived_at',
+        'is_published',
+    )
+
+
+@admin.register(ArchivedPromotion)
+class ArchivedPromotionAdmin(ArchivedContentAdmin):
+    list_display = (
+        'title',
+        'organization',
+        'valid_from',
+        'valid_until',
+        'archived_at',
+        'is_published',
+    )
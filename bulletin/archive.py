@@ -0,0 +1,95 @@
+"""
+Moving expired content out of the live tables.
+
+Past events, ended specials and expired promotions are copied into their
+``Archived*`` twin tables (keeping their primary keys and slugs) and deleted
+from the live tables, so "upcoming"/"active" queries only ever scan current
+rows. Detail pages fall back to the archive tables, so archived URLs keep
+resolving.
+"""
+import datetime
+import zoneinfo
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    City,
+    Event,
+    Special,
+    Promotion,
+    ArchivedEvent,
+    ArchivedSpecial,
+    ArchivedPromotion,
+)
+
+# (live model, archive model, field that marks the last day the row is current)
+ARCHIVE_MODELS = [
+    (Event, ArchivedEvent, 'end_date'),
+    (Special, ArchivedSpecial, 'end_date'),
+    (Promotion, ArchivedPromotion, 'valid_until'),
+]
+
+
+def get_cutoff(city, days=0):
+    """Rows whose end date is before this date (in the city's timezone) are expired."""
+    tz = zoneinfo.ZoneInfo(city.timezone if city else settings.TIME_ZONE)
+    return timezone.localdate(timezone=tz) - datetime.timedelta(days=days)
+
+
+def expired_queryset(model, date_field, city, cutoff):
+    return model.objects.filter(
+        tenant=city,
+        is_published=True,
+        **{f'{date_field}__lt': cutoff},
+    ).order_by('pk')
+
+
+def archive_rows(model, archive_model, rows):
+    """Copy ``rows`` (with their image links) into the archive and delete the originals."""
+    pks = [row.pk for row in rows]
+    # Slugs are kept even if an earlier archived row has the same one (the
+    # detail view shows the most recent), so the original URL keeps working
+    archived = [
+        archive_model(
+            **{field.attname: getattr(row, field.attname) for field in model._meta.concrete_fields}
+        )
+        for row in rows
+    ]
+
+    source_fk = f'{model._meta.model_name}_id'
+    target_fk = f'{archive_model._meta.model_name}_id'
+    through = model.images.through
+    links = [
+        archive_model.images.through(**{target_fk: object_id, 'image_id': image_id})
+        for object_id, image_id in through.objects.filter(**{f'{source_fk}__in': pks}).values_list(
+            source_fk, 'image_id'
+        )
+    ]
+
+    with transaction.atomic():
+        archive_model.objects.bulk_create(archived)
+        archive_model.images.through.objects.bulk_create(links)
+        model.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def archive_expired(days=0, batch_size=500, dry_run=False):
+    """Archive expired rows for every city. Returns ``{model label: count}``."""
+    cities = [None, *City.objects.all()]
+    counts = {}
+    for model, archive_model, date_field in ARCHIVE_MODELS:
+        total = 0
+        for city in cities:
+            queryset = expired_queryset(model, date_field, city, get_cutoff(city, days))
+            if dry_run:
+                total += queryset.count()
+                continue
+            while True:
+                rows = list(queryset[:batch_size])
+                if not rows:
+                    break
+                total += archive_rows(model, archive_model, rows)
+        counts[model._meta.verbose_name_plural] = total
+    return counts
@@ -0,0 +1,162 @@
+"""
+Online backups and routine maintenance of the SQLite database.
+
+``backup_database`` copies the live database with SQLite's backup API a
+few pages at a time, pausing between steps, so the site keeps reading and
+writing while it runs; if a write lands mid-copy, SQLite restarts the copy,
+so the result is always a consistent snapshot. Each copy is written under a
+temporary name, checked with ``PRAGMA integrity_check`` and only then given
+its final name; the newest DB_BACKUP_KEEP copies are kept.
+
+``optimize_database`` refreshes the planner statistics SQLite thinks are
+stale (``PRAGMA optimize``) and returns free pages to the file system with
+``PRAGMA incremental_vacuum``, which only works once the database has been
+switched to ``auto_vacuum=INCREMENTAL`` (``enable_incremental_vacuum``, a
+one-off full VACUUM that locks the database while it runs).
+"""
+import datetime
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+BACKUP_PREFIX = 'db-'
+BACKUP_SUFFIX = '.sqlite3'
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+class BackupError(Exception):
+    pass
+
+
+def pragma(connection, name):
+    return connection.execute(f'PRAGMA {name}').fetchone()[0]
+
+
+def database_size(connection):
+    """``(bytes, free bytes)`` of the database behind ``connection``."""
+    page_size = pragma(connection, 'page_size')
+    return (
+        pragma(connection, 'page_count') * page_size,
+        pragma(connection, 'freelist_count') * page_size,
+    )
+
+
+def integrity_errors(path):
+    """The problems ``PRAGMA integrity_check`` finds in the database at ``path`` (empty if none)."""
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        rows = [row[0] for row in connection.execute('PRAGMA integrity_check')]
+    finally:
+        connection.close()
+    return [] if rows == ['ok'] else rows
+
+
+def list_backups(directory):
+    """Backups in ``directory``, oldest first (names sort by time)."""
+    return sorted(Path(directory).glob(f'{BACKUP_PREFIX}*{BACKUP_SUFFIX}'))
+
+
+def prune_backups(directory, keep):
+    """Delete all but the newest ``keep`` backups; returns the deleted paths."""
+    backups = list_backups(directory)
+    expired = backups[:-keep] if keep > 0 else []
+    for path in expired:
+        path.unlink()
+    return expired
+
+
+def copy_pages(connection, path, step_pages=None, step_sleep=None):
+    """
+    Copy the database behind ``connection`` into the file at ``path`` with
+    the backup API, ``step_pages`` at a time; returns the number of steps.
+    """
+    step_pages = settings.DB_BACKUP_STEP_PAGES if step_pages is None else step_pages
+    step_sleep = settings.DB_BACKUP_STEP_SLEEP if step_sleep is None else step_sleep
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if remaining and step_sleep:
+            # Between steps the source is unlocked; let writers through
+            time.sleep(step_sleep)
+
+    target = sqlite3.connect(path)
+    try:
+        connection.backup(target, pages=step_pages, progress=progress)
+        # Copies are only ever read; a rollback journal leaves no -wal/-shm files beside them
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+    return steps
+
+
+def backup_database(connection, directory, keep, step_pages=None, step_sleep=None):
+    """
+    Copy the database behind ``connection`` to a new file in ``directory``,
+    verify it and prune old copies. Returns a report dict.
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = f'{BACKUP_PREFIX}{datetime.datetime.now():%Y%m%d-%H%M%S}{BACKUP_SUFFIX}'
+    path = Path(directory) / name
+    partial = path.with_name(name + '.partial')
+
+    started = time.perf_counter()
+    steps = copy_pages(connection, partial, step_pages, step_sleep)
+    copied = time.perf_counter()
+
+    errors = integrity_errors(partial)
+    if errors:
+        partial.unlink()
+        raise BackupError(f"Backup failed integrity_check: {'; '.join(errors[:5])}")
+    os.replace(partial, path)
+    verified = time.perf_counter()
+
+    return {
+        'path': path,
+        'bytes': path.stat().st_size,
+        'steps': steps,
+        'copy_ms': (copied - started) * 1000,
+        'verify_ms': (verified - copied) * 1000,
+        'pruned': prune_backups(directory, keep),
+    }
+
+
+def optimize_database(connection, vacuum_pages=None):
+    """Run ``PRAGMA optimize`` and an incremental vacuum; returns a report dict."""
+    vacuum_pages = settings.DB_VACUUM_PAGES if vacuum_pages is None else vacuum_pages
+    size_before, free_before = database_size(connection)
+
+    started = time.perf_counter()
+    # Bound the rows ANALYZE samples per index so optimize stays quick on big tables
+    connection.execute('PRAGMA analysis_limit=1000')
+    connection.execute('PRAGMA optimize')
+    optimized = time.perf_counter()
+
+    auto_vacuum = AUTO_VACUUM_MODES.get(pragma(connection, 'auto_vacuum'), 'unknown')
+    if auto_vacuum == 'incremental':
+        # Each step of the statement frees one page; executescript() steps it to
+        # the end, execute() would stop after the first
+        connection.executescript(f'PRAGMA incremental_vacuum({int(vacuum_pages)})')
+    vacuumed = time.perf_counter()
+
+    size_after, free_after = database_size(connection)
+    return {
+        'auto_vacuum': auto_vacuum,
+        'optimize_ms': (optimized - started) * 1000,
+        'vacuum_ms': (vacuumed - optimized) * 1000,
+        'bytes_before': size_before,
+        'bytes_after': size_after,
+        'free_before': free_before,
+        'free_after': free_after,
+    }
+
+
+def enable_incremental_vacuum(connection):
+    """Switch the database to ``auto_vacuum=INCREMENTAL``; a full VACUUM that blocks writers."""
+    connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    connection.execute('VACUUM')
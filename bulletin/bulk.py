@@ -0,0 +1,155 @@
+"""
+Set-based edits behind the admin's bulk actions.
+
+However many rows are selected, an edit is a single UPDATE (or a single
+``bulk_create`` for clones) that stamps ``updated_at`` itself, since
+``update()`` skips ``auto_now``. The post_save side effects (timeline rows,
+the city's content version, proxy purges) then run once for the whole batch
+through ``signals.bulk_content_changed``.
+"""
+import datetime
+import re
+
+from django.db import transaction
+from django.db.models import DateField, ExpressionWrapper, F
+from django.utils import timezone
+
+from . import monthly
+from .signals import bulk_content_changed
+
+# A clone's slug is its original's slug plus the clone's start date
+CLONE_SUFFIX_RE = re.compile(r'-\d{4}-\d{2}-\d{2}(?:-\d+)?$')
+
+
+def _selected(queryset):
+    # The changelist queryset may filter on the very fields being changed,
+    # so pin the selection down before updating it
+    return list(queryset.values_list('pk', flat=True))
+
+
+def _changed(model, pks, previous_months=None):
+    bulk_content_changed(
+        model._default_manager.filter(pk__in=pks).select_related('tenant'), previous_months
+    )
+
+
+def update_content(queryset, **values):
+    """Set ``values`` on every selected row with one UPDATE; returns the row count."""
+    model = queryset.model
+    pks = _selected(queryset)
+    with transaction.atomic():
+        previous_months = None
+        if model in monthly.ARCHIVE_TYPES:
+            # Rows moved to another month leave it one item short
+            previous_months = monthly.months_of(
+                model._default_manager.filter(pk__in=pks).select_related('tenant')
+            )
+        count = model._default_manager.filter(pk__in=pks).update(
+            updated_at=timezone.now(), **values
+        )
+        _changed(model, pks, previous_months)
+    return count
+
+
+def shift_dates(queryset, fields, days):
+    """Move the date ``fields`` of the selected rows by ``days`` (empty dates stay empty)."""
+    delta = datetime.timedelta(days=days)
+    return update_content(
+        queryset,
+        **{
+            field: ExpressionWrapper(F(field) + delta, output_field=DateField()) for field in fields
+        },
+    )
+
+
+def taken_slugs(model, candidates):
+    """Existing slugs among ``candidates``, plus their numbered variants where one is taken."""
+    manager = model._default_manager
+    taken = set(manager.filter(slug__in=candidates).values_list('slug', flat=True))
+    # Only already-cloned dates need a second look
+    for slug in list(taken):
+        taken.update(manager.filter(slug__startswith=f'{slug}-').values_list('slug', flat=True))
+    return taken
+
+
+def clone_slug(slug, start_date, max_length, taken):
+    """
+    ``slug`` with ``start_date`` appended (in place of an earlier clone's
+    date), and a number too if that is in ``taken``.
+    """
+    base = CLONE_SUFFIX_RE.sub('', slug)[: max_length - 14]
+    candidate = f'{base}-{start_date.isoformat()}'
+    suffix = 1
+    while candidate in taken:
+        suffix += 1
+        candidate = f'{base}-{start_date.isoformat()}-{suffix}'
+    taken.add(candidate)
+    return candidate
+
+
+def clone_content(queryset, date_fields, offset):
+    """
+    Copy the selected rows (and their images) with the first of ``date_fields``
+    moved by ``offset`` and the others kept at the same distance from it.
+    Returns the clones.
+    """
+    model = queryset.model
+    start_field, *other_fields = date_fields
+    originals = list(
+        model._default_manager.filter(pk__in=_selected(queryset))
+        .select_related('tenant')
+        .prefetch_related('images')
+    )
+    if not originals:
+        return []
+
+    copied = [
+        field.attname
+        for field in model._meta.concrete_fields
+        if not field.primary_key and field.attname not in ('created_at', 'updated_at')
+    ]
+    slug_length = model._meta.get_field('slug').max_length
+    clones = []
+    for original in originals:
+        clone = model(**{attname: getattr(original, attname) for attname in copied})
+        start = getattr(original, start_field)
+        new_start = start + offset
+        setattr(clone, start_field, new_start)
+        for field in other_fields:
+            value = getattr(original, field)
+            if value is not None:
+                setattr(clone, field, new_start + (value - start))
+        # Imported events belong to their feed; a copy is an ordinary event
+        if hasattr(clone, 'source_feed_id'):
+            clone.source_feed_id = None
+            clone.source_uid = ''
+            clone.source_values = {}
+        clone.tenant = original.tenant
+        clones.append(clone)
+
+    candidates = [
+        clone_slug(original.slug, getattr(clone, start_field), slug_length, set())
+        for original, clone in zip(originals, clones)
+    ]
+    taken = taken_slugs(model, candidates)
+    for original, clone in zip(originals, clones):
+        clone.slug = clone_slug(original.slug, getattr(clone, start_field), slug_length, taken)
+
+    images = model._meta.get_field('images')
+    through = images.remote_field.through
+    with transaction.atomic():
+        model._default_manager.bulk_create(clones)
+        through.objects.bulk_create(
+            [
+                through(
+                    **{
+                        f'{images.m2m_field_name()}_id': clone.pk,
+                        f'{images.m2m_reverse_field_name()}_id': image.pk,
+                    }
+                )
+                for original, clone in zip(originals, clones)
+                for image in original.images.all()
+            ]
+        )
+        bulk_content_changed(clones)
+    return clones
@@ -0,0 +1,95 @@
+"""
+Content-versioned caching helpers.
+
+Cached artifacts that depend on published content (sitemaps and the like)
+include the current city's content version in their key. Saving or deleting
+content bumps the version once the transaction commits (so nothing can be
+cached against the new version from before the change is visible), and
+stale entries are simply never read again and age out of the cache on their
+own.
+
+The version lives in the ``shared`` cache so every worker sees a bump as
+soon as it happens; the artifacts themselves can live in the faster
+per-worker ``default`` cache. Next to it is the time of the last change,
+which tells the read-replica router whether a snapshot is still current.
+"""
+import threading
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .cities import activate_city
+
+CONTENT_VERSION_KEY = 'content-version'
+CONTENT_CHANGED_KEY = 'content-changed'
+
+# Cities (by pk) whose version is bumped when the current transaction commits
+_pending = threading.local()
+
+
+def new_version():
+    # Microseconds since the epoch: a version that was lost (culled, or the
+    # cache cleared) never comes back as one earlier results were cached under
+    return time.time_ns() // 1000
+
+
+def get_content_version():
+    """Current content version for the active city."""
+    shared = caches['shared']
+    version = shared.get(CONTENT_VERSION_KEY)
+    if version is None:
+        shared.add(CONTENT_VERSION_KEY, new_version(), timeout=None)
+        version = shared.get(CONTENT_VERSION_KEY)
+    return version
+
+
+def bump_content_version(city=None):
+    """Invalidate everything cached against ``city``'s content."""
+    with activate_city(city):
+        shared = caches['shared']
+        # Not incr(): the file cache re-sets the key with its default timeout.
+        # Concurrent bumps still land on different versions.
+        version = max(get_content_version() + 1, new_version())
+        shared.set(CONTENT_VERSION_KEY, version, timeout=None)
+        shared.set(CONTENT_CHANGED_KEY, time.time(), timeout=None)
+
+
+def queue_version_bump(city=None):
+    """Bump ``city``'s content version once the current transaction commits."""
+    if not hasattr(_pending, 'cities'):
+        _pending.cities = {}
+    _pending.cities[city.pk if city else None] = city
+    transaction.on_commit(flush_version_bumps)
+
+
+def flush_version_bumps():
+    # As with surrogate.flush_purges, the first callback after a commit bumps
+    # every city queued so far
+    cities = getattr(_pending, 'cities', None)
+    if cities:
+        _pending.cities = {}
+        for city in cities.values():
+            bump_content_version(city)
+
+
+def get_content_changed_at():
+    """
+    When the active city's content last changed (a Unix time), or None if
+    that isn't known (nothing changed since the cache was cleared, or the
+    entry was culled).
+    """
+    return caches['shared'].get(CONTENT_CHANGED_KEY)
+
+
+def set_unknown_content_changed_at(timestamp):
+    """
+    Record ``timestamp`` as the last change for each city whose last change
+    isn't known. Every change committed before ``timestamp`` must be in the
+    copies this is for; any later one has recorded its own time.
+    """
+    from .models import City
+
+    for city in [None, *City.objects.all()]:
+        with activate_city(city):
+            caches['shared'].add(CONTENT_CHANGED_KEY, timestamp, timeout=None)
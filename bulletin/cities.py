@@ -0,0 +1,109 @@
+"""
+Per-request city selection for multi-city deployments.
+
+``CityMiddleware`` resolves the request's host to a ``City``, activates that
+city's timezone (so ``timezone.localdate()`` is the city's "today") and
+records the city in a context variable. Once any City exists, a host that
+matches none (and no default city) is not found rather than served every
+city's content. Cache keys are namespaced by the active city through
+``make_cache_key`` (the caches' KEY_FUNCTION) so cities never read each
+other's entries.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_current_city = ContextVar('current_city', default=None)
+
+# Host -> City map shared by all threads in a worker. Reloaded after
+# CITY_HOST_CACHE_SECONDS so edits in other workers are picked up.
+_host_map = None
+_host_map_loaded_at = 0.0
+_host_map_lock = threading.Lock()
+
+
+def get_current_city():
+    """The City serving the current request, or None in single-city deployments."""
+    return _current_city.get()
+
+
+def set_current_city(city):
+    """Activate ``city`` for the current context; returns a token for ``reset_current_city``."""
+    return _current_city.set(city)
+
+
+def reset_current_city(token):
+    _current_city.reset(token)
+
+
+def clear_host_cache():
+    global _host_map
+    with _host_map_lock:
+        _host_map = None
+
+
+def _load_host_map():
+    from .models import City
+
+    cities = list(City.objects.all())
+    host_map = {city.domain.lower(): city for city in cities}
+    default = next((city for city in cities if city.is_default), None)
+    return host_map, default
+
+
+def _get_host_map():
+    global _host_map, _host_map_loaded_at
+
+    max_age = getattr(settings, 'CITY_HOST_CACHE_SECONDS', 60)
+    with _host_map_lock:
+        if _host_map is None or time.monotonic() - _host_map_loaded_at > max_age:
+            _host_map = _load_host_map()
+            _host_map_loaded_at = time.monotonic()
+        return _host_map
+
+
+def get_city_for_host(host):
+    """Look up the City for a request host, falling back to the default city."""
+    host_map, default = _get_host_map()
+    return host_map.get(host.split(':', 1)[0].lower(), default)
+
+
+def has_cities():
+    """Whether any City exists, i.e. this is a multi-city deployment."""
+    host_map, _ = _get_host_map()
+    return bool(host_map)
+
+
+def get_city_config(city=None):
+    """Display settings for ``city``, falling back to the single-city settings."""
+    if city is None:
+        return {
+            'CITY_NAME': settings.CITY_NAME,
+            'CITY_STATE': settings.CITY_STATE,
+            'CONTACT_EMAIL': settings.CONTACT_EMAIL,
+        }
+    return {
+        'CITY_NAME': city.name,
+        'CITY_STATE': city.state,
+        'CONTACT_EMAIL': city.contact_email or settings.CONTACT_EMAIL,
+    }
+
+
+def make_cache_key(key, key_prefix, version):
+    """Cache KEY_FUNCTION that prefixes every key with the active city's slug."""
+    city = _current_city.get()
+    namespace = city.slug if city is not None else '_'
+    return f'{key_prefix}:{version}:{namespace}:{key}'
+
+
+@contextmanager
+def activate_city(city):
+    """Run a block (e.g. a signal handler or command) as if serving ``city``."""
+    token = _current_city.set(city)
+    try:
+        yield city
+    finally:
+        _current_city.reset(token)
@@ -1,10 +1,13 @@
 from django.conf import settings
 
+from .cities import get_city_config
+
 
 def site_config(request):
     """Add site configuration to all template contexts."""
     return {
-        'CITY_NAME': settings.CITY_NAME,
-        'CITY_STATE': settings.CITY_STATE,
-        'CONTACT_EMAIL': settings.CONTACT_EMAIL,
+        **get_city_config(getattr(request, 'city', None)),
+        'STAFF_HINT_COOKIE': settings.STAFF_HINT_COOKIE,
+        'SITE_STYLESHEETS': settings.SITE_STYLESHEETS,
+        'SERVICE_WORKER': settings.SERVICE_WORKER,
     }
@@ -0,0 +1,195 @@
+"""
+Weekly email digest.
+
+For each city the week's content is queried and the message body (text and
+HTML) is rendered once; per subscriber only the unsubscribe link is
+substituted into the rendered strings. Messages go out over one reused SMTP
+connection in batches, and each batch marks its subscribers with the digest
+week, so re-running an interrupted send skips everyone already mailed.
+"""
+import datetime
+import logging
+import smtplib
+import urllib.parse
+import zoneinfo
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.formats import date_format
+
+from .cities import activate_city, get_city_config
+from .models import Event, Special, Subscriber
+
+logger = logging.getLogger(__name__)
+
+# Stands in for the subscriber's unsubscribe URL in the rendered body
+UNSUBSCRIBE_PLACEHOLDER = '%%UNSUBSCRIBE_URL%%'
+
+
+class ConnectionLost(Exception):
+    """The SMTP server dropped the connection and refused a new one."""
+
+
+def get_site_url(city=None):
+    if city is None:
+        return settings.SITE_URL.rstrip('/')
+    scheme = urllib.parse.urlsplit(settings.SITE_URL).scheme or 'https'
+    return f'{scheme}://{city.domain}'
+
+
+def get_week_start(day):
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def get_digest_content(city, today):
+    """The week's events plus today's specials and promotions, filtered as on the home page."""
+    from .views import get_active_promotions
+
+    week_end = today + datetime.timedelta(days=6)
+    return {
+        'events': list(
+            Event.objects.for_city(city)
+            .filter(
+                is_published=True,
+                end_date__gte=today,
+                start_date__lte=week_end,
+            )
+            .select_related('organization')
+            .order_by('start_date', 'start_time')
+        ),
+        'specials': list(
+            Special.objects.for_city(city)
+            .filter(
+                is_published=True,
+                start_date__lte=today,
+                end_date__gte=today,
+            )
+            .select_related('organization')
+        ),
+        'promotions': get_active_promotions(today, city),
+    }
+
+
+class Digest:
+    """A city's digest, rendered once and personalized per subscriber."""
+
+    def __init__(self, city, today):
+        self.city = city
+        self.today = today
+        self.week = get_week_start(today)
+        self.site_url = get_site_url(city)
+        self.content = get_digest_content(city, today)
+
+        config = get_city_config(city)
+        self.subject = f"{config['CITY_NAME']} Vegan Bulletin: week of {date_format(today, 'F j')}"
+        context = {
+            **config,
+            **self.content,
+            'today': today,
+            'site_url': self.site_url,
+            'unsubscribe_url': UNSUBSCRIBE_PLACEHOLDER,
+        }
+        self.text_body = render_to_string('bulletin/email/digest.txt', context)
+        self.html_body = render_to_string('bulletin/email/digest.html', context)
+
+    def is_empty(self):
+        return not any(self.content.values())
+
+    def pending_subscribers(self):
+        subscribers = Subscriber.objects.for_city(self.city)
+        if self.city is not None and self.city.is_default:
+            # Subscribers from before there were cities belong to the default
+            # one, unless they have since subscribed to it as well
+            subscribers = Subscriber.objects.filter(
+                Q(tenant=self.city)
+                | (Q(tenant__isnull=True) & ~Q(email__in=subscribers.values('email')))
+            )
+        return subscribers.filter(
+            Q(last_digest_week__isnull=True) | Q(last_digest_week__lt=self.week),
+            is_active=True,
+        )
+
+    def message(self, email, token, connection):
+        unsubscribe_url = self.site_url + Subscriber(token=token).get_unsubscribe_url()
+        message = EmailMultiAlternatives(
+            self.subject,
+            self.text_body.replace(UNSUBSCRIBE_PLACEHOLDER, unsubscribe_url),
+            to=[email],
+            headers={
+                'List-Unsubscribe': f'<{unsubscribe_url}>',
+                'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click',
+            },
+            connection=connection,
+        )
+        message.attach_alternative(
+            self.html_body.replace(UNSUBSCRIBE_PLACEHOLDER, unsubscribe_url), 'text/html'
+        )
+        return message
+
+    def send(self, batch_size=500):
+        """
+        Send to every subscriber not yet mailed this week; returns (sent, failed).
+        Stops early, with everyone mailed so far recorded, if the SMTP server
+        can't be reached again after dropping the connection.
+        """
+        sent = failed = 0
+        last_pk = 0
+        connection = get_connection()
+        with connection:
+            while True:
+                batch = list(
+                    self.pending_subscribers()
+                    .filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .values_list('pk', 'email', 'token')[:batch_size]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+
+                delivered = []
+                try:
+                    for pk, email, token in batch:
+                        if self.send_one(connection, self.message(email, token, connection)):
+                            delivered.append(pk)
+                        else:
+                            failed += 1
+                except ConnectionLost:
+                    logger.error(
+                        "Digest send stopped: could not reconnect to the mail server", exc_info=True
+                    )
+                    break
+                finally:
+                    Subscriber.objects.filter(pk__in=delivered).update(last_digest_week=self.week)
+                    sent += len(delivered)
+        return sent, failed
+
+    def send_one(self, connection, message):
+        try:
+            connection.send_messages([message])
+            return True
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped a long-lived connection; reconnect and retry once
+            connection.close()
+            try:
+                connection.open()
+            except (OSError, smtplib.SMTPException) as error:
+                raise ConnectionLost from error
+            try:
+                connection.send_messages([message])
+                return True
+            except smtplib.SMTPException:
+                logger.warning("Digest to %s failed", message.to[0], exc_info=True)
+        except smtplib.SMTPException:
+            logger.warning("Digest to %s failed", message.to[0], exc_info=True)
+        return False
+
+
+def build_digest(city):
+    """Render ``city``'s digest for the current week in the city's timezone."""
+    tz = zoneinfo.ZoneInfo(city.timezone if city else settings.TIME_ZONE)
+    with activate_city(city), timezone.override(tz):
+        return Digest(city, timezone.localdate())
@@ -0,0 +1,162 @@
+"""
+Bounded-memory processing of uploaded images.
+
+Uploads are streamed to a temporary file (see FILE_UPLOAD_HANDLERS), so the
+request body never sits in memory. ``validate_image_upload`` then checks the
+byte size and, from the image header alone, the format and pixel count
+before anything is decoded. On save, ``process_upload`` re-encodes the image:
+JPEGs are decoded at a reduced scale (libjpeg's DCT scaling, Pillow's
+``draft()``) close to IMAGE_MAX_DIMENSION, so a 60-megapixel photo never
+exists in memory at full size; other formats are only decoded when they fit
+IMAGE_MAX_DECODE_PIXELS. EXIF orientation is applied and all metadata except
+the colour profile is dropped. Animated GIFs are stored as uploaded.
+
+Pillow is imported on first use, so processes that never handle uploads
+don't load it.
+"""
+import math
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.template.defaultfilters import filesizeformat
+
+# Formats accepted for upload and the extension stored for each
+FORMATS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+}
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 85, 'method': 4},
+}
+
+
+def open_image(file):
+    """Open ``file`` with Pillow; reads the header only."""
+    from PIL import Image
+
+    file.seek(0)
+    return Image.open(file)
+
+
+def validate_image_upload(value):
+    """Reject uploads over the byte or pixel limits, or in unsupported formats."""
+    if getattr(value, '_committed', True):
+        # Already stored; only new uploads are checked
+        return
+    if value.size > settings.IMAGE_MAX_UPLOAD_BYTES:
+        raise ValidationError(
+            "Images can be at most %(limit)s (this one is %(size)s).",
+            code='file_too_large',
+            params={
+                'limit': filesizeformat(settings.IMAGE_MAX_UPLOAD_BYTES),
+                'size': filesizeformat(value.size),
+            },
+        )
+
+    from PIL import UnidentifiedImageError
+
+    try:
+        with open_image(value) as image:
+            image_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, OSError, ValueError):
+        raise ValidationError("Upload a valid JPEG, PNG, GIF or WebP image.", code='invalid_image')
+    finally:
+        value.seek(0)
+
+    if image_format not in FORMATS:
+        raise ValidationError(
+            "%(format)s images aren't supported; upload a JPEG, PNG, GIF or WebP image.",
+            code='invalid_image_format',
+            params={'format': image_format},
+        )
+    check_pixels(image_format, (width, height))
+
+
+def check_pixels(image_format, size):
+    """Reject images over IMAGE_MAX_PIXELS or too big to decode (IMAGE_MAX_DECODE_PIXELS)."""
+    width, height = size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            "Images can be at most %(limit)s megapixels (this one is %(size)s).",
+            code='image_too_large',
+            params={
+                'limit': f'{settings.IMAGE_MAX_PIXELS / 1_000_000:g}',
+                'size': f'{width * height / 1_000_000:.1f}',
+            },
+        )
+    decoded_width, decoded_height = decoded_size(image_format, (width, height))
+    if decoded_width * decoded_height > settings.IMAGE_MAX_DECODE_PIXELS:
+        raise ValidationError(
+            "%(format)s images can be at most %(limit)s megapixels; save it as a JPEG or "
+            "resize it first.",
+            code='image_too_large',
+            params={
+                'format': image_format,
+                'limit': f'{settings.IMAGE_MAX_DECODE_PIXELS / 1_000_000:g}',
+            },
+        )
+
+
+def target_size(size):
+    """``size`` scaled down to fit IMAGE_MAX_DIMENSION, keeping the aspect ratio."""
+    width, height = size
+    ratio = min(settings.IMAGE_MAX_DIMENSION / max(width, height), 1)
+    return max(math.ceil(width * ratio), 1), max(math.ceil(height * ratio), 1)
+
+
+def decoded_size(image_format, size):
+    """
+    The bitmap size ``process_upload`` decodes. JPEGs are decoded at the
+    smallest 1/2, 1/4 or 1/8 scale that is still at least ``target_size``
+    (the same choice as Pillow's ``draft()``); other formats at full size.
+    """
+    if image_format != 'JPEG':
+        return size
+    width, height = size
+    target_width, target_height = target_size(size)
+    reduction = min(width // target_width, height // target_height)
+    scale = next(scale for scale in (8, 4, 2, 1) if reduction >= scale)
+    return math.ceil(width / scale), math.ceil(height / scale)
+
+
+def process_upload(file):
+    """
+    A re-encoded, downscaled and metadata-free copy of ``file`` (a temporary
+    file named with the right extension), or None to store it unchanged.
+    Raises ValidationError for images over the pixel limits.
+    """
+    from PIL import ImageOps
+
+    with open_image(file) as image:
+        image_format = image.format
+        if image_format not in SAVE_OPTIONS:
+            # GIFs may be animated; keep them as uploaded
+            return None
+        # Programmatic saves skip the form validator; check before decoding
+        check_pixels(image_format, image.size)
+
+        # JPEG: decode at a reduced scale (see decoded_size); no-op otherwise
+        image.draft('RGB', target_size(image.size))
+        image.thumbnail((settings.IMAGE_MAX_DIMENSION, settings.IMAGE_MAX_DIMENSION))
+        image = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        output = tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR)
+        options = dict(SAVE_OPTIONS[image_format])
+        if image.info.get('icc_profile'):
+            options['icc_profile'] = image.info['icc_profile']
+        # Saving without exif=/pnginfo= leaves out EXIF, XMP, GPS and text chunks
+        image.save(output, format=image_format, **options)
+
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(file.name))[0] + FORMATS[image_format]
+    return File(output, name=name)
@@ -0,0 +1,491 @@
+"""
+Importing events from organizations' published calendars.
+
+Every active ``EventFeed`` is fetched concurrently (asyncio, with blocking
+fetches in worker threads) using the ETag / Last-Modified validators from
+the previous run, so unchanged feeds answer 304 and cost one round trip. The
+changed feeds are parsed (iCalendar or RSS with the RSS event module) and
+upserted into ``Event`` in batches keyed by ``(source_feed, source_uid)``.
+Each event keeps the values its feed last sent, so a re-import only writes
+the fields the feed has changed since and leaves editors' changes to the
+rest (and to publication) alone. Each feed records how its last run went and
+how long it took.
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import re
+import time
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+import zoneinfo
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.html import strip_tags
+from django.utils.text import Truncator, slugify
+
+from .models import ArchivedEvent, Event, EventFeed
+from .rendering import render_fields
+from .signals import bulk_content_changed
+
+USER_AGENT = 'VeganBulletin-Importer/1.0'
+
+RSS_EVENT_NS = '{http://purl.org/rss/1.0/modules/event/}'
+
+DURATION_RE = re.compile(
+    r'^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?'
+    r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$'
+)
+
+# Event fields filled from a feed item. Everything else belongs to editors, as
+# does is_published once the event exists (except when the feed cancels it).
+IMPORTED_FIELDS = (
+    'title',
+    'description',
+    'summary',
+    'start_date',
+    'end_date',
+    'start_time',
+    'end_time',
+    'venue_name',
+    'address',
+    'city',
+    'state',
+    'website',
+)
+
+
+class FetchResult:
+    def __init__(self, status, body=None, etag='', last_modified='', error='', duration_ms=0):
+        self.status = status
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.error = error
+        self.duration_ms = duration_ms
+
+
+# Fetching
+
+
+def fetch(url, etag='', last_modified=''):
+    """Conditional GET of a feed (blocking)."""
+    headers = {'User-Agent': USER_AGENT}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    request = urllib.request.Request(url, headers=headers)
+
+    started = time.monotonic()
+    try:
+        with urllib.request.urlopen(request, timeout=settings.IMPORT_TIMEOUT) as response:
+            body = response.read(settings.IMPORT_MAX_BYTES + 1)
+            if len(body) > settings.IMPORT_MAX_BYTES:
+                raise ValueError(f"Feed is larger than {settings.IMPORT_MAX_BYTES} bytes")
+            result = FetchResult(
+                'ok',
+                body=body,
+                etag=response.headers.get('ETag', ''),
+                last_modified=response.headers.get('Last-Modified', ''),
+            )
+    except urllib.error.HTTPError as error:
+        if error.code == 304:
+            result = FetchResult('not_modified')
+        else:
+            result = FetchResult('error', error=f"HTTP {error.code} {error.reason}")
+    except (urllib.error.URLError, OSError, ValueError) as error:
+        result = FetchResult('error', error=str(error))
+    result.duration_ms = int((time.monotonic() - started) * 1000)
+    return result
+
+
+async def fetch_all(feeds, concurrency, force=False):
+    """Fetch ``feeds`` with at most ``concurrency`` requests in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(feed):
+        async with semaphore:
+            if force:
+                return await asyncio.to_thread(fetch, feed.url)
+            return await asyncio.to_thread(fetch, feed.url, feed.etag, feed.last_modified)
+
+    return await asyncio.gather(*(fetch_one(feed) for feed in feeds))
+
+
+# iCalendar
+
+
+def unfold_lines(text):
+    lines = []
+    for line in text.splitlines():
+        if line[:1] in (' ', '\t') and lines:
+            lines[-1] += line[1:]
+        elif line:
+            lines.append(line)
+    return lines
+
+
+def parse_content_line(line):
+    """Split ``NAME;PARAM=x:value`` into ``(name, params, value)``."""
+    in_quotes = False
+    for index, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ':' and not in_quotes:
+            head, value = line[:index], line[index + 1 :]
+            break
+    else:
+        return None
+    name, *raw_params = head.split(';')
+    params = {}
+    for param in raw_params:
+        key, _, param_value = param.partition('=')
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+
+def unescape_text(value):
+    return re.sub(r'\\([\\;,nN])', lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value)
+
+
+def parse_ics_datetime(value, params, tz):
+    """A ``date`` for all-day values, otherwise an aware datetime in ``tz``."""
+    value = value.strip()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime.datetime.strptime(value, '%Y%m%d').date()
+    is_utc = value.endswith('Z')
+    parsed = datetime.datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    if is_utc:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    else:
+        try:
+            source_tz = zoneinfo.ZoneInfo(params['TZID']) if 'TZID' in params else tz
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            source_tz = tz
+        parsed = parsed.replace(tzinfo=source_tz)
+    return parsed.astimezone(tz)
+
+
+def parse_duration(value):
+    match = DURATION_RE.match(value.strip())
+    if not match:
+        return None
+    parts = {name: int(number or 0) for name, number in match.groupdict().items() if name != 'sign'}
+    duration = datetime.timedelta(
+        weeks=parts['weeks'],
+        days=parts['days'],
+        hours=parts['hours'],
+        minutes=parts['minutes'],
+        seconds=parts['seconds'],
+    )
+    return -duration if match.group('sign') == '-' else duration
+
+
+def parse_ics(body, tz):
+    """Items for each VEVENT in an iCalendar document."""
+    items = []
+    event = None
+    nested = 0
+    for line in unfold_lines(body.decode('utf-8', 'replace')):
+        parsed = parse_content_line(line)
+        if parsed is None:
+            continue
+        name, params, value = parsed
+        if name == 'BEGIN':
+            if value.upper() == 'VEVENT':
+                event = {}
+            elif event is not None:
+                nested += 1
+        elif name == 'END':
+            if event is not None and nested:
+                nested -= 1
+            elif value.upper() == 'VEVENT' and event is not None:
+                item = ics_item(event, tz)
+                if item:
+                    items.append(item)
+                event = None
+        elif event is not None and not nested:
+            # Only the first occurrence of each property matters here
+            event.setdefault(name, (params, value))
+    return items
+
+
+def ics_item(event, tz):
+    if 'UID' not in event or 'DTSTART' not in event:
+        return None
+    try:
+        start = parse_ics_datetime(event['DTSTART'][1], event['DTSTART'][0], tz)
+        end = None
+        if 'DTEND' in event:
+            end = parse_ics_datetime(event['DTEND'][1], event['DTEND'][0], tz)
+        elif 'DURATION' in event:
+            duration = parse_duration(event['DURATION'][1])
+            end = start + duration if duration is not None else None
+    except ValueError:
+        return None
+
+    text = {
+        name: unescape_text(event[name][1])
+        for name in ('SUMMARY', 'DESCRIPTION', 'LOCATION', 'URL')
+        if name in event
+    }
+    return {
+        'uid': event['UID'][1].strip(),
+        'title': text.get('SUMMARY', ''),
+        'description': text.get('DESCRIPTION', ''),
+        'location': text.get('LOCATION', ''),
+        'url': text.get('URL', ''),
+        'start': start,
+        'end': end,
+        'cancelled': event.get('STATUS', ({}, ''))[1].strip().upper() == 'CANCELLED',
+    }
+
+
+# RSS
+
+
+def parse_iso_datetime(value, tz):
+    value = value.strip()
+    if len(value) == 10:
+        return datetime.date.fromisoformat(value)
+    parsed = datetime.datetime.fromisoformat(value)
+    if timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=tz)
+    return parsed.astimezone(tz)
+
+
+def parse_rss(body, tz):
+    """Items from an RSS 2.0 feed that carries ``ev:startdate`` (RSS event module)."""
+    items = []
+    root = ET.fromstring(body)
+    for element in root.iter('item'):
+        start = element.findtext(f'{RSS_EVENT_NS}startdate')
+        uid = element.findtext('guid') or element.findtext('link')
+        if not start or not uid:
+            continue
+        try:
+            end = element.findtext(f'{RSS_EVENT_NS}enddate')
+            item = {
+                'uid': uid.strip(),
+                'title': (element.findtext('title') or '').strip(),
+                'description': strip_tags(element.findtext('description') or '').strip(),
+                'location': (element.findtext(f'{RSS_EVENT_NS}location') or '').strip(),
+                'url': (element.findtext('link') or '').strip(),
+                'start': parse_iso_datetime(start, tz),
+                'end': parse_iso_datetime(end, tz) if end else None,
+                'cancelled': False,
+            }
+        except ValueError:
+            continue
+        items.append(item)
+    return items
+
+
+PARSERS = {
+    'ics': parse_ics,
+    'rss': parse_rss,
+}
+
+
+# Upserting
+
+
+def item_dates(item):
+    """``(start_date, end_date, start_time, end_time)`` for a parsed item."""
+    start, end = item['start'], item['end']
+    if not isinstance(start, datetime.datetime):
+        # All-day: DTEND is exclusive
+        if isinstance(end, datetime.datetime):
+            end = end.date()
+        end_date = end - datetime.timedelta(days=1) if end and end > start else start
+        return start, end_date, None, None
+    if not isinstance(end, datetime.datetime) or end < start:
+        return start.date(), start.date(), start.time().replace(tzinfo=None), None
+    # An event ending at midnight ends on the previous day
+    end_date = (end - datetime.timedelta(microseconds=1)).date() if end > start else end.date()
+    return (
+        start.date(),
+        end_date,
+        start.time().replace(tzinfo=None),
+        end.time().replace(tzinfo=None),
+    )
+
+
+def event_values(item, feed):
+    organization = feed.organization
+    start_date, end_date, start_time, end_time = item_dates(item)
+    location = item['location']
+    description = item['description']
+    return {
+        'title': Truncator(item['title'] or 'Untitled event').chars(200),
+        'description': description,
+        'summary': Truncator(description or item['title']).chars(500),
+        'start_date': start_date,
+        'end_date': end_date,
+        'start_time': start_time,
+        'end_time': end_time,
+        'venue_name': Truncator(location.split(',')[0].strip()).chars(200),
+        'address': Truncator(location or organization.address).chars(300),
+        'city': organization.city,
+        'state': organization.state or 'IL',
+        'website': item['url'][:200] if item['url'].startswith(('http://', 'https://')) else '',
+    }
+
+
+def is_published(item, feed):
+    return feed.publish_events and not item['cancelled']
+
+
+def source_values(values, cancelled):
+    """``values`` and the cancellation as stored in ``Event.source_values``."""
+    return json.loads(json.dumps({**values, 'cancelled': cancelled}, cls=DjangoJSONEncoder))
+
+
+def previous_values(event, item):
+    """What the feed sent for ``event`` last time."""
+    if event.source_values:
+        return event.source_values
+    # Imported before these were kept: go by the event itself, and leave its
+    # publication alone since an editor may have changed it
+    return source_values(
+        {field: getattr(event, field) for field in IMPORTED_FIELDS}, item['cancelled']
+    )
+
+
+def apply_changes(event, values, sent, previous, item, feed):
+    """Copy the values the feed changed onto ``event``; returns the changed fields."""
+    changed = []
+    for field, value in sent.items():
+        if value == previous.get(field):
+            continue
+        if field == 'cancelled':
+            event.is_published = is_published(item, feed)
+            changed.append('is_published')
+        else:
+            setattr(event, field, values[field])
+            changed.append(field)
+    if changed:
+        changed.extend(render_fields(event))
+    return changed
+
+
+def make_slug(feed, uid, title):
+    digest = hashlib.sha1(f'{feed.pk}:{uid}'.encode()).hexdigest()[:10]
+    return f"{slugify(title)[:180] or 'event'}-{digest}"
+
+
+def feed_timezone(feed):
+    city = feed.organization.tenant
+    return zoneinfo.ZoneInfo(city.timezone if city else settings.TIME_ZONE)
+
+
+def upsert_events(feed, items, batch_size=200):
+    """Create or update ``feed``'s current and upcoming events; returns the number written."""
+    today = timezone.localdate(timezone=feed_timezone(feed))
+    # Archived events stay archived even if the feed still lists them
+    archived = set(
+        ArchivedEvent.objects.filter(source_feed=feed).values_list('source_uid', flat=True)
+    )
+    by_uid = {}
+    for item in items:
+        uid = item['uid'][:255]
+        if uid not in archived and item_dates(item)[1] >= today:
+            by_uid[uid] = item
+    uids = list(by_uid)
+
+    organization = feed.organization
+    written = 0
+    for start in range(0, len(uids), batch_size):
+        batch = uids[start : start + batch_size]
+        existing = {
+            event.source_uid: event
+            for event in Event.objects.filter(source_feed=feed, source_uid__in=batch)
+        }
+        now = timezone.now()
+        to_create = []
+        # Fields to write -> events; each event only writes what its feed changed
+        to_update = defaultdict(list)
+        changed_events = []
+        for uid in batch:
+            item = by_uid[uid]
+            values = event_values(item, feed)
+            sent = source_values(values, item['cancelled'])
+            event = existing.get(uid)
+            if event is None:
+                event = Event(
+                    source_feed=feed,
+                    source_uid=uid,
+                    source_values=sent,
+                    slug=make_slug(feed, uid, values['title']),
+                    organization=organization,
+                    tenant=organization.tenant,
+                    is_published=is_published(item, feed),
+                    **values,
+                )
+                render_fields(event)
+                to_create.append(event)
+            elif sent != event.source_values:
+                changed = apply_changes(
+                    event, values, sent, previous_values(event, item), item, feed
+                )
+                event.source_values = sent
+                if changed:
+                    event.updated_at = now
+                    changed += ['updated_at']
+                    changed_events.append(event)
+                to_update[(*changed, 'source_values')].append(event)
+
+        with transaction.atomic():
+            Event.objects.bulk_create(to_create)
+            for fields, events in to_update.items():
+                Event.objects.bulk_update(events, fields)
+            bulk_content_changed(to_create + changed_events)
+        written += len(to_create) + len(changed_events)
+    return written
+
+
+def import_feed(feed, result, batch_size=200):
+    """Apply one fetch result to its feed and record the outcome."""
+    status = result.status
+    error = result.error
+    count = None
+    if status == 'ok':
+        try:
+            items = PARSERS[feed.format](result.body, feed_timezone(feed))
+            count = upsert_events(feed, items, batch_size)
+        except (ET.ParseError, ValueError, KeyError) as exc:
+            status, error = 'error', f"Could not parse feed: {exc}"
+        except DatabaseError as exc:
+            # The batch in progress was rolled back; the next run fetches the feed again
+            status, error = 'error', f"Could not save events: {exc}"
+
+    updates = {
+        'last_checked_at': timezone.now(),
+        'last_status': status,
+        'last_error': error,
+        'last_duration_ms': result.duration_ms,
+        'last_event_count': count,
+    }
+    if status == 'ok':
+        # Only remember validators once the content has been imported
+        updates.update(etag=result.etag[:255], last_modified=result.last_modified[:64])
+    EventFeed.objects.filter(pk=feed.pk).update(**updates)
+    for field, value in updates.items():
+        setattr(feed, field, value)
+    return feed
+
+
+def import_feeds(feeds=None, batch_size=200, force=False):
+    """Fetch and import every active feed (or just ``feeds``); returns the feeds."""
+    if feeds is None:
+        feeds = EventFeed.objects.filter(is_active=True)
+    feeds = list(feeds.select_related('organization', 'organization__tenant'))
+    results = asyncio.run(fetch_all(feeds, settings.IMPORT_CONCURRENCY, force=force))
+    return [import_feed(feed, result, batch_size) for feed, result in zip(feeds, results)]
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bulletin.archive import archive_expired
+
+
+class Command(BaseCommand):
+    help = "Move past events, ended specials and expired promotions into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help="Only archive rows that ended more than this many days ago",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Rows moved per transaction (default: 500)",
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Report how many rows would be archived without moving them",
+        )
+
+    def handle(self, *args, **options):
+        counts = archive_expired(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        verb = "Would archive" if options['dry_run'] else "Archived"
+        for label, count in counts.items():
+            self.stdout.write(f"{verb} {count} {label}")
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bulletin import monthly
+from bulletin.models import (
+    City,
+    Organization,
+    News,
+    Event,
+    Special,
+    Promotion,
+    Resource,
+    TimelineEntry,
+)
+
+CITY_SCOPED_MODELS = [Organization, News, Event, Special, Promotion, Resource, TimelineEntry]
+
+
+class Command(BaseCommand):
+    help = (
+        "Attach content without a city to the given city "
+        "(used when converting a single-city install)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('city', help="Slug of the City to assign")
+
+    def handle(self, *args, **options):
+        try:
+            city = City.objects.get(slug=options['city'])
+        except City.DoesNotExist:
+            raise CommandError(f"No city with slug '{options['city']}'.")
+
+        with transaction.atomic():
+            for model in CITY_SCOPED_MODELS:
+                count = model.objects.filter(tenant__isnull=True).update(tenant=city)
+                self.stdout.write(f"{model._meta.verbose_name_plural}: {count}")
+            # Months are counted per city (and in its timezone)
+            monthly.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f"Assigned unscoped content to {city}."))
@@ -0,0 +1,161 @@
+import http.client
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+# Hop-by-hop headers a proxy must not forward
+HOP_HEADERS = {
+    'connection',
+    'keep-alive',
+    'proxy-authenticate',
+    'proxy-authorization',
+    'te',
+    'trailers',
+    'transfer-encoding',
+    'upgrade',
+}
+
+
+class SurrogateCache:
+    """In-memory response cache indexed by surrogate key."""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry['expires'] < time.monotonic():
+                del self.entries[key]
+                entry = None
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+
+    def purge(self, keys):
+        with self.lock:
+            stale = [key for key, entry in self.entries.items() if entry['keys'] & keys]
+            for key in stale:
+                del self.entries[key]
+        return len(stale)
+
+
+def make_handler(backend, cache, stdout):
+    key_header = settings.SURROGATE_KEY_HEADER
+
+    class ProxyHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            stdout.write(format % args)
+
+        def do_GET(self):
+            cacheable = 'cookie' not in self.headers
+            cache_key = (self.command, self.headers.get('Host', ''), self.path)
+            entry = cache.get(cache_key) if cacheable else None
+            if entry is not None:
+                return self.send(entry['status'], entry['headers'], entry['body'], 'HIT')
+
+            status, headers, body = self.forward()
+            surrogate_control = dict(headers).get('Surrogate-Control', '')
+            match = MAX_AGE_RE.search(surrogate_control)
+            headers = [(name, value) for name, value in headers if name != 'Surrogate-Control']
+            if cacheable and match and status == 200:
+                cache.set(
+                    cache_key,
+                    {
+                        'status': status,
+                        'headers': headers,
+                        'body': body,
+                        'keys': set(dict(headers).get(key_header, '').split()),
+                        'expires': time.monotonic() + int(match.group(1)),
+                    },
+                )
+            self.send(status, headers, body, 'MISS')
+
+        do_HEAD = do_GET
+
+        def do_POST(self):
+            status, headers, body = self.forward()
+            self.send(status, headers, body, 'PASS')
+
+        def do_PURGE(self):
+            keys = set(self.headers.get(key_header, '').split())
+            purged = cache.purge(keys)
+            self.send(200, [('Content-Type', 'text/plain')], f'Purged {purged}\n'.encode(), 'PURGE')
+
+        def forward(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else None
+            headers = {
+                name: value
+                for name, value in self.headers.items()
+                if name.lower() not in HOP_HEADERS
+            }
+            connection = http.client.HTTPConnection(
+                backend.hostname, backend.port or 80, timeout=30
+            )
+            try:
+                connection.request(self.command, self.path, body=body, headers=headers)
+                response = connection.getresponse()
+                content = response.read()
+                response_headers = [
+                    (name, value)
+                    for name, value in response.getheaders()
+                    if name.lower() not in HOP_HEADERS and name.lower() != 'content-length'
+                ]
+                return response.status, response_headers, content
+            finally:
+                connection.close()
+
+        def send(self, status, headers, body, cache_status):
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.send_header('X-Cache', cache_status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+
+    return ProxyHandler
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a minimal caching reverse proxy that honours Surrogate-Control and "
+        "surrogate-key purges, for trying out CACHE_PURGE_URL locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8080, help="Port to listen on")
+        parser.add_argument(
+            '--backend',
+            default='http://127.0.0.1:8000',
+            help="URL of the Django server to proxy to",
+        )
+
+    def handle(self, *args, **options):
+        backend = urllib.parse.urlsplit(options['backend'])
+        handler = make_handler(backend, SurrogateCache(), self.stdout)
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), handler)
+        self.stdout.write(
+            f"Caching proxy for {options['backend']} on http://127.0.0.1:{options['port']}/ "
+            f"(set CACHE_PURGE_URL=http://127.0.0.1:{options['port']}/)"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
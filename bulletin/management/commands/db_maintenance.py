@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.template.defaultfilters import filesizeformat
+
+from bulletin.backup import (
+    BackupError,
+    backup_database,
+    enable_incremental_vacuum,
+    optimize_database,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Take an online backup of the SQLite database (verified with integrity_check, keeping "
+        "the newest DB_BACKUP_KEEP), then run PRAGMA optimize and an incremental vacuum."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default='default', help="Database alias (default: default)"
+        )
+        parser.add_argument(
+            '--backup-dir', default=settings.DB_BACKUP_DIR, help="Where backups are written"
+        )
+        parser.add_argument(
+            '--keep', type=int, default=settings.DB_BACKUP_KEEP, help="Backups to keep"
+        )
+        parser.add_argument(
+            '--skip-backup', action='store_true', help="Only run the maintenance steps"
+        )
+        parser.add_argument('--skip-maintenance', action='store_true', help="Only take the backup")
+        parser.add_argument(
+            '--enable-incremental-vacuum',
+            action='store_true',
+            help=(
+                "Switch the database to auto_vacuum=INCREMENTAL first "
+                "(a full VACUUM; blocks writes while it runs)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                f"{options['database']} is a {connection.vendor} database; "
+                "this command is for SQLite."
+            )
+        connection.ensure_connection()
+        raw = connection.connection
+
+        if not options['skip_backup']:
+            try:
+                report = backup_database(raw, options['backup_dir'], options['keep'])
+            except BackupError as error:
+                raise CommandError(str(error))
+            self.stdout.write(
+                f"Backed up to {report['path']} ({filesizeformat(report['bytes'])}) in "
+                f"{report['copy_ms']:.0f} ms over {report['steps']} step(s); integrity_check ok in "
+                f"{report['verify_ms']:.0f} ms"
+            )
+            for path in report['pruned']:
+                self.stdout.write(f"Removed old backup {path}")
+
+        if options['enable_incremental_vacuum']:
+            enable_incremental_vacuum(raw)
+            self.stdout.write("Switched to auto_vacuum=INCREMENTAL")
+
+        if not options['skip_maintenance']:
+            report = optimize_database(raw)
+            self.stdout.write(f"PRAGMA optimize in {report['optimize_ms']:.0f} ms")
+            if report['auto_vacuum'] == 'incremental':
+                self.stdout.write(
+                    f"Incremental vacuum in {report['vacuum_ms']:.0f} ms: "
+                    f"{filesizeformat(report['bytes_before'])} -> "
+                    f"{filesizeformat(report['bytes_after'])}"
+                )
+            else:
+                self.stdout.write(
+                    f"Skipped vacuum: auto_vacuum is {report['auto_vacuum']} "
+                    f"({filesizeformat(report['free_before'])} free of "
+                    f"{filesizeformat(report['bytes_before'])}); "
+                    "run once with --enable-incremental-vacuum"
+                )
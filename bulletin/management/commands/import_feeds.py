@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from bulletin.importer import import_feeds
+from bulletin.models import EventFeed
+
+
+class Command(BaseCommand):
+    help = "Import events from organizations' iCalendar and RSS feeds."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--feed', type=int, action='append', help="Only import the feed with this id"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help="Events upserted per transaction (default: 200)",
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Ignore ETag/Last-Modified and fetch every feed in full",
+        )
+
+    def handle(self, *args, **options):
+        feeds = None
+        if options['feed']:
+            feeds = EventFeed.objects.filter(pk__in=options['feed'])
+        for feed in import_feeds(feeds, batch_size=options['batch_size'], force=options['force']):
+            line = f"{feed.url}: {feed.get_last_status_display()} in {feed.last_duration_ms} ms"
+            if feed.last_event_count:
+                line += f", {feed.last_event_count} event(s) written"
+            if feed.last_error:
+                line += f" ({feed.last_error})"
+            self.stdout.write(line)
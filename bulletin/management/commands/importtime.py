@@ -0,0 +1,119 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# What a gunicorn worker imports before serving its first request
+WORKER_BOOT = (
+    'from django.core.wsgi import get_wsgi_application; get_wsgi_application(); '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+
+def parse_importtime(output):
+    """``(module, self_us, cumulative_us, depth)`` for each line of ``-X importtime`` output."""
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            modules.append((match[4], int(match[1]), int(match[2]), len(match[3]) // 2))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile interpreter start-up with `python -X importtime` and summarize import time "
+        "by package. Profiles a worker boot by default, or `-- <command> [args]` to profile "
+        "a management command. Import times are the fastest of --runs; modules loaded with "
+        "importlib (settings, models, admin) only show up through what they import."
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'command', nargs='*', help="Management command (and arguments) to profile"
+        )
+        parser.add_argument('--top', type=int, default=15, help="Rows per table (default: 15)")
+        parser.add_argument(
+            '--runs', type=int, default=3, help="Best of this many runs (default: 3)"
+        )
+        parser.add_argument(
+            '--modules',
+            action='store_true',
+            help="Also list the slowest individual modules by cumulative time",
+        )
+
+    def handle(self, *args, **options):
+        if options['command']:
+            argv = [
+                sys.executable,
+                '-X',
+                'importtime',
+                os.path.abspath(sys.argv[0]),
+                *options['command'],
+            ]
+            label = 'manage.py ' + ' '.join(options['command'])
+        else:
+            argv = [sys.executable, '-X', 'importtime', '-c', WORKER_BOOT]
+            label = 'worker boot'
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'),
+        }
+        # Otherwise modules edited since their .pyc was written are recompiled on
+        # every run and the compile time is reported as import time
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+        best = None
+        wall_times = []
+        for _ in range(max(options['runs'], 1)):
+            started = time.perf_counter()
+            completed = subprocess.run(
+                argv,
+                cwd=settings.BASE_DIR,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            wall_times.append(time.perf_counter() - started)
+            modules = parse_importtime(completed.stderr)
+            if completed.returncode or not modules:
+                raise CommandError(f"Profiling {label} failed:\n{completed.stderr[-2000:]}")
+            total = sum(self_us for _, self_us, _, _ in modules)
+            if best is None or total < best[0]:
+                best = (total, modules)
+        total, modules = best
+
+        packages = defaultdict(lambda: [0, 0])
+        for name, self_us, _, _ in modules:
+            package = packages[name.partition('.')[0]]
+            package[0] += self_us
+            package[1] += 1
+
+        self.stdout.write(
+            f"{label}: {len(modules)} modules imported in {total / 1000:.1f} ms; "
+            f"process ran in {statistics.median(wall_times) * 1000:.0f} ms "
+            f"(median of {len(wall_times)})"
+        )
+        self.stdout.write(f"\n{'package':<32} {'ms':>8} {'share':>6} {'modules':>8}")
+        ranked = sorted(packages.items(), key=lambda item: item[1][0], reverse=True)
+        for name, (self_us, count) in ranked[: options['top']]:
+            self.stdout.write(
+                f"{name:<32} {self_us / 1000:>8.1f} {self_us / total:>6.1%} {count:>8}"
+            )
+
+        if options['modules']:
+            self.stdout.write(f"\n{'module (cumulative)':<48} {'ms':>8}")
+            for name, _, cumulative_us, _ in sorted(modules, key=lambda m: m[2], reverse=True)[
+                : options['top']
+            ]:
+                self.stdout.write(f"{name:<48} {cumulative_us / 1000:>8.1f}")
@@ -0,0 +1,80 @@
+import os
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bulletin.models import MediaBlob
+from bulletin.storage import BLOB_PREFIX, REFERENCE_FIELDS
+
+# Leave recently written files alone; they may belong to an upload in progress
+ORPHAN_MIN_AGE = 60 * 60
+
+
+class Command(BaseCommand):
+    help = "Recount references to content-addressed media files and delete unreferenced ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Report what would change without touching the database or files",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        counts = Counter()
+        for label, fields in REFERENCE_FIELDS.items():
+            model = apps.get_model(label)
+            for field in fields:
+                names = model.objects.exclude(**{field: ''}).values_list(field, flat=True)
+                counts.update(name for name in names.iterator() if name)
+
+        fixed = 0
+        with transaction.atomic():
+            for blob in MediaBlob.objects.select_for_update():
+                actual = counts.pop(blob.name, 0)
+                if blob.ref_count != actual:
+                    fixed += 1
+                    if not dry_run:
+                        blob.ref_count = actual
+                        blob.save(update_fields=['ref_count'])
+            missing = [MediaBlob(name=name, ref_count=count) for name, count in counts.items()]
+            if missing and not dry_run:
+                MediaBlob.objects.bulk_create(missing)
+
+            unreferenced = list(
+                MediaBlob.objects.filter(ref_count=0).values_list('name', flat=True)
+            )
+            if not dry_run:
+                MediaBlob.objects.filter(ref_count=0).delete()
+
+        known = set(MediaBlob.objects.values_list('name', flat=True))
+        orphans = [name for name in self.blob_files() if name not in known]
+
+        deleted = 0
+        if not dry_run:
+            for name in set(unreferenced) | set(orphans):
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                    deleted += 1
+
+        self.stdout.write(
+            f"Corrected {fixed} counts, added {len(missing)} missing entries, "
+            f"{len(unreferenced)} unreferenced and {len(orphans)} untracked files"
+            f"{'' if dry_run else f', deleted {deleted} files'}."
+        )
+
+    def blob_files(self):
+        """Stored blob names old enough to be safe to judge as orphans."""
+        root = default_storage.path(BLOB_PREFIX)
+        cutoff = time.time() - ORPHAN_MIN_AGE
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                if os.path.getmtime(path) < cutoff:
+                    yield os.path.relpath(path, default_storage.location).replace(os.sep, '/')
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bulletin.ratelimit import get_store
+
+
+class Command(BaseCommand):
+    help = "Show how many requests were throttled (429) and shed (503), by route class."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help="Zero the counters after showing them"
+        )
+
+    def handle(self, *args, **options):
+        store = get_store()
+        counters = store.counters()
+        self.stdout.write(f"{'route':<8} {'throttled':>10} {'shed':>10}   limit")
+        for route, (per_minute, burst) in settings.RATE_LIMITS.items():
+            self.stdout.write(
+                f"{route:<8} {counters.get(f'throttled:{route}', 0):>10} "
+                f"{counters.get(f'shed:{route}', 0):>10}   "
+                f"{per_minute}/min, burst {burst}"
+            )
+        if options['reset']:
+            store.reset_counters()
+            self.stdout.write("Counters reset.")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bulletin import monthly
+
+
+class Command(BaseCommand):
+    help = "Recount the per-month totals shown beside the news, event and resource archives."
+
+    def handle(self, *args, **options):
+        total = monthly.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} monthly counts."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bulletin import timeline
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized activity timeline from all content tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Rows per bulk insert (default: 500)",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = timeline.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt timeline with {total} entries."))
@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template.defaultfilters import filesizeformat
+
+from bulletin.backup import copy_pages
+from bulletin.caching import set_unknown_content_changed_at
+from bulletin.replicas import is_snapshot, snapshot_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the read-only SQLite snapshots in READ_REPLICAS from the primary database "
+        "with the online backup API."
+    )
+
+    def handle(self, *args, **options):
+        aliases = [alias for alias in settings.READ_REPLICAS if is_snapshot(alias)]
+        if not aliases:
+            self.stdout.write(
+                "No SQLite snapshot replicas are configured (READ_REPLICA_SNAPSHOTS)."
+            )
+            return
+
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError(
+                f"The primary is a {primary.vendor} database; snapshots need SQLite."
+            )
+        primary.ensure_connection()
+
+        first_started = time.time()
+        for alias in aliases:
+            path = snapshot_path(alias)
+            partial = f'{path}.partial'
+            started = time.time()
+            steps = copy_pages(primary.connection, partial)
+            os.replace(partial, path)
+            # Readers compare this with the time of the last content change; a
+            # write during the copy makes SQLite restart it, so the copy has
+            # everything up to when it started
+            os.utime(path, (started, started))
+            connections[alias].close()
+            self.stdout.write(
+                f"Refreshed {alias} ({filesizeformat(os.path.getsize(path))}) in "
+                f"{(time.time() - started) * 1000:.0f} ms over {steps} step(s)"
+            )
+        # Cities whose last change time was lost can use the copies again
+        set_unknown_content_changed_at(first_started)
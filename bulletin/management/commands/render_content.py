@@ -0,0 +1,23 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from bulletin.rendering import RENDERED_FIELDS, backfill
+
+
+class Command(BaseCommand):
+    help = "Re-render the stored HTML bodies and card excerpts of all content."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Rows per bulk update (default: 500)",
+        )
+
+    def handle(self, *args, **options):
+        for label in RENDERED_FIELDS:
+            model = apps.get_model(label)
+            updated = backfill(model, batch_size=options['batch_size'])
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {updated} updated")
+        self.stdout.write(self.style.SUCCESS("Rendered content is up to date."))
@@ -0,0 +1,70 @@
+import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def is_due(job, now, last_run):
+    """
+    Whether ``job`` should run at ``now``.
+
+    Jobs either run ``every`` N minutes, or daily ``at`` "HH:MM" local time
+    (optionally only on ``weekday``, Monday=0).
+    """
+    if 'every' in job:
+        return last_run is None or now - last_run >= datetime.timedelta(minutes=job['every'])
+
+    hour, minute = (int(part) for part in job['at'].split(':'))
+    scheduled = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if 'weekday' in job and now.weekday() != job['weekday']:
+        return False
+    return now >= scheduled and (last_run is None or last_run < scheduled)
+
+
+class Command(BaseCommand):
+    help = "Run the periodic maintenance jobs listed in SCHEDULED_JOBS."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll',
+            type=int,
+            default=30,
+            help="Seconds between schedule checks (default: 30)",
+        )
+
+    def handle(self, *args, **options):
+        started = timezone.localtime()
+        # Daily jobs whose time already passed today wait for tomorrow
+        last_runs = {
+            job.get('name', job['command']): None if 'every' in job else started
+            for job in settings.SCHEDULED_JOBS
+        }
+        self.stdout.write(f"Scheduler started with {len(last_runs)} jobs.")
+
+        while True:
+            now = timezone.localtime()
+            for job in settings.SCHEDULED_JOBS:
+                name = job.get('name', job['command'])
+                if not is_due(job, now, last_runs.get(name)):
+                    continue
+                last_runs[name] = now
+                self.run_job(name, job)
+            time.sleep(options['poll'])
+
+    def run_job(self, name, job):
+        started = time.monotonic()
+        try:
+            call_command(job['command'], *job.get('args', []))
+        except Exception:
+            logger.exception("Scheduled job %s failed", name)
+        else:
+            self.stdout.write(f"Scheduled job {name} finished in {time.monotonic() - started:.1f}s")
+        finally:
+            close_old_connections()
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bulletin.digest import build_digest
+from bulletin.models import City
+
+
+class Command(BaseCommand):
+    help = "Email this week's digest to every active subscriber who hasn't received it yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--city', help="Only send the digest for the city with this slug")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Messages sent between progress updates (default: 500)",
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Render the digests and count recipients without sending",
+        )
+
+    def handle(self, *args, **options):
+        cities = City.objects.all()
+        if options['city']:
+            cities = cities.filter(slug=options['city'])
+            if not cities:
+                raise CommandError(f"No city with slug '{options['city']}'.")
+        cities = list(cities) or [None]
+
+        for city in cities:
+            name = city.slug if city else 'default'
+            digest = build_digest(city)
+            if digest.is_empty():
+                self.stdout.write(f"{name}: nothing to send this week")
+                continue
+            if options['dry_run']:
+                pending = digest.pending_subscribers().count()
+                self.stdout.write(f"{name}: would send '{digest.subject}' to {pending} subscribers")
+                continue
+            sent, failed = digest.send(batch_size=options['batch_size'])
+            self.stdout.write(f"{name}: sent {sent}, failed {failed}")
+            pending = digest.pending_subscribers().count()
+            if pending:
+                self.stdout.write(
+                    f"{name}: {pending} subscribers not sent yet; run again to resume"
+                )
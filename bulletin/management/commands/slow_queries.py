@@ -0,0 +1,91 @@
+import glob
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bulletin.querylog import normalize_sql
+
+SORT_KEYS = {
+    'total': lambda shape: shape['total_ms'],
+    'count': lambda shape: shape['count'],
+    'max': lambda shape: shape['max_ms'],
+    'mean': lambda shape: shape['total_ms'] / shape['count'],
+}
+
+
+class Command(BaseCommand):
+    help = "Summarize the slow-query log by query shape, worst first."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG, help="Log file (rotated copies are read too)"
+        )
+        parser.add_argument(
+            '--top', type=int, default=10, help="Number of query shapes to show (default: 10)"
+        )
+        parser.add_argument(
+            '--sort', choices=sorted(SORT_KEYS), default='total', help="Ranking (default: total)"
+        )
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help="Show the EXPLAIN output of each shape's slowest run",
+        )
+
+    def handle(self, *args, **options):
+        shapes = {}
+        skipped = 0
+        for path in sorted(glob.glob(glob.escape(options['log']) + '*')):
+            with open(path, encoding='utf-8') as log:
+                for line in log:
+                    try:
+                        entry = json.loads(line)
+                        sql, duration = entry['sql'], float(entry['duration_ms'])
+                    except (ValueError, KeyError, TypeError):
+                        skipped += 1
+                        continue
+                    shape = shapes.setdefault(
+                        normalize_sql(sql),
+                        {
+                            'count': 0,
+                            'total_ms': 0.0,
+                            'max_ms': 0.0,
+                            'views': Counter(),
+                            'slowest': None,
+                        },
+                    )
+                    shape['count'] += 1
+                    shape['total_ms'] += duration
+                    shape['views'][entry.get('view') or '-'] += 1
+                    if duration >= shape['max_ms']:
+                        shape['max_ms'] = duration
+                        shape['slowest'] = entry
+
+        if not shapes:
+            self.stdout.write(f"No slow queries logged in {options['log']}")
+            return
+
+        ranked = sorted(
+            shapes.items(), key=lambda item: SORT_KEYS[options['sort']](item[1]), reverse=True
+        )
+        total = sum(shape['count'] for shape in shapes.values())
+        self.stdout.write(f"{total} slow queries in {len(shapes)} shapes\n")
+        for sql, shape in ranked[: options['top']]:
+            views = ', '.join(f'{view} ({count})' for view, count in shape['views'].most_common(3))
+            self.stdout.write(
+                f"{shape['count']:>6} runs  total {shape['total_ms']:>9.1f} ms  "
+                f"mean {shape['total_ms'] / shape['count']:>7.1f} ms  "
+                f"max {shape['max_ms']:>7.1f} ms"
+            )
+            self.stdout.write(f"  views: {views}")
+            self.stdout.write(f"  {sql}")
+            if options['plans'] and shape['slowest'].get('plan'):
+                self.stdout.write(f"  params: {shape['slowest'].get('params')}")
+                for plan_line in shape['slowest']['plan']:
+                    self.stdout.write(f"    {plan_line}")
+            self.stdout.write('')
+        if skipped:
+            self.stderr.write(f"Skipped {skipped} unreadable lines")
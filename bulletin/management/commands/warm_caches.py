@@ -0,0 +1,47 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bulletin import monthly, schedule
+from bulletin.cities import activate_city
+from bulletin.models import City
+
+
+class Command(BaseCommand):
+    help = (
+        "Build each city's shared promotion schedule for today, and for tomorrow when the "
+        "city's midnight is less than PREWARM_LEAD_MINUTES away, so the date rollover "
+        "finds it ready."
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tomorrow', action='store_true', help="Build tomorrow's whatever the time"
+        )
+
+    def handle(self, *args, **options):
+        lead = datetime.timedelta(minutes=settings.PREWARM_LEAD_MINUTES)
+        for city in list(City.objects.all()) or [None]:
+            name = city.slug if city else 'default'
+            tz = monthly.city_timezone(city)
+            now = timezone.localtime(timezone=tz)
+            today = now.date()
+            midnight = datetime.datetime.combine(
+                today + datetime.timedelta(days=1), datetime.time(), tzinfo=tz
+            )
+            days = [today]
+            if options['tomorrow'] or midnight - now <= lead:
+                days.append(today + datetime.timedelta(days=1))
+
+            with activate_city(city), timezone.override(tz):
+                for day in days:
+                    started = time.perf_counter()
+                    promotions = schedule.get_day_schedule(day, city)
+                    self.stdout.write(
+                        f"{name} {day}: {len(promotions)} promotion(s) "
+                        f"({(time.perf_counter() - started) * 1000:.0f} ms)"
+                    )
@@ -0,0 +1,217 @@
+"""
+Serving user-uploaded media.
+
+``serve_media`` is used in development and, with ``SERVE_MEDIA`` enabled, in
+production where no separate web server sits in front of Gunicorn. Files are
+returned as ``FileResponse`` objects so the WSGI server's ``wsgi.file_wrapper``
+can hand them to ``sendfile()`` instead of copying bytes through Python. Byte
+ranges and conditional requests (ETag / Last-Modified) are supported, and the
+result of ``stat()`` is kept in a small per-process cache.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .storage import is_content_addressed
+
+# Content-addressed files never change, so browsers and proxies can keep them
+# for a year without revalidating
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_stat_cache = OrderedDict()
+
+
+class FileInfo:
+    """The metadata needed to answer a request without touching the file."""
+
+    def __init__(self, full_path, size, mtime, content_type, encoding, etag):
+        self.full_path = full_path
+        self.size = size
+        self.mtime = mtime
+        self.content_type = content_type
+        self.encoding = encoding
+        self.etag = etag
+        self.checked_at = time.monotonic()
+
+
+class RangeFile:
+    """
+    Limit reads from an open file to ``length`` bytes from its current position.
+
+    ``fileno()`` is passed through so Gunicorn can still ``sendfile()`` the
+    range; it sends ``Content-Length`` bytes from the file's current offset.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def resolve_path(path, document_root):
+    path = posixpath.normpath(path).lstrip('/')
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404('File not found')
+    try:
+        return safe_join(document_root, path)
+    except ValueError:
+        raise Http404('File not found')
+
+
+def get_file_info(path, document_root):
+    """Return cached ``FileInfo`` for ``path``, re-reading it after MEDIA_STAT_CACHE_SECONDS."""
+    full_path = resolve_path(path, document_root)
+    info = _stat_cache.get(full_path)
+    # Content-addressed files never change, so their entries never go stale
+    if info is not None and (
+        is_content_addressed(path)
+        or time.monotonic() - info.checked_at < settings.MEDIA_STAT_CACHE_SECONDS
+    ):
+        _stat_cache.move_to_end(full_path)
+        return info
+
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        _stat_cache.pop(full_path, None)
+        raise Http404('File not found')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    if is_content_addressed(path):
+        etag = '"%s"' % Path(path).stem
+    else:
+        etag = '"%x-%x"' % (stat.st_size, stat.st_mtime_ns)
+    info = FileInfo(
+        full_path,
+        stat.st_size,
+        int(stat.st_mtime),
+        content_type or 'application/octet-stream',
+        encoding,
+        etag,
+    )
+    _stat_cache[full_path] = info
+    while len(_stat_cache) > settings.MEDIA_STAT_CACHE_SIZE:
+        _stat_cache.popitem(last=False)
+    return info
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` for a single ``bytes=`` range, ``None`` to send the
+    whole file, or ``False`` if the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: a full response is always allowed
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def range_applies(request, info):
+    """Honour If-Range only when the client's copy is still current."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == info.etag
+    return parse_http_date_safe(if_range) == info.mtime
+
+
+@require_safe
+def serve_media(request, path, document_root=None):
+    info = get_file_info(path, document_root or settings.MEDIA_ROOT)
+
+    headers = {
+        'ETag': info.etag,
+        'Last-Modified': http_date(info.mtime),
+        'Accept-Ranges': 'bytes',
+    }
+    if is_content_addressed(path):
+        headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        headers['Expires'] = http_date(time.time() + IMMUTABLE_MAX_AGE)
+
+    response = get_conditional_response(
+        request,
+        etag=info.etag,
+        last_modified=info.mtime,
+        response=HttpResponse(headers=headers),
+    )
+    if response.status_code != 200:
+        return response
+
+    byte_range = None
+    if 'Range' in request.headers and range_applies(request, info):
+        byte_range = parse_range(request.headers['Range'], info.size)
+        if byte_range is False:
+            response = HttpResponse(status=416, headers=headers)
+            response['Content-Range'] = f'bytes */{info.size}'
+            return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=info.content_type, headers=headers)
+        response['Content-Length'] = info.size
+        return response
+
+    try:
+        file = open(info.full_path, 'rb')
+    except OSError:
+        _stat_cache.pop(info.full_path, None)
+        raise Http404('File not found')
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        file.seek(start)
+        response = FileResponse(
+            RangeFile(file, length), status=206, content_type=info.content_type, headers=headers
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{info.size}'
+    else:
+        length = info.size
+        response = FileResponse(file, content_type=info.content_type, headers=headers)
+    # Set explicitly so the file wrapper knows exactly how much to send
+    response['Content-Length'] = length
+    if info.encoding:
+        response['Content-Encoding'] = info.encoding
+    return response
@@ -0,0 +1,86 @@
+import zoneinfo
+
+from django.conf import settings
+from django.http import Http404
+from django.utils import timezone
+from django.utils.cache import cc_delim_re
+
+from .cities import get_city_for_host, has_cities, set_current_city, reset_current_city
+
+# Served at any host, with no city once City rows exist
+CITYLESS_PATHS = ('/admin/', '/static/', '/media/')
+
+
+class CityMiddleware:
+    """Select the City for each request from its host and activate its timezone."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        city = get_city_for_host(request.get_host())
+        request.city = city
+        if city is None and not request.path.startswith(CITYLESS_PATHS) and has_cities():
+            # Without a city the pages would list every city's content
+            raise Http404("No city is served at this host")
+        token = set_current_city(city)
+        if city is not None:
+            timezone.activate(zoneinfo.ZoneInfo(city.timezone))
+        try:
+            return self.get_response(request)
+        finally:
+            if city is not None:
+                timezone.deactivate()
+            reset_current_city(token)
+
+
+class AnonymousFastPathMiddleware:
+    """
+    Keep public pages free of per-visitor state.
+
+    Session, auth and CSRF middleware are lazy, and public templates never
+    read ``user`` (the admin link is shown client-side from a hint cookie),
+    so a visitor without a session cookie costs no session or user lookups.
+    This middleware sits outside them and makes sure such responses carry no
+    ``Vary: Cookie`` so downstream caches can share them. On admin pages it
+    sets or clears the non-secret STAFF_HINT_COOKIE the public pages check.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        match = request.resolver_match
+        namespace = match.namespace if match else None
+
+        if namespace == 'admin':
+            self.update_staff_hint(request, response)
+        elif namespace == 'bulletin' and settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            self.remove_cookie_vary(response)
+        return response
+
+    def update_staff_hint(self, request, response):
+        is_staff = request.user.is_active and request.user.is_staff
+        has_hint = settings.STAFF_HINT_COOKIE in request.COOKIES
+        if is_staff and not has_hint:
+            response.set_cookie(
+                settings.STAFF_HINT_COOKIE,
+                '1',
+                max_age=settings.SESSION_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                samesite='Lax',
+            )
+        elif not is_staff and has_hint:
+            response.delete_cookie(settings.STAFF_HINT_COOKIE, samesite='Lax')
+
+    def remove_cookie_vary(self, response):
+        if not response.has_header('Vary'):
+            return
+        vary = [
+            header for header in cc_delim_re.split(response['Vary']) if header.lower() != 'cookie'
+        ]
+        if vary:
+            response['Vary'] = ', '.join(vary)
+        else:
+            del response['Vary']
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('bulletin', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                (
+                    'content_type',
+                    models.CharField(
+                        choices=[
+                            ('news', 'News'),
+                            ('event', 'Event'),
+                            ('special', 'Special'),
+                            ('promotion', 'Promotion'),
+                            ('resource', 'Resource'),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('summary', models.TextField(blank=True, max_length=500)),
+                ('url', models.CharField(max_length=300)),
+                ('sort_timestamp', models.DateTimeField()),
+                ('is_published', models.BooleanField(default=True)),
+                (
+                    'organization',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name='timeline_entries',
+                        to='bulletin.organization',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name_plural': 'Timeline entries',
+                'ordering': ['-sort_timestamp', '-id'],
+                'indexes': [
+                    models.Index(
+                        condition=models.Q(('is_published', True)),
+                        fields=['-sort_timestamp', '-id'],
+                        name='timeline_feed_idx',
+                    )
+                ],
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('content_type', 'object_id'), name='unique_timeline_object'
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,189 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('bulletin', '0002_timelineentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='City',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('name', models.CharField(max_length=100)),
+                ('state', models.CharField(max_length=2)),
+                (
+                    'slug',
+                    models.SlugField(
+                        help_text='Used to namespace cache keys', max_length=100, unique=True
+                    ),
+                ),
+                (
+                    'domain',
+                    models.CharField(
+                        help_text='Host name that serves this city', max_length=255, unique=True
+                    ),
+                ),
+                ('timezone', models.CharField(default='America/Chicago', max_length=64)),
+                ('contact_email', models.EmailField(blank=True, max_length=254)),
+                (
+                    'is_default',
+                    models.BooleanField(
+                        default=False,
+                        help_text="Serve this city for hosts that don't match any city's domain",
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name_plural': 'Cities',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='tenant',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='events',
+                to='bulletin.city',
+                verbose_name='bulletin city',
+            ),
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='tenant',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='news_posts',
+                to='bulletin.city',
+                verbose_name='bulletin city',
+            ),
+        ),
+        migrations.AddField(
+            model_name='organization',
+            name='tenant',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='organizations',
+                to='bulletin.city',
+                verbose_name='bulletin city',
+            ),
+        ),
+        migrations.AddField(
+            model_name='promotion',
+            name='tenant',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='promotions',
+                to='bulletin.city',
+                verbose_name='bulletin city',
+            ),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='tenant',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='resources',
+                to='bulletin.city',
+                verbose_name='bulletin city',
+            ),
+        ),
+        migrations.AddField(
+            model_name='special',
+            name='tenant',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='specials',
+                to='bulletin.city',
+                verbose_name='bulletin city',
+            ),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='tenant',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='timeline_entries',
+                to='bulletin.city',
+                verbose_name='bulletin city',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(
+                condition=models.Q(('is_published', True)),
+                fields=['tenant', 'end_date', 'start_date'],
+                name='event_city_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(
+                condition=models.Q(('is_published', True)),
+                fields=['tenant', '-published_date'],
+                name='news_city_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='organization',
+            index=models.Index(fields=['tenant', 'name'], name='organization_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(
+                condition=models.Q(('is_published', True)),
+                fields=['tenant', 'valid_from'],
+                name='promotion_city_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(
+                condition=models.Q(('is_published', True)),
+                fields=['tenant', '-published_date'],
+                name='resource_city_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='special',
+            index=models.Index(
+                condition=models.Q(('is_published', True)),
+                fields=['tenant', 'end_date', 'start_date'],
+                name='special_city_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(
+                condition=models.Q(('is_published', True)),
+                fields=['tenant', '-sort_timestamp', '-id'],
+                name='timeline_city_feed_idx',
+            ),
+        ),
+    ]
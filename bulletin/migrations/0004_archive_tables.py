@@ -0,0 +1,343 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:26
+
+import django.db.models.deletion
+import recurrence.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('bulletin', '0003_city'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='images',
+            field=models.ManyToManyField(
+                blank=True, related_name='%(class)ss', to='bulletin.image'
+            ),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='organization',
+            field=models.ForeignKey(
+                blank=True,
+                help_text='Hosting organization',
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name='%(class)ss',
+                to='bulletin.organization',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='tenant',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='%(class)ss',
+                to='bulletin.city',
+                verbose_name='bulletin city',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='promotion',
+            name='images',
+            field=models.ManyToManyField(
+                blank=True, related_name='%(class)ss', to='bulletin.image'
+            ),
+        ),
+        migrations.AlterField(
+            model_name='promotion',
+            name='organization',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='%(class)ss',
+                to='bulletin.organization',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='promotion',
+            name='tenant',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='%(class)ss',
+                to='bulletin.city',
+                verbose_name='bulletin city',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='special',
+            name='images',
+            field=models.ManyToManyField(
+                blank=True, related_name='%(class)ss', to='bulletin.image'
+            ),
+        ),
+        migrations.AlterField(
+            model_name='special',
+            name='organization',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='%(class)ss',
+                to='bulletin.organization',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='special',
+            name='tenant',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='%(class)ss',
+                to='bulletin.city',
+                verbose_name='bulletin city',
+            ),
+        ),
+        migrations.CreateModel(
+            name='ArchivedEvent',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('title', models.CharField(max_length=200)),
+                ('slug', models.SlugField(max_length=200, unique=True)),
+                ('description', models.TextField()),
+                (
+                    'summary',
+                    models.TextField(help_text='Brief summary for preview cards', max_length=500),
+                ),
+                ('start_date', models.DateField()),
+                (
+                    'end_date',
+                    models.DateField(
+                        help_text='For multi-day events, same as start_date for single-day'
+                    ),
+                ),
+                ('start_time', models.TimeField(blank=True, null=True)),
+                ('end_time', models.TimeField(blank=True, null=True)),
+                ('venue_name', models.CharField(blank=True, max_length=200)),
+                ('address', models.CharField(max_length=300)),
+                ('city', models.CharField(max_length=100)),
+                ('state', models.CharField(default='IL', max_length=2)),
+                ('zip_code', models.CharField(blank=True, max_length=10)),
+                ('website', models.URLField(blank=True)),
+                (
+                    'registration_url',
+                    models.URLField(blank=True, help_text='Link to RSVP or buy tickets'),
+                ),
+                (
+                    'cost',
+                    models.CharField(
+                        blank=True, help_text="e.g., 'Free', '$10', '$5-$15'", max_length=100
+                    ),
+                ),
+                ('is_published', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                (
+                    'images',
+                    models.ManyToManyField(
+                        blank=True, related_name='%(class)ss', to='bulletin.image'
+                    ),
+                ),
+                (
+                    'organization',
+                    models.ForeignKey(
+                        blank=True,
+                        help_text='Hosting organization',
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name='%(class)ss',
+                        to='bulletin.organization',
+                    ),
+                ),
+                (
+                    'tenant',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='%(class)ss',
+                        to='bulletin.city',
+                        verbose_name='bulletin city',
+                    ),
+                ),
+            ],
+            options={
+                'ordering': ['start_date', 'start_time'],
+                'abstract': False,
+                'indexes': [
+                    models.Index(
+                        condition=models.Q(('is_published', True)),
+                        fields=['tenant', 'end_date', 'start_date'],
+                        name='archivedevent_city_idx',
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPromotion',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('title', models.CharField(max_length=200)),
+                ('slug', models.SlugField(max_length=200, unique=True)),
+                ('description', models.TextField()),
+                (
+                    'summary',
+                    models.TextField(help_text='Brief summary for preview cards', max_length=500),
+                ),
+                (
+                    'recurrence_type',
+                    models.CharField(
+                        choices=[
+                            ('daily', 'Daily'),
+                            ('weekly', 'Weekly'),
+                            ('biweekly', 'Bi-weekly'),
+                            ('monthly', 'Monthly'),
+                            ('custom', 'Custom Pattern'),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    'recurrence_pattern',
+                    recurrence.fields.RecurrenceField(
+                        blank=True, help_text='Define when this promotion recurs', null=True
+                    ),
+                ),
+                ('valid_from', models.DateField(help_text='First date this promotion is valid')),
+                (
+                    'valid_until',
+                    models.DateField(
+                        blank=True, help_text='Last date (leave blank for ongoing)', null=True
+                    ),
+                ),
+                (
+                    'start_time',
+                    models.TimeField(
+                        blank=True, help_text='What time does promotion start?', null=True
+                    ),
+                ),
+                (
+                    'end_time',
+                    models.TimeField(
+                        blank=True, help_text='What time does promotion end?', null=True
+                    ),
+                ),
+                ('is_published', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                (
+                    'images',
+                    models.ManyToManyField(
+                        blank=True, related_name='%(class)ss', to='bulletin.image'
+                    ),
+                ),
+                (
+                    'organization',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='%(class)ss',
+                        to='bulletin.organization',
+                    ),
+                ),
+                (
+                    'tenant',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='%(class)ss',
+                        to='bulletin.city',
+                        verbose_name='bulletin city',
+                    ),
+                ),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'abstract': False,
+                'indexes': [
+                    models.Index(
+                        condition=models.Q(('is_published', True)),
+                        fields=['tenant', 'valid_from'],
+                        name='archivedpromotion_city_idx',
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedSpecial',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('title', models.CharField(max_length=200)),
+                ('slug', models.SlugField(max_length=200, unique=True)),
+                ('description', models.TextField()),
+                (
+                    'summary',
+                    models.TextField(help_text='Brief summary for preview cards', max_length=500),
+                ),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('is_published', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                (
+                    'images',
+                    models.ManyToManyField(
+                        blank=True, related_name='%(class)ss', to='bulletin.image'
+                    ),
+                ),
+                (
+                    'organization',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='%(class)ss',
+                        to='bulletin.organization',
+                    ),
+                ),
+                (
+                    'tenant',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='%(class)ss',
+                        to='bulletin.city',
+                        verbose_name='bulletin city',
+                    ),
+                ),
+            ],
+            options={
+                'ordering': ['-start_date'],
+                'abstract': False,
+                'indexes': [
+                    models.Index(
+                        condition=models.Q(('is_published', True)),
+                        fields=['tenant', 'end_date', 'start_date'],
+                        name='archivedspecial_city_idx',
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:33
+
+from django.db import migrations, models
+
+from bulletin.rendering import RENDERED_FIELDS, backfill
+
+
+def render_existing(apps, schema_editor):
+    for label in RENDERED_FIELDS:
+        backfill(apps.get_model(label))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('bulletin', '0005_mediablob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedevent',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='archivedevent',
+            name='summary_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='archivedpromotion',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='archivedpromotion',
+            name='summary_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='archivedspecial',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='archivedspecial',
+            name='summary_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='summary_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='summary_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='promotion',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='promotion',
+            name='summary_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='special',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='special',
+            name='summary_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:37
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('bulletin', '0006_rendered_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Subscriber',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('email', models.EmailField(max_length=254)),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_digest_week', models.DateField(blank=True, editable=False, null=True)),
+                (
+                    'tenant',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='subscribers',
+                        to='bulletin.city',
+                        verbose_name='bulletin city',
+                    ),
+                ),
+            ],
+            options={
+                'ordering': ['email'],
+                'indexes': [
+                    models.Index(
+                        condition=models.Q(('is_active', True)),
+                        fields=['tenant', 'last_digest_week', 'id'],
+                        name='subscriber_digest_idx',
+                    )
+                ],
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('tenant', 'email'), name='unique_city_subscriber'
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,129 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('bulletin', '0007_subscriber'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedevent',
+            name='source_uid',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='source_uid',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='EventFeed',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('url', models.URLField(max_length=500)),
+                (
+                    'format',
+                    models.CharField(
+                        choices=[('ics', 'iCalendar (.ics)'), ('rss', 'RSS')],
+                        default='ics',
+                        max_length=10,
+                    ),
+                ),
+                ('is_active', models.BooleanField(default=True)),
+                (
+                    'publish_events',
+                    models.BooleanField(
+                        default=True,
+                        help_text=(
+                            'Publish imported events immediately (otherwise they wait for review)'
+                        ),
+                    ),
+                ),
+                ('etag', models.CharField(blank=True, editable=False, max_length=255)),
+                ('last_modified', models.CharField(blank=True, editable=False, max_length=64)),
+                ('last_checked_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                (
+                    'last_status',
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ('ok', 'Imported'),
+                            ('not_modified', 'Not modified'),
+                            ('error', 'Error'),
+                        ],
+                        editable=False,
+                        max_length=20,
+                    ),
+                ),
+                ('last_error', models.TextField(blank=True, editable=False)),
+                (
+                    'last_duration_ms',
+                    models.PositiveIntegerField(blank=True, editable=False, null=True),
+                ),
+                (
+                    'last_event_count',
+                    models.PositiveIntegerField(blank=True, editable=False, null=True),
+                ),
+                (
+                    'organization',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='event_feeds',
+                        to='bulletin.organization',
+                    ),
+                ),
+            ],
+            options={
+                'ordering': ['organization__name', 'url'],
+            },
+        ),
+        migrations.AddField(
+            model_name='archivedevent',
+            name='source_feed',
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name='%(class)ss',
+                to='bulletin.eventfeed',
+            ),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='source_feed',
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name='%(class)ss',
+                to='bulletin.eventfeed',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='archivedevent',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('source_feed__isnull', False)),
+                fields=('source_feed', 'source_uid'),
+                name='archivedevent_source_uid',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('source_feed__isnull', False)),
+                fields=('source_feed', 'source_uid'),
+                name='event_source_uid',
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:51
+
+import bulletin.images
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('bulletin', '0008_event_feeds'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='image',
+            name='image',
+            field=models.ImageField(
+                upload_to='images/%Y/%m/', validators=[bulletin.images.validate_image_upload]
+            ),
+        ),
+        migrations.AlterField(
+            model_name='organization',
+            name='logo',
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                upload_to='organizations/logos/',
+                validators=[bulletin.images.validate_image_upload],
+            ),
+        ),
+    ]
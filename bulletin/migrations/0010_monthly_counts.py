@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from bulletin.monthly import rebuild
+
+
+def count_existing(apps, schema_editor):
+    rebuild(apps)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('bulletin', '0009_image_upload_limits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCount',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                (
+                    'content_type',
+                    models.CharField(
+                        choices=[('news', 'News'), ('event', 'Event'), ('resource', 'Resource')],
+                        max_length=20,
+                    ),
+                ),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField()),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedevent',
+            index=models.Index(
+                condition=models.Q(('is_published', True)),
+                fields=['tenant', 'start_date'],
+                name='archivedevent_city_start_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(
+                condition=models.Q(('is_published', True)),
+                fields=['tenant', 'start_date'],
+                name='event_city_start_idx',
+            ),
+        ),
+        migrations.AddField(
+            model_name='monthlycount',
+            name='tenant',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='monthly_counts',
+                to='bulletin.city',
+                verbose_name='bulletin city',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlycount',
+            constraint=models.UniqueConstraint(
+                fields=('tenant', 'content_type', 'year', 'month'), name='unique_monthly_count'
+            ),
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
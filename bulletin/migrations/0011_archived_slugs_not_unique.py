@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bulletin", "0010_monthly_counts"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="archivedevent",
+            name="slug",
+            field=models.SlugField(max_length=200),
+        ),
+        migrations.AlterField(
+            model_name="archivedpromotion",
+            name="slug",
+            field=models.SlugField(max_length=200),
+        ),
+        migrations.AlterField(
+            model_name="archivedspecial",
+            name="slug",
+            field=models.SlugField(max_length=200),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:21
+
+from django.db import migrations, models
+
+
+def remove_duplicates(apps, schema_editor):
+    # Keep one row per address, preferring an active one
+    Subscriber = apps.get_model('bulletin', 'Subscriber')
+    kept = set()
+    duplicates = []
+    rows = Subscriber.objects.filter(tenant__isnull=True).order_by('-is_active', 'pk')
+    for pk, email in rows.values_list('pk', 'email'):
+        if email in kept:
+            duplicates.append(pk)
+        kept.add(email)
+    Subscriber.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bulletin", "0011_archived_slugs_not_unique"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="subscriber",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("tenant__isnull", True)),
+                fields=("email",),
+                name="unique_subscriber",
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:25
+
+from django.db import migrations, models
+
+from bulletin.monthly import rebuild
+
+
+def recount(apps, schema_editor):
+    # Racing refreshes could add duplicate rows without a city; counting
+    # again replaces them all
+    rebuild(apps)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bulletin", "0012_unique_subscriber_without_city"),
+    ]
+
+    operations = [
+        migrations.RunPython(recount, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="monthlycount",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("tenant__isnull", True)),
+                fields=("content_type", "year", "month"),
+                name="unique_monthly_count_without_city",
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bulletin", "0013_unique_monthly_count_without_city"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedevent",
+            name="source_values",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="source_values",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
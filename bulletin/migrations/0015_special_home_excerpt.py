@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:10
+
+from django.db import migrations, models
+
+from bulletin.rendering import backfill
+
+
+def render_existing(apps, schema_editor):
+    for name in ('Special', 'ArchivedSpecial'):
+        backfill(apps.get_model('bulletin', name))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('bulletin', '0014_event_source_values'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedspecial',
+            name='home_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='special',
+            name='home_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_existing, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,63 @@
+from django.conf import settings
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.urls import reverse
 from django.utils import timezone
 from recurrence.fields import RecurrenceField
-import datetime
+import uuid
+import zoneinfo
+
+from .images import validate_image_upload
+from .recurrences import occurs_on
+from .rendering import RENDERED_FIELDS, render_fields
+
+
+class City(models.Model):
+    """A city edition of the bulletin, selected per request by host name."""
+
+    name = models.CharField(max_length=100)
+    state = models.CharField(max_length=2)
+    slug = models.SlugField(max_length=100, unique=True, help_text="Used to namespace cache keys")
+    domain = models.CharField(
+        max_length=255, unique=True, help_text="Host name that serves this city"
+    )
+    timezone = models.CharField(max_length=64, default=settings.TIME_ZONE)
+    contact_email = models.EmailField(blank=True)
+    is_default = models.BooleanField(
+        default=False, help_text="Serve this city for hosts that don't match any city's domain"
+    )
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'Cities'
+
+    def __str__(self):
+        return f"{self.name}, {self.state}"
+
+    def clean(self):
+        try:
+            zoneinfo.ZoneInfo(self.timezone)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            raise ValidationError({'timezone': 'Unknown timezone.'})
+
+
+class CityQuerySet(models.QuerySet):
+    def for_city(self, city):
+        """Restrict to rows belonging to ``city``; no-op in single-city deployments."""
+        if city is None:
+            return self
+        return self.filter(tenant=city)
+
+
+def city_field(related_name):
+    return models.ForeignKey(
+        City,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name=related_name,
+        verbose_name='bulletin city',
+    )
 
 
 class Organization(models.Model):
@@ -42,22 +96,77 @@ class Organization(models.Model):
     zip_code = models.CharField(max_length=10, blank=True)
 
     # Media
-    logo = models.ImageField(upload_to='organizations/logos/', blank=True, null=True)
+    logo = models.ImageField(
+        upload_to='organizations/logos/', blank=True, null=True, validators=[validate_image_upload]
+    )
 
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # City edition
+    tenant = city_field('organizations')
+
+    objects = CityQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['tenant', 'name'], name='organization_city_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class EventFeed(models.Model):
+    """An organization's published event calendar, imported by ``import_feeds``."""
+
+    FORMAT_CHOICES = [
+        ('ics', 'iCalendar (.ics)'),
+        ('rss', 'RSS'),
+    ]
+
+    STATUS_CHOICES = [
+        ('ok', 'Imported'),
+        ('not_modified', 'Not modified'),
+        ('error', 'Error'),
+    ]
+
+    organization = models.ForeignKey(
+        Organization, on_delete=models.CASCADE, related_name='event_feeds'
+    )
+    url = models.URLField(max_length=500)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='ics')
+    is_active = models.BooleanField(default=True)
+    publish_events = models.BooleanField(
+        default=True,
+        help_text="Publish imported events immediately (otherwise they wait for review)",
+    )
+
+    # Conditional request validators from the last successful fetch
+    etag = models.CharField(max_length=255, blank=True, editable=False)
+    last_modified = models.CharField(max_length=64, blank=True, editable=False)
+
+    # Result of the last run
+    last_checked_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, blank=True, editable=False
+    )
+    last_error = models.TextField(blank=True, editable=False)
+    last_duration_ms = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    last_event_count = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        ordering = ['organization__name', 'url']
+
+    def __str__(self):
+        return self.url
+
+
 class Image(models.Model):
     """Generic image model that can be associated with different content types."""
-    image = models.ImageField(upload_to='images/%Y/%m/')
+    image = models.ImageField(upload_to='images/%Y/%m/', validators=[validate_image_upload])
     caption = models.CharField(max_length=200, blank=True)
     alt_text = models.CharField(max_length=200, help_text="Alternative text for accessibility")
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -69,13 +178,43 @@ class Image(models.Model):
         return self.caption or f"Image {self.id}"
 
 
-class News(models.Model):
+class MediaBlob(models.Model):
+    """Reference count for a content-addressed media file (see bulletin.storage)."""
+
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
+
+
+class RenderedContentMixin:
+    """Store the HTML and excerpts listed in ``rendering.RENDERED_FIELDS`` on save."""
+
+    def save(self, *args, **kwargs):
+        render_fields(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            for target, (source, _) in RENDERED_FIELDS[self._meta.label].items():
+                if source in update_fields:
+                    update_fields.add(target)
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+
+class News(RenderedContentMixin, models.Model):
     """Blog-style news posts about restaurant openings, closings, product releases, etc."""
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     content = models.TextField()
     summary = models.TextField(max_length=500, help_text="Brief summary for preview cards")
 
+    # Rendered on save
+    content_html = models.TextField(blank=True, editable=False)
+    summary_excerpt = models.TextField(blank=True, editable=False)
+
     # Relationships
     organization = models.ForeignKey(
         Organization,
@@ -96,9 +235,21 @@ class News(models.Model):
     # SEO
     source_url = models.URLField(blank=True, help_text="Link to original source if applicable")
 
+    # City edition
+    tenant = city_field('news_posts')
+
+    objects = CityQuerySet.as_manager()
+
     class Meta:
         ordering = ['-published_date']
         verbose_name_plural = 'News'
+        indexes = [
+            models.Index(
+                fields=['tenant', '-published_date'],
+                condition=models.Q(is_published=True),
+                name='news_city_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -107,13 +258,18 @@ class News(models.Model):
         return reverse('bulletin:news_detail', kwargs={'slug': self.slug})
 
 
-class Event(models.Model):
-    """One-off events like festivals, markets, meetups, etc."""
+class EventBase(RenderedContentMixin, models.Model):
+    """Fields and behaviour shared by live and archived events."""
+
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField()
     summary = models.TextField(max_length=500, help_text="Brief summary for preview cards")
 
+    # Rendered on save
+    description_html = models.TextField(blank=True, editable=False)
+    summary_excerpt = models.TextField(blank=True, editable=False)
+
     # Date and Time
     start_date = models.DateField()
     end_date = models.DateField(help_text="For multi-day events, same as start_date for single-day")
@@ -133,10 +289,10 @@ class Event(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
-        related_name='events',
-        help_text="Hosting organization"
+        related_name='%(class)ss',
+        help_text="Hosting organization",
     )
-    images = models.ManyToManyField(Image, blank=True, related_name='events')
+    images = models.ManyToManyField(Image, blank=True, related_name='%(class)ss')
 
     # Additional Info
     website = models.URLField(blank=True)
@@ -148,8 +304,47 @@ class Event(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True)
 
+    # Import source (see bulletin.importer)
+    source_feed = models.ForeignKey(
+        EventFeed,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='%(class)ss',
+    )
+    source_uid = models.CharField(max_length=255, blank=True, editable=False)
+    # The item as the feed last sent it; re-imports only write what the feed changed
+    source_values = models.JSONField(default=dict, blank=True, editable=False)
+
+    # City edition
+    tenant = city_field('%(class)ss')
+
+    objects = CityQuerySet.as_manager()
+
     class Meta:
+        abstract = True
         ordering = ['start_date', 'start_time']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source_feed', 'source_uid'],
+                condition=models.Q(source_feed__isnull=False),
+                name='%(class)s_source_uid',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['tenant', 'end_date', 'start_date'],
+                condition=models.Q(is_published=True),
+                name='%(class)s_city_idx',
+            ),
+            # Month and year archive pages
+            models.Index(
+                fields=['tenant', 'start_date'],
+                condition=models.Q(is_published=True),
+                name='%(class)s_city_start_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.start_date})"
@@ -163,43 +358,74 @@ class Event(models.Model):
 
     def is_upcoming(self):
         """Check if event is in the future."""
-        return self.end_date >= timezone.now().date()
+        return self.end_date >= timezone.localdate()
 
     def is_past(self):
         """Check if event has already happened."""
-        return self.end_date < timezone.now().date()
+        return self.end_date < timezone.localdate()
 
     def is_multiday(self):
         """Check if event spans multiple days."""
         return self.end_date > self.start_date
 
 
-class Special(models.Model):
-    """Temporary limited edition offerings from businesses."""
+class Event(EventBase):
+    """One-off events like festivals, markets, meetups, etc."""
+
+
+class ArchivedEvent(EventBase):
+    """Past events moved out of the live table by ``archive_expired``."""
+
+    # Not unique: a live slug can be reused after archiving, and archived again
+    slug = models.SlugField(max_length=200, db_index=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class SpecialBase(RenderedContentMixin, models.Model):
+    """Fields and behaviour shared by live and archived specials."""
+
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField()
     summary = models.TextField(max_length=500, help_text="Brief summary for preview cards")
 
+    # Rendered on save
+    description_html = models.TextField(blank=True, editable=False)
+    summary_excerpt = models.TextField(blank=True, editable=False)
+    home_excerpt = models.TextField(blank=True, editable=False)
+
     # Date Range
     start_date = models.DateField()
     end_date = models.DateField()
 
     # Relationships
     organization = models.ForeignKey(
-        Organization,
-        on_delete=models.CASCADE,
-        related_name='specials'
+        Organization, on_delete=models.CASCADE, related_name='%(class)ss'
     )
-    images = models.ManyToManyField(Image, blank=True, related_name='specials')
+    images = models.ManyToManyField(Image, blank=True, related_name='%(class)ss')
 
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True)
 
+    # City edition
+    tenant = city_field('%(class)ss')
+
+    objects = CityQuerySet.as_manager()
+
     class Meta:
+        abstract = True
         ordering = ['-start_date']
+        indexes = [
+            models.Index(
+                fields=['tenant', 'end_date', 'start_date'],
+                condition=models.Q(is_published=True),
+                name='%(class)s_city_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} at {self.organization.name}"
@@ -207,7 +433,7 @@ class Special(models.Model):
     def clean(self):
         if self.end_date < self.start_date:
             raise ValidationError({'end_date': 'End date cannot be before start date.'})
-        if self.start_date < timezone.now().date():
+        if self.start_date < timezone.localdate():
             raise ValidationError({'start_date': 'Start date cannot be in the past.'})
 
     def get_absolute_url(self):
@@ -215,12 +441,26 @@ class Special(models.Model):
 
     def is_active(self):
         """Check if special is currently active."""
-        today = timezone.now().date()
+        today = timezone.localdate()
         return self.start_date <= today <= self.end_date
 
 
-class Promotion(models.Model):
-    """Recurring or one-time sales and deals from businesses."""
+class Special(SpecialBase):
+    """Temporary limited edition offerings from businesses."""
+
+
+class ArchivedSpecial(SpecialBase):
+    """Ended specials moved out of the live table by ``archive_expired``."""
+
+    # Not unique: a live slug can be reused after archiving, and archived again
+    slug = models.SlugField(max_length=200, db_index=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class PromotionBase(RenderedContentMixin, models.Model):
+    """Fields and behaviour shared by live and archived promotions."""
 
     RECURRENCE_TYPE_CHOICES = [
         ('daily', 'Daily'),
@@ -235,6 +475,10 @@ class Promotion(models.Model):
     description = models.TextField()
     summary = models.TextField(max_length=500, help_text="Brief summary for preview cards")
 
+    # Rendered on save
+    description_html = models.TextField(blank=True, editable=False)
+    summary_excerpt = models.TextField(blank=True, editable=False)
+
     # Recurrence Pattern
     recurrence_type = models.CharField(max_length=20, choices=RECURRENCE_TYPE_CHOICES)
     recurrence_pattern = RecurrenceField(
@@ -253,19 +497,30 @@ class Promotion(models.Model):
 
     # Relationships
     organization = models.ForeignKey(
-        Organization,
-        on_delete=models.CASCADE,
-        related_name='promotions'
+        Organization, on_delete=models.CASCADE, related_name='%(class)ss'
     )
-    images = models.ManyToManyField(Image, blank=True, related_name='promotions')
+    images = models.ManyToManyField(Image, blank=True, related_name='%(class)ss')
 
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True)
 
+    # City edition
+    tenant = city_field('%(class)ss')
+
+    objects = CityQuerySet.as_manager()
+
     class Meta:
+        abstract = True
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['tenant', 'valid_from'],
+                condition=models.Q(is_published=True),
+                name='%(class)s_city_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} at {self.organization.name}"
@@ -280,7 +535,7 @@ class Promotion(models.Model):
     def is_active_on_date(self, check_date=None):
         """Check if promotion is active on a given date."""
         if check_date is None:
-            check_date = timezone.now().date()
+            check_date = timezone.localdate()
 
         # Check if date is within valid range
         if check_date < self.valid_from:
@@ -288,18 +543,25 @@ class Promotion(models.Model):
         if self.valid_until and check_date > self.valid_until:
             return False
 
-        # Check recurrence pattern
-        if self.recurrence_pattern:
-            # Convert date to datetime for recurrence checking
-            check_datetime = timezone.make_aware(
-                datetime.datetime.combine(check_date, datetime.time.min)
-            )
-            return check_datetime in self.recurrence_pattern
+        # Check recurrence pattern (compiled rules are cached across requests)
+        return occurs_on(self, check_date)
+
+
+class Promotion(PromotionBase):
+    """Recurring or one-time sales and deals from businesses."""
 
-        return True
 
+class ArchivedPromotion(PromotionBase):
+    """Expired promotions moved out of the live table by ``archive_expired``."""
 
-class Resource(models.Model):
+    # Not unique: a live slug can be reused after archiving, and archived again
+    slug = models.SlugField(max_length=200, db_index=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class Resource(RenderedContentMixin, models.Model):
     """Lists and guides about local vegan resources."""
 
     RESOURCE_TYPE_CHOICES = [
@@ -315,6 +577,9 @@ class Resource(models.Model):
     content = models.TextField()
     summary = models.TextField(max_length=500, help_text="Brief summary for preview cards")
 
+    # Rendered on save
+    content_html = models.TextField(blank=True, editable=False)
+
     # Relationships
     organizations = models.ManyToManyField(
         Organization,
@@ -331,11 +596,157 @@ class Resource(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True)
 
+    # City edition
+    tenant = city_field('resources')
+
+    objects = CityQuerySet.as_manager()
+
     class Meta:
         ordering = ['-published_date']
+        indexes = [
+            models.Index(
+                fields=['tenant', '-published_date'],
+                condition=models.Q(is_published=True),
+                name='resource_city_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
     def get_absolute_url(self):
         return reverse('bulletin:resource_detail', kwargs={'slug': self.slug})
+
+
+class TimelineEntry(models.Model):
+    """Denormalized row per content item, kept in sync by signals for the combined feed."""
+
+    CONTENT_TYPE_CHOICES = [
+        ('news', 'News'),
+        ('event', 'Event'),
+        ('special', 'Special'),
+        ('promotion', 'Promotion'),
+        ('resource', 'Resource'),
+    ]
+
+    content_type = models.CharField(max_length=20, choices=CONTENT_TYPE_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=200)
+    summary = models.TextField(max_length=500, blank=True)
+    url = models.CharField(max_length=300)
+    sort_timestamp = models.DateTimeField()
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='timeline_entries',
+    )
+    is_published = models.BooleanField(default=True)
+
+    # City edition
+    tenant = city_field('timeline_entries')
+
+    objects = CityQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-sort_timestamp', '-id']
+        verbose_name_plural = 'Timeline entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id'], name='unique_timeline_object'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['-sort_timestamp', '-id'],
+                condition=models.Q(is_published=True),
+                name='timeline_feed_idx',
+            ),
+            models.Index(
+                fields=['tenant', '-sort_timestamp', '-id'],
+                condition=models.Q(is_published=True),
+                name='timeline_city_feed_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_content_type_display()}: {self.title}"
+
+
+class MonthlyCount(models.Model):
+    """Published items per calendar month, kept current by signals for the archive sidebars."""
+
+    CONTENT_TYPE_CHOICES = [
+        ('news', 'News'),
+        ('event', 'Event'),
+        ('resource', 'Resource'),
+    ]
+
+    content_type = models.CharField(max_length=20, choices=CONTENT_TYPE_CHOICES)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField()
+
+    # City edition
+    tenant = city_field('monthly_counts')
+
+    objects = CityQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-year', '-month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tenant', 'content_type', 'year', 'month'], name='unique_monthly_count'
+            ),
+            # NULLs are distinct, so the constraint above doesn't cover single-city installs
+            models.UniqueConstraint(
+                fields=['content_type', 'year', 'month'],
+                condition=models.Q(tenant__isnull=True),
+                name='unique_monthly_count_without_city',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_content_type_display()} {self.year}-{self.month:02d}: {self.count}"
+
+
+class Subscriber(models.Model):
+    """Email address that receives the weekly digest for its city."""
+
+    email = models.EmailField()
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Monday of the last digest week sent; lets an interrupted send resume
+    last_digest_week = models.DateField(null=True, blank=True, editable=False)
+
+    # City edition
+    tenant = city_field('subscribers')
+
+    objects = CityQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['email']
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'email'], name='unique_city_subscriber'),
+            # NULLs are distinct, so the constraint above doesn't cover single-city installs
+            models.UniqueConstraint(
+                fields=['email'],
+                condition=models.Q(tenant__isnull=True),
+                name='unique_subscriber',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['tenant', 'last_digest_week', 'id'],
+                condition=models.Q(is_active=True),
+                name='subscriber_digest_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.email
+
+    def get_unsubscribe_url(self):
+        return reverse('bulletin:unsubscribe', kwargs={'token': self.token})
@@ -0,0 +1,213 @@
+"""
+Date-based archives of news, resources and events.
+
+Archive pages select one year or month with a range query on the date
+column (``published_date`` or ``start_date``), which the per-city indexes
+cover, instead of paging back through the list with a growing OFFSET.
+The sidebar's per-month counts come from ``MonthlyCount`` rows rather than
+a ``GROUP BY`` over the table: saving or deleting an item recounts the one
+or two months it is (or was) in, with the same indexed range query.
+Months are calendar months in the city's timezone.
+
+A month is closed once it has ended; its page can no longer gain items
+except through edits, which purge it, so the proxy keeps it for
+ARCHIVE_CACHE_SECONDS.
+"""
+import datetime
+import zoneinfo
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import ArchivedEvent, Event, MonthlyCount, News, Resource
+
+# MonthlyCount.content_type -> (models counted, date field)
+ARCHIVES = {
+    'news': ((News,), 'published_date'),
+    'event': ((Event, ArchivedEvent), 'start_date'),
+    'resource': ((Resource,), 'published_date'),
+}
+
+ARCHIVE_TYPES = {
+    model: content_type for content_type, (models, _) in ARCHIVES.items() for model in models
+}
+
+
+def city_timezone(city):
+    return zoneinfo.ZoneInfo(city.timezone if city else settings.TIME_ZONE)
+
+
+def today(city):
+    return timezone.localdate(timezone=city_timezone(city))
+
+
+def month_of(value, city):
+    """``(year, month)`` of a date or datetime in ``city``'s timezone, or None."""
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value, city_timezone(city))
+    return value.year, value.month
+
+
+def next_month(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def period_bounds(year, month=None):
+    """First day of the year or month and the first day after it."""
+    if month is None:
+        return datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+    return datetime.date(year, month, 1), datetime.date(*next_month(year, month), 1)
+
+
+def is_closed(city, year, month=None):
+    """Whether the year or month has ended in ``city``."""
+    return period_bounds(year, month)[1] <= today(city)
+
+
+def is_datetime(model, field):
+    return model._meta.get_field(field).get_internal_type() == 'DateTimeField'
+
+
+def range_filter(model, content_type, city, start, end):
+    """Lookups selecting ``model`` rows dated from ``start`` up to (not including) ``end``."""
+    field = ARCHIVES[content_type][1]
+    if is_datetime(model, field):
+        tz = city_timezone(city)
+        start = datetime.datetime.combine(start, datetime.time(), tzinfo=tz)
+        end = datetime.datetime.combine(end, datetime.time(), tzinfo=tz)
+    return {f'{field}__gte': start, f'{field}__lt': end}
+
+
+def published(model, city):
+    return model._default_manager.filter(tenant=city, is_published=True)
+
+
+def count_month(content_type, city, year, month):
+    start, end = period_bounds(year, month)
+    models = ARCHIVES[content_type][0]
+    return sum(
+        published(model, city).filter(**range_filter(model, content_type, city, start, end)).count()
+        for model in models
+    )
+
+
+def months_of(instances, months=None, original=False):
+    """
+    Add the months of the archived models among ``instances`` (which should
+    have ``tenant`` loaded) to ``months``, a dict of
+    ``{(content_type, city id): (city, {(year, month), ...})}``, and return
+    it. With ``original``, use the dates the instances were loaded with.
+    """
+    months = {} if months is None else months
+    for obj in instances:
+        content_type = ARCHIVE_TYPES.get(type(obj))
+        if content_type is None:
+            continue
+        if original:
+            value = getattr(obj, '_original_archive_date', None)
+        else:
+            value = getattr(obj, ARCHIVES[content_type][1])
+        month = month_of(value, obj.tenant)
+        if month is not None:
+            months.setdefault((content_type, obj.tenant_id), (obj.tenant, set()))[1].add(month)
+    return months
+
+
+def refresh_months(content_type, city, months):
+    """
+    Recount ``months`` (``(year, month)`` pairs) for ``city``. Returns True
+    if the sidebar changed: a month appeared or disappeared, or the count of
+    a closed month changed (open months are listed without one).
+    """
+    sidebar_changed = False
+    for year, month in sorted(months):
+        try:
+            changed = refresh_month(content_type, city, year, month)
+        except IntegrityError:
+            # Another process added the row since we looked; recount against it
+            changed = refresh_month(content_type, city, year, month)
+        sidebar_changed = changed or sidebar_changed
+    return sidebar_changed
+
+
+def refresh_month(content_type, city, year, month):
+    # Counted after locking the row (on backends with select_for_update), so
+    # a concurrent refresh can't write an older count over a newer one
+    with transaction.atomic():
+        row = (
+            MonthlyCount.objects.filter(
+                tenant=city,
+                content_type=content_type,
+                year=year,
+                month=month,
+            )
+            .select_for_update()
+            .first()
+        )
+        count = count_month(content_type, city, year, month)
+        if row is None and count:
+            MonthlyCount.objects.create(
+                tenant=city, content_type=content_type, year=year, month=month, count=count
+            )
+            return True
+        if row is not None and not count:
+            row.delete()
+            return True
+        if row is not None and row.count != count:
+            row.count = count
+            row.save(update_fields=['count'])
+            return is_closed(city, year, month)
+    return False
+
+
+def sidebar_months(content_type, city):
+    """``MonthlyCount`` rows up to this month, newest first, with ``date`` and ``closed`` set."""
+    current = month_of(today(city), city)
+    rows = []
+    for row in MonthlyCount.objects.filter(tenant=city, content_type=content_type):
+        if (row.year, row.month) <= current:
+            row.date = datetime.date(row.year, row.month, 1)
+            row.closed = (row.year, row.month) < current
+            rows.append(row)
+    return rows
+
+
+def rebuild(apps=None):
+    """Recount every month of every archive from the content tables; returns the row count."""
+    get_model = (apps or django_apps).get_model
+    city_model = get_model('bulletin.City')
+    count_model = get_model('bulletin.MonthlyCount')
+
+    rows = []
+    for city in [None, *city_model.objects.all()]:
+        for content_type, (models, field) in ARCHIVES.items():
+            counts = {}
+            for model in models:
+                model = get_model(model._meta.label)
+                tzinfo = city_timezone(city) if is_datetime(model, field) else None
+                months = (
+                    model._default_manager.filter(tenant=city, is_published=True)
+                    .annotate(month_start=TruncMonth(field, tzinfo=tzinfo))
+                    .order_by()
+                    .values('month_start')
+                    .annotate(count=Count('pk'))
+                )
+                for row in months:
+                    key = (row['month_start'].year, row['month_start'].month)
+                    counts[key] = counts.get(key, 0) + row['count']
+            rows.extend(
+                count_model(
+                    tenant=city, content_type=content_type, year=year, month=month, count=count
+                )
+                for (year, month), count in counts.items()
+            )
+    with transaction.atomic():
+        count_model.objects.all().delete()
+        count_model.objects.bulk_create(rows)
+    return len(rows)
@@ -0,0 +1,42 @@
+"""
+Precache list and cache version for the service worker.
+
+``collectstatic`` writes staticfiles.json with the hashed name of every
+static file and a hash of the whole manifest. The service worker precaches
+SITE_STYLESHEETS and the hashed URLs of the static files matching
+SERVICE_WORKER_PRECACHE, and names its caches after a version derived from
+both, so a deploy that changes any of them installs a new worker which drops
+the old caches. Without a manifest (development without ``collectstatic``)
+no local files are precached.
+"""
+import fnmatch
+import functools
+import hashlib
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+THEME_COLOR = '#00d1b2'  # Bulma's primary colour, as in the navbar
+
+# Paths the worker always leaves to the network: per-visitor pages and live data
+NETWORK_ONLY_PATHS = ['/admin/', '/api/', '/unsubscribe/']
+
+
+@functools.cache
+def precache_urls():
+    """URLs fetched when the worker installs: the site's stylesheets and matching static files."""
+    names = sorted(
+        name
+        for name in getattr(staticfiles_storage, 'hashed_files', {})
+        if any(fnmatch.fnmatch(name, pattern) for pattern in settings.SERVICE_WORKER_PRECACHE)
+    )
+    return [*settings.SITE_STYLESHEETS, *(staticfiles_storage.url(name) for name in names)]
+
+
+@functools.cache
+def cache_version():
+    """Short hash of the static manifest and the precache list."""
+    digest = hashlib.sha256(getattr(staticfiles_storage, 'manifest_hash', '').encode())
+    for url in precache_urls():
+        digest.update(url.encode())
+    return digest.hexdigest()[:12]
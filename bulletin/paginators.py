@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import QuerySet
+from django.db.models.fields.related_lookups import RelatedExact
+from django.utils.functional import cached_property
+
+
+def estimate_row_count(model, using='default'):
+    """
+    Planner statistics row estimate for ``model``'s table, or None if unavailable.
+
+    SQLite only has statistics once ``ANALYZE`` (or ``PRAGMA optimize``) has run.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+def only_tenant_filter(queryset):
+    """The city id ``queryset`` is filtered by, if ``for_city`` added its only filter; else None."""
+    where = queryset.query.where
+    if where.negated or len(where.children) != 1:
+        return None
+    lookup = where.children[0]
+    if isinstance(lookup, RelatedExact) and lookup.lhs.target.name == 'tenant':
+        return lookup.rhs
+    return None
+
+
+def tenant_row_count(queryset, city_id):
+    """
+    ``queryset``'s row count for one city, counted at most once per
+    ADMIN_TENANT_COUNT_SECONDS (a single pass over the tenant index).
+    """
+    key = f'admin-count:{queryset.model._meta.label_lower}:{city_id}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.order_by().count()
+        cache.set(key, count, settings.ADMIN_TENANT_COUNT_SECONDS)
+    return count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists on large tables.
+
+    Unfiltered lists use the planner's row estimate when the table is larger
+    than ``ADMIN_ESTIMATED_COUNT_THRESHOLD``; in multi-city mode, where the
+    list is always filtered to one city, that city's periodically refreshed
+    row count is used instead. Filtered lists count at most
+    ``ADMIN_COUNT_LIMIT`` rows instead of scanning every match.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+
+        city_id = only_tenant_filter(queryset)
+        if not queryset.query.where or city_id is not None:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate if city_id is None else tenant_row_count(queryset, city_id)
+
+        limit = settings.ADMIN_COUNT_LIMIT
+        return queryset.order_by()[:limit].count()
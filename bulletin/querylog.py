@@ -0,0 +1,119 @@
+"""
+Slow-query log.
+
+For a sampled fraction of requests (SLOW_QUERY_SAMPLE_RATE) every SQL
+statement is timed through a database execute wrapper. Statements slower
+than SLOW_QUERY_MS are written as one JSON line each to the
+``bulletin.slow_queries`` logger (a rotating file, see LOGGING) with the
+view, path, parameters and the backend's EXPLAIN output for the statement.
+Unsampled requests are not wrapped at all. ``python manage.py slow_queries``
+summarizes the log by query shape.
+"""
+import contextlib
+import json
+import logging
+import random
+import re
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger('bulletin.slow_queries')
+
+# Statements EXPLAIN can describe without side effects
+EXPLAINABLE_RE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+NORMALIZE_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE), 'IN (...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def normalize_sql(sql):
+    """The statement's shape: literals and placeholders replaced, IN lists collapsed."""
+    for pattern, replacement in NORMALIZE_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def explain(connection, sql, params):
+    """EXPLAIN output for a read-only statement as a list of lines, or None."""
+    if not EXPLAINABLE_RE.match(sql):
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except DatabaseError as error:
+        return [f'EXPLAIN failed: {error}']
+
+
+class SlowQueryRecorder:
+    """Execute wrapper logging statements slower than ``threshold_ms``."""
+
+    def __init__(self, connection, request, threshold_ms):
+        self.connection = connection
+        self.request = request
+        self.threshold_ms = threshold_ms
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms >= self.threshold_ms:
+            self.record(sql, params, many, duration_ms)
+        return result
+
+    def record(self, sql, params, many, duration_ms):
+        plan = None
+        if not many:
+            self.explaining = True
+            try:
+                plan = explain(self.connection, sql, params)
+            finally:
+                self.explaining = False
+        match = self.request.resolver_match
+        logger.info(
+            json.dumps(
+                {
+                    'time': time.time(),
+                    'duration_ms': round(duration_ms, 2),
+                    'view': match.view_name if match else None,
+                    'path': self.request.path,
+                    'database': self.connection.alias,
+                    'sql': sql,
+                    'params': None if many else params,
+                    'many': many,
+                    'plan': plan,
+                },
+                default=str,
+            )
+        )
+
+
+class SlowQueryMiddleware:
+    """Wrap a sample of requests' queries in a ``SlowQueryRecorder``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.SLOW_QUERY_SAMPLE_RATE
+        if rate <= 0 or random.random() >= rate:
+            return self.get_response(request)
+
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(
+                        SlowQueryRecorder(connection, request, settings.SLOW_QUERY_MS)
+                    )
+                )
+            return self.get_response(request)
@@ -0,0 +1,268 @@
+"""
+Per-client rate limiting and load shedding.
+
+Requests are sorted into route classes (RATE_LIMITS): deep pagination and
+past-event listings, the JSON API, and ordinary pages. Each client gets a
+token bucket per class, so a crawler walking ``?page=N`` runs out long
+before a visitor reading a few pages would. The buckets live in a small
+SQLite file (RATE_LIMIT_STORE) that every worker on the host opens, so the
+limits hold across gunicorn workers without an external service; a request
+over its limit gets a 429 with ``Retry-After``.
+
+When the site is overloaded, measured by requests in flight across the
+workers and by how long the request waited in the proxy queue
+(``X-Request-Start``), low-priority requests (the deep class and known
+crawlers) get a 503 first, and past LOAD_SHED_ALL_QUEUE_MS so does
+everything else. Throttled and shed requests are counted per class in the
+same store; ``python manage.py rate_limits`` shows the counters.
+
+If the store can't be reached in time the request is let through.
+"""
+import contextlib
+import ipaddress
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+
+# Paths never limited: staff work in the admin, and files are cheap to serve
+EXEMPT_PATHS = ('/admin/', '/static/', '/media/')
+
+# Whole user-agent tokens, so browsers that merely contain "fetch" or "bot" aren't matched
+CRAWLER_RE = re.compile(
+    r'\b(?:[\w-]*(?:bot|crawler|spider)|slurp|curl|wget|python-requests|python-urllib|scrapy'
+    r'|go-http-client|libwww-perl|facebookexternalhit)\b',
+    re.IGNORECASE,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS inflight (worker TEXT PRIMARY KEY, started REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def route_class(request):
+    """The RATE_LIMITS class of ``request``, or None if it isn't limited."""
+    path = request.path_info
+    if path.startswith(EXEMPT_PATHS):
+        return None
+    if path.startswith('/api/'):
+        return 'api'
+    page = request.GET.get('page')
+    if (page and page != '1') or request.GET.get('show_past'):
+        return 'deep'
+    return 'page'
+
+
+def is_low_priority(request, route):
+    return route == 'deep' or bool(CRAWLER_RE.search(request.META.get('HTTP_USER_AGENT', '')))
+
+
+def client_id(request):
+    """The client's address (from RATE_LIMIT_CLIENT_HEADER behind a proxy); IPv6 by /64."""
+    address = request.META.get('REMOTE_ADDR', '')
+    if settings.RATE_LIMIT_CLIENT_HEADER:
+        forwarded = request.META.get(settings.RATE_LIMIT_CLIENT_HEADER, '')
+        # The proxy appends the address it saw; anything before it is client-supplied
+        address = forwarded.rsplit(',', 1)[-1].strip() or address
+    if ':' in address:
+        try:
+            mapped = ipaddress.ip_address(address).ipv4_mapped
+            if mapped:
+                return str(mapped)
+            address = str(ipaddress.ip_network(f'{address}/64', strict=False))
+        except ValueError:
+            # Not an address after all; limit it as it came
+            pass
+    return address
+
+
+def queue_ms(request):
+    """Milliseconds since the proxy received the request (``t=<seconds or microseconds>``), or 0."""
+    value = request.META.get('HTTP_X_REQUEST_START', '').removeprefix('t=')
+    try:
+        started = float(value)
+    except ValueError:
+        return 0
+    if started > 1e12:
+        started /= 1_000_000
+    return max((time.time() - started) * 1000, 0)
+
+
+class SharedStore:
+    """Token buckets, in-flight requests and counters in a SQLite file shared by the workers."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.last_prune = 0
+
+    def connection(self):
+        # One connection per thread, reopened after a fork
+        if getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self.path,
+                timeout=settings.RATE_LIMIT_STORE_TIMEOUT,
+                isolation_level=None,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Losing the last moments of rate-limit state in a crash is harmless
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.executescript(SCHEMA)
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    @contextlib.contextmanager
+    def transaction(self):
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def take(self, key, rate, burst):
+        """
+        Take a token from ``key``'s bucket (refilled at ``rate`` per second up
+        to ``burst``). Returns 0 if one was available, else the seconds until one is.
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            row = connection.execute(
+                'SELECT tokens, updated FROM buckets WHERE key = ?', (key,)
+            ).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            connection.execute(
+                'INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET '
+                'tokens = excluded.tokens, updated = excluded.updated',
+                (key, tokens, now),
+            )
+        self.prune(now)
+        return wait
+
+    def prune(self, now):
+        """Now and then, drop full buckets (new ones start full anyway) and stale in-flight rows."""
+        if now - self.last_prune < settings.RATE_LIMIT_PRUNE_SECONDS:
+            return
+        self.last_prune = now
+        longest_refill = max(
+            burst / (per_minute / 60) for per_minute, burst in settings.RATE_LIMITS.values()
+        )
+        connection = self.connection()
+        connection.execute('DELETE FROM buckets WHERE updated < ?', (now - longest_refill,))
+        connection.execute(
+            'DELETE FROM inflight WHERE started < ?', (now - settings.RATE_LIMIT_INFLIGHT_TIMEOUT,)
+        )
+
+    def start(self, worker):
+        """Record a request in flight and return how many are, across the workers."""
+        now = time.time()
+        with self.transaction() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO inflight (worker, started) VALUES (?, ?)', (worker, now)
+            )
+            # Rows left by a killed worker stop counting after a while
+            return connection.execute(
+                'SELECT COUNT(*) FROM inflight WHERE started > ?',
+                (now - settings.RATE_LIMIT_INFLIGHT_TIMEOUT,),
+            ).fetchone()[0]
+
+    def finish(self, worker):
+        self.connection().execute('DELETE FROM inflight WHERE worker = ?', (worker,))
+
+    def count(self, name):
+        self.connection().execute(
+            'INSERT INTO counters (name, value) VALUES (?, 1) '
+            'ON CONFLICT (name) DO UPDATE SET value = value + 1',
+            (name,),
+        )
+
+    def counters(self):
+        return dict(self.connection().execute('SELECT name, value FROM counters ORDER BY name'))
+
+    def reset_counters(self):
+        self.connection().execute('DELETE FROM counters')
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None or _store.path != settings.RATE_LIMIT_STORE:
+        _store = SharedStore(settings.RATE_LIMIT_STORE)
+    return _store
+
+
+def retry_later(status, retry_after, message):
+    response = HttpResponse(message, status=status, content_type='text/plain')
+    response['Retry-After'] = str(max(math.ceil(retry_after), 1))
+    return response
+
+
+class RateLimitMiddleware:
+    """Throttle clients over their RATE_LIMITS and shed load when the workers are saturated."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        route = route_class(request) if settings.RATE_LIMIT_ENABLED else None
+        if route is None:
+            return self.get_response(request)
+
+        store = get_store()
+        worker = f'{os.getpid()}-{threading.get_ident()}'
+        try:
+            inflight = store.start(worker)
+        except sqlite3.Error:
+            return self.get_response(request)
+        try:
+            response = self.check(request, store, route, inflight)
+            return response or self.get_response(request)
+        finally:
+            with contextlib.suppress(sqlite3.Error):
+                store.finish(worker)
+
+    def check(self, request, store, route, inflight):
+        """A 503 or 429 response if ``request`` is shed or throttled, else None."""
+        waited = queue_ms(request)
+        overloaded = (
+            # Not counting this request
+            inflight - 1 >= settings.LOAD_SHED_INFLIGHT
+            or (settings.LOAD_SHED_QUEUE_MS and waited >= settings.LOAD_SHED_QUEUE_MS)
+        )
+        if (overloaded and is_low_priority(request, route)) or (
+            settings.LOAD_SHED_ALL_QUEUE_MS and waited >= settings.LOAD_SHED_ALL_QUEUE_MS
+        ):
+            with contextlib.suppress(sqlite3.Error):
+                store.count(f'shed:{route}')
+            return retry_later(
+                503, settings.LOAD_SHED_RETRY_AFTER, "The site is busy; please try again shortly.\n"
+            )
+
+        per_minute, burst = settings.RATE_LIMITS[route]
+        try:
+            wait = store.take(f'{route}:{client_id(request)}', per_minute / 60, burst)
+            if wait:
+                store.count(f'throttled:{route}')
+        except sqlite3.Error:
+            return None
+        if wait:
+            return retry_later(429, wait, "Too many requests; please slow down.\n")
+        return None
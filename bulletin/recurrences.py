@@ -0,0 +1,119 @@
+"""
+Process-wide cache of compiled promotion recurrence rules.
+
+Turning a promotion's stored RRULE text into a ``Recurrence`` and then into a
+dateutil ``rruleset`` is repeated for every promotion on every request that
+checks which promotions are active. Compiled rulesets are kept in a bounded
+LRU keyed by ``(model, pk, updated_at)``, so an edit (which bumps
+``updated_at``) naturally stops using the old entry. dateutil also caches the
+occurrences it has generated, so repeated membership tests for nearby dates
+are cheap.
+
+Callers can defer ``recurrence_pattern`` when loading promotions; the raw
+pattern is then only fetched (and parsed) on a cache miss.
+"""
+import datetime
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+from recurrence import Recurrence
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# Stored for promotions without a pattern, so they are cached too
+NO_RULES = object()
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+
+def _naive(dt):
+    if timezone.is_aware(dt):
+        dt = timezone.make_naive(dt)
+    return dt
+
+
+def compile_ruleset(pattern, valid_from):
+    """
+    Build the dateutil ruleset for ``pattern``.
+
+    Occurrences are anchored at midnight (of the pattern's own start date, or
+    of ``valid_from``) so membership can be tested with a date's midnight.
+    """
+    if not pattern:
+        return NO_RULES
+    if pattern.dtstart:
+        dtstart = _naive(pattern.dtstart).date()
+    else:
+        # valid_from only anchors the rules; unlike a pattern's own start
+        # date it is not an occurrence itself
+        dtstart = valid_from
+        pattern = Recurrence(
+            rrules=pattern.rrules,
+            exrules=pattern.exrules,
+            rdates=pattern.rdates,
+            exdates=pattern.exdates,
+            include_dtstart=False,
+        )
+    dtstart = datetime.datetime.combine(dtstart, datetime.time.min)
+    return pattern.to_dateutil_rruleset(dtstart=dtstart, cache=True)
+
+
+def _load_pattern(promotion):
+    if 'recurrence_pattern' in promotion.__dict__:
+        return promotion.recurrence_pattern
+    # Deferred: fetch just this column
+    return (
+        type(promotion)
+        ._base_manager.values_list('recurrence_pattern', flat=True)
+        .get(pk=promotion.pk)
+    )
+
+
+def get_ruleset(promotion):
+    """Compiled ruleset for ``promotion``, or ``NO_RULES`` if it has no pattern."""
+    global _hits, _misses
+
+    if promotion.pk is None:
+        return compile_ruleset(_load_pattern(promotion), promotion.valid_from)
+
+    key = (promotion._meta.label, promotion.pk, promotion.updated_at)
+    with _lock:
+        ruleset = _cache.get(key)
+        if ruleset is not None:
+            _cache.move_to_end(key)
+            _hits += 1
+            return ruleset
+        _misses += 1
+
+    ruleset = compile_ruleset(_load_pattern(promotion), promotion.valid_from)
+    with _lock:
+        _cache[key] = ruleset
+        while len(_cache) > settings.RECURRENCE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return ruleset
+
+
+def occurs_on(promotion, check_date):
+    """Whether ``promotion``'s recurrence pattern includes ``check_date``."""
+    ruleset = get_ruleset(promotion)
+    if ruleset is NO_RULES:
+        return True
+    return datetime.datetime.combine(check_date, datetime.time.min) in ruleset
+
+
+def cache_info():
+    with _lock:
+        return CacheInfo(_hits, _misses, settings.RECURRENCE_CACHE_SIZE, len(_cache))
+
+
+def cache_clear():
+    global _hits, _misses
+
+    with _lock:
+        _cache.clear()
+        _hits = _misses = 0
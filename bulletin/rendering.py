@@ -0,0 +1,93 @@
+"""
+HTML and card excerpts rendered once at save time.
+
+Detail pages used to run long bodies through ``linebreaks`` and cards ran
+summaries through ``truncatewords`` on every request. Instead the rendered
+output is stored next to the source text when an object is saved, and
+templates output the stored strings. ``render_content`` re-renders existing
+rows after the rules here change.
+"""
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+
+def render_html(text):
+    """Same output as the ``linebreaks`` template filter with autoescaping on."""
+    return linebreaks(text, autoescape=True)
+
+
+def excerpt(words):
+    """Same output as the ``truncatewords`` template filter."""
+
+    def render(text):
+        return Truncator(text).words(words, truncate=' …')
+
+    return render
+
+
+_event_fields = {
+    'description_html': ('description', render_html),
+    'summary_excerpt': ('summary', excerpt(15)),
+}
+_special_fields = {
+    'description_html': ('description', render_html),
+    'summary_excerpt': ('summary', excerpt(20)),
+    'home_excerpt': ('summary', excerpt(15)),
+}
+
+# Model label -> {stored field: (source field, renderer)}
+RENDERED_FIELDS = {
+    'bulletin.News': {
+        'content_html': ('content', render_html),
+        'summary_excerpt': ('summary', excerpt(20)),
+    },
+    'bulletin.Event': _event_fields,
+    'bulletin.ArchivedEvent': _event_fields,
+    'bulletin.Special': _special_fields,
+    'bulletin.ArchivedSpecial': _special_fields,
+    'bulletin.Promotion': _event_fields,
+    'bulletin.ArchivedPromotion': _event_fields,
+    'bulletin.Resource': {
+        'content_html': ('content', render_html),
+    },
+}
+
+
+def stored_fields(model):
+    """``RENDERED_FIELDS`` for ``model``, limited to fields it has (e.g. in a migration)."""
+    names = {field.name for field in model._meta.get_fields()}
+    return {
+        target: spec
+        for target, spec in RENDERED_FIELDS[model._meta.label].items()
+        if target in names
+    }
+
+
+def render_fields(obj, fields=None):
+    """Fill in ``obj``'s stored renderings; returns the names of fields that changed."""
+    changed = []
+    if fields is None:
+        fields = RENDERED_FIELDS[obj._meta.label]
+    for target, (source, render) in fields.items():
+        value = render(getattr(obj, source) or '')
+        if getattr(obj, target) != value:
+            setattr(obj, target, value)
+            changed.append(target)
+    return changed
+
+
+def backfill(model, batch_size=500):
+    """Re-render every row of ``model``; returns how many rows were updated."""
+    fields = stored_fields(model)
+    columns = ['pk', *fields, *(source for source, _ in fields.values())]
+    pending = []
+    updated = 0
+    for obj in model._base_manager.only(*columns).iterator(chunk_size=batch_size):
+        if render_fields(obj, fields):
+            pending.append(obj)
+        if len(pending) >= batch_size:
+            updated += model._base_manager.bulk_update(pending, list(fields))
+            pending = []
+    if pending:
+        updated += model._base_manager.bulk_update(pending, list(fields))
+    return updated
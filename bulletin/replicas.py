@@ -0,0 +1,128 @@
+"""
+Read replicas for the public pages.
+
+With READ_REPLICAS configured, GET requests to the public ``bulletin``
+views and feeds read from a replica, so anonymous traffic doesn't contend
+with the admin for the primary database. Everything else reads and writes
+the primary: the admin, forms, management commands and any write made
+while serving a public page.
+
+A replica is either a read-only SQLite snapshot of the primary, refreshed
+with the online backup API by ``python manage.py refresh_replicas`` (run
+by the scheduler every REPLICA_REFRESH_MINUTES), or a database alias of a
+backend with its own replication, assumed to lag by at most
+REPLICA_MAX_LAG_SECONDS. A replica is only used while it is at least as
+new as the city's last content change, so a page rendered (and cached by
+the proxy) right after an edit never shows the old content; until the next
+refresh those pages read the primary. If the time of the last change isn't
+known (the shared cache was cleared), the primary is read until the next
+change or refresh records one.
+
+After a successful POST (saving in the admin, say) the client gets a
+REPLICA_PIN_COOKIE for REPLICA_PIN_SECONDS, during which its public pages
+also read the primary, so editors see what they just saved.
+"""
+import os
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .caching import get_content_changed_at
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+_read_database = ContextVar('read_database', default=None)
+
+
+def is_snapshot(alias):
+    return connections.settings[alias]['ENGINE'] == 'django.db.backends.sqlite3'
+
+
+def snapshot_path(alias):
+    return str(connections.settings[alias]['NAME'])
+
+
+def replica_as_of(alias):
+    """The time up to which ``alias`` has the primary's data, or None if it's unavailable."""
+    if not is_snapshot(alias):
+        return time.time() - settings.REPLICA_MAX_LAG_SECONDS
+    try:
+        # refresh_replicas sets the mtime to when the copy started
+        return os.stat(snapshot_path(alias)).st_mtime
+    except OSError:
+        return None
+
+
+def choose_replica():
+    """A replica with the active city's latest content, or None to read the primary."""
+    changed_at = get_content_changed_at()
+    if changed_at is None:
+        return None
+    current = [
+        alias
+        for alias in settings.READ_REPLICAS
+        if (as_of := replica_as_of(alias)) is not None and as_of >= changed_at
+    ]
+    return random.choice(current) if current else None
+
+
+class ReplicaRouter:
+    """Send reads to the replica chosen for the request, and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints):
+        # Even for instances loaded from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.READ_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema along with the data
+        return db not in settings.READ_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Pick the database the public views read from, and pin recent writers to the primary."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _read_database.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_database.reset(token)
+
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and settings.READ_REPLICAS
+        ):
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            settings.READ_REPLICAS
+            and request.method in SAFE_METHODS
+            and request.resolver_match.namespace == 'bulletin'
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+        ):
+            _read_database.set(choose_replica())
+        return None
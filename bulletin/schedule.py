@@ -0,0 +1,107 @@
+"""
+Which promotions are running right now.
+
+Each city's promotions are first reduced to a per-day schedule: the
+``(pk, start_time, end_time)`` of every promotion whose validity range and
+recurrence pattern include that day. The schedule is kept in the shared
+cache until content changes, built by one worker at a time (see
+``singleflight``); ``warm_caches`` builds the next day's before midnight.
+The "happening now" list is then a pass over today's and yesterday's
+schedules (for windows that cross midnight), cached per
+HAPPENING_NOW_BUCKET_MINUTES so concurrent visitors share one computation.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from . import singleflight
+from .caching import get_content_version
+from .models import Promotion
+
+DAY_SCHEDULE_TIMEOUT = 60 * 60 * 24
+
+
+def get_day_schedule(day, city=None):
+    """``(pk, start_time, end_time)`` for each promotion running on ``day``, in list order."""
+
+    def compute():
+        promotions = (
+            Promotion.objects.for_city(city)
+            .filter(
+                is_published=True,
+                valid_from__lte=day,
+            )
+            .filter(Q(valid_until__isnull=True) | Q(valid_until__gte=day))
+            .only('pk', 'valid_from', 'valid_until', 'start_time', 'end_time', 'updated_at')
+        )
+        return [
+            (promotion.pk, promotion.start_time, promotion.end_time)
+            for promotion in promotions
+            if promotion.is_active_on_date(day)
+        ]
+
+    return singleflight.get_or_compute(
+        f'promotion-schedule:{day.isoformat()}', compute, DAY_SCHEDULE_TIMEOUT
+    )
+
+
+def crosses_midnight(start_time, end_time):
+    return start_time is not None and end_time is not None and end_time <= start_time
+
+
+def running_at(schedule, previous_schedule, time):
+    """
+    Pks of promotions whose window includes ``time``.
+
+    A missing start or end time means the window is open on that side. A
+    window that ends at or before it starts (10pm-2am) runs past midnight, so
+    its early-morning part comes from the previous day's schedule.
+    """
+    running = []
+    for pk, start_time, end_time in schedule:
+        if crosses_midnight(start_time, end_time):
+            if time >= start_time:
+                running.append(pk)
+        elif (start_time is None or start_time <= time) and (end_time is None or time < end_time):
+            running.append(pk)
+    for pk, start_time, end_time in previous_schedule:
+        if crosses_midnight(start_time, end_time) and time < end_time and pk not in running:
+            running.append(pk)
+    return running
+
+
+def bucket_start(now):
+    minutes = settings.HAPPENING_NOW_BUCKET_MINUTES
+    return now.replace(minute=now.minute - now.minute % minutes, second=0, microsecond=0)
+
+
+def get_happening_now(city=None, now=None):
+    """Promotions running at ``now`` (city-local)."""
+    now = timezone.localtime(now)
+    start = bucket_start(now)
+    key = f'happening-now:{start.isoformat()}:{get_content_version()}'
+    pks = cache.get(key)
+    if pks is None:
+        today = start.date()
+        pks = running_at(
+            get_day_schedule(today, city),
+            get_day_schedule(today - datetime.timedelta(days=1), city),
+            start.time(),
+        )
+        cache.set(key, pks, settings.HAPPENING_NOW_BUCKET_MINUTES * 60)
+
+    promotions = (
+        Promotion.objects.select_related('organization').defer('recurrence_pattern').in_bulk(pks)
+    )
+    return [promotions[pk] for pk in pks if pk in promotions]
+
+
+def seconds_until_next_bucket(now=None):
+    now = timezone.localtime(now)
+    next_start = bucket_start(now) + datetime.timedelta(
+        minutes=settings.HAPPENING_NOW_BUCKET_MINUTES
+    )
+    return max(int((next_start - now).total_seconds()), 1)
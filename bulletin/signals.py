@@ -0,0 +1,193 @@
+"""Signal handlers that keep denormalized data in step with content edits."""
+from django.db.models.signals import (
+    m2m_changed,
+    post_init,
+    pre_save,
+    post_save,
+    pre_delete,
+    post_delete,
+)
+from django.dispatch import receiver
+
+from . import images, monthly, storage, surrogate, timeline
+from .caching import queue_version_bump
+from .cities import clear_host_cache
+from .models import City, Organization, Resource
+
+
+@receiver(post_save)
+def sync_timeline_entry(sender, instance, raw=False, **kwargs):
+    if raw or sender not in timeline.TIMELINE_MODELS:
+        return
+    timeline.sync_entry(instance)
+
+
+@receiver(post_delete)
+def remove_timeline_entry(sender, instance, **kwargs):
+    if sender not in timeline.TIMELINE_MODELS:
+        return
+    timeline.remove_entry(instance)
+
+
+@receiver(pre_delete)
+def load_city(sender, instance, **kwargs):
+    # The post_delete handlers read the city, which deleting a City removes
+    # before its content; loading it now caches it on the instance
+    if sender in timeline.TIMELINE_MODELS or sender is Organization:
+        instance.tenant
+
+
+@receiver([post_save, post_delete])
+def invalidate_content_cache(sender, instance, raw=False, **kwargs):
+    if raw or (sender not in timeline.TIMELINE_MODELS and sender is not Organization):
+        return
+    queue_version_bump(instance.tenant)
+
+
+@receiver([post_save, post_delete])
+def purge_proxy_cache(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keys = surrogate.keys_for_change(instance)
+    if keys:
+        surrogate.queue_purge(keys)
+
+
+@receiver(pre_delete, sender=Resource)
+def remember_resource_organizations(sender, instance, **kwargs):
+    # The links are deleted before post_delete purges the organizations' keys
+    instance._organization_ids = list(instance.organizations.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Resource.organizations.through)
+def purge_resource_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # post_clear doesn't say what was linked
+        related = instance.resources if reverse else instance.organizations
+        instance._cleared_pks = set(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_pks', set())
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if pk_set:
+        surrogate.queue_purge(surrogate.keys_for_resource_links(instance, reverse, pk_set))
+
+
+def refresh_monthly_counts(months):
+    """Recount ``months`` (see ``monthly.months_of``) and queue purges of their archive pages."""
+    keys = surrogate.archive_keys(months)
+    for (content_type, _), (city, periods) in months.items():
+        if monthly.refresh_months(content_type, city, periods):
+            keys.add(surrogate.archive_key(content_type, city))
+    if keys:
+        surrogate.queue_purge(keys)
+
+
+def remember_archive_date(sender, instance, **kwargs):
+    # Read the raw value so a deferred date isn't fetched
+    field = monthly.ARCHIVES[monthly.ARCHIVE_TYPES[sender]][1]
+    instance._original_archive_date = instance.__dict__.get(field)
+
+
+def update_monthly_counts(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Both the month it is in now and the one it was in, if it moved
+    months = monthly.months_of([instance])
+    monthly.months_of([instance], months, original=True)
+    refresh_monthly_counts(months)
+    instance._original_archive_date = getattr(
+        instance, monthly.ARCHIVES[monthly.ARCHIVE_TYPES[sender]][1]
+    )
+
+
+def bulk_content_changed(instances, previous_months=None):
+    """
+    Run the content post_save side effects once for rows written with
+    bulk_create()/bulk_update(), which send no signals. ``instances`` should
+    have their ``tenant`` loaded. ``previous_months`` (see
+    ``monthly.months_of``) are recounted too, for rows whose date changed.
+    """
+    instances = list(instances)
+    timeline.sync_entries([obj for obj in instances if type(obj) in timeline.TIMELINE_MODELS])
+    refresh_monthly_counts(monthly.months_of(instances, previous_months))
+
+    keys = set()
+    cities = {}
+    for obj in instances:
+        cities[obj.tenant_id] = obj.tenant
+        keys |= surrogate.keys_for_change(obj) or set()
+    for city in cities.values():
+        queue_version_bump(city)
+    if keys:
+        surrogate.queue_purge(keys)
+
+
+@receiver([post_save, post_delete], sender=City)
+def reset_city_hosts(sender, **kwargs):
+    clear_host_cache()
+
+
+def _reference_fields(sender):
+    return storage.REFERENCE_FIELDS[sender._meta.label]
+
+
+def remember_media_files(sender, instance, **kwargs):
+    # Read the raw values so deferred fields aren't fetched
+    original = {}
+    for field in _reference_fields(sender):
+        if field in instance.__dict__:
+            value = instance.__dict__[field]
+            original[field] = getattr(value, 'name', value) or None
+    if original:
+        instance._original_media = original
+
+
+def process_uploaded_images(sender, instance, raw=False, **kwargs):
+    # Swap new uploads for their processed copy before the field stores them
+    if raw:
+        return
+    for field in _reference_fields(sender):
+        file = getattr(instance, field)
+        if file and not file._committed:
+            processed = images.process_upload(file.file)
+            if processed is not None:
+                file.file = processed
+                file.name = processed.name
+
+
+def count_media_references(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    original = getattr(instance, '_original_media', {})
+    for field in _reference_fields(sender):
+        if not created and field not in original:
+            continue
+        file = getattr(instance, field)
+        old_name = None if created else original[field]
+        new_name = file.name or None
+        if new_name != old_name:
+            storage.add_reference(new_name)
+            storage.release_reference(old_name, file.storage)
+        original[field] = new_name
+    instance._original_media = original
+
+
+def release_media_references(sender, instance, **kwargs):
+    original = getattr(instance, '_original_media', {})
+    for field in _reference_fields(sender):
+        if field in original:
+            storage.release_reference(original[field], getattr(instance, field).storage)
+
+
+for label in storage.REFERENCE_FIELDS:
+    post_init.connect(remember_media_files, sender=label)
+    pre_save.connect(process_uploaded_images, sender=label)
+    post_save.connect(count_media_references, sender=label)
+    post_delete.connect(release_media_references, sender=label)
+
+for model in monthly.ARCHIVE_TYPES:
+    post_init.connect(remember_archive_date, sender=model)
+    post_save.connect(update_monthly_counts, sender=model)
+    post_delete.connect(update_monthly_counts, sender=model)
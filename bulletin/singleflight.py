@@ -0,0 +1,77 @@
+"""
+Single-flight recomputation of shared results.
+
+Results that every worker needs at the same moment (today's promotion
+schedule just after midnight, or any of them right after an edit bumps the
+content version) are kept in the ``shared`` cache with the content version
+they were computed from. When one is missing or outdated, the first worker
+to take the lease (``cache.add``, which is atomic on a cache server and
+nearly so on the file cache) recomputes it; the others keep returning the
+previous result meanwhile, and flag the request so its page is only cached
+by the proxy for STAMPEDE_STALE_MAX_AGE. With nothing to fall back on they
+wait up to STAMPEDE_WAIT_SECONDS for the result and then compute it
+themselves. ``python manage.py warm_caches`` fills in the next day's
+results before midnight so the rollover finds them ready.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .caching import get_content_version
+
+POLL_SECONDS = 0.05
+
+_served_stale = ContextVar('served_stale', default=False)
+
+
+def get_or_compute(key, compute, timeout):
+    """
+    ``compute()``'s result for the active city's current content, cached in
+    the shared cache under ``key`` for ``timeout`` seconds.
+    """
+    shared = caches['shared']
+    version = get_content_version()
+    now = time.time()
+    # (value, content version, expiry)
+    entry = shared.get(key)
+    if entry is not None and entry[1] == version and now < entry[2]:
+        return entry[0]
+
+    lease_key = f'{key}:lease'
+    if shared.add(lease_key, now, settings.STAMPEDE_LEASE_SECONDS):
+        try:
+            value = compute()
+            # Outdated results stay around for a while as the fallback
+            shared.set(key, (value, version, now + timeout), timeout * 2)
+        finally:
+            shared.delete(lease_key)
+        return value
+
+    if entry is not None:
+        _served_stale.set(True)
+        return entry[0]
+
+    deadline = now + settings.STAMPEDE_WAIT_SECONDS
+    while time.time() < deadline:
+        time.sleep(POLL_SECONDS)
+        entry = shared.get(key)
+        if entry is not None and entry[1] == version:
+            return entry[0]
+    return compute()
+
+
+@contextmanager
+def tracking_stale():
+    """Track whether anything in the block returned an outdated result (see ``served_stale``)."""
+    token = _served_stale.set(False)
+    try:
+        yield
+    finally:
+        _served_stale.reset(token)
+
+
+def served_stale():
+    return _served_stale.get()
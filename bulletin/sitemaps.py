@@ -0,0 +1,105 @@
+"""
+Sitemaps for every public page.
+
+Content sitemaps read ``slug`` and ``updated_at`` with ``.values()`` instead
+of building model instances, and each shard streams its rows with
+``iterator()``. Sections larger than ``Sitemap.limit`` (50,000 URLs) are
+split across pages listed in the sitemap index.
+"""
+from django.contrib.sitemaps import Sitemap
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.urls import reverse
+
+from .cities import get_current_city
+from .models import News, Event, Special, Promotion, Resource
+
+
+class IteratorPaginator(Paginator):
+    """Paginator whose pages stream their rows instead of caching them."""
+
+    def page(self, number):
+        page = super().page(number)
+        page.object_list = page.object_list.iterator(chunk_size=2000)
+        return page
+
+
+class ContentSitemap(Sitemap):
+    model = None
+    url_name = None
+    changefreq = 'weekly'
+
+    def published(self):
+        return self.model.objects.for_city(get_current_city()).filter(is_published=True)
+
+    def items(self):
+        return self.published().order_by('pk').values('slug', 'updated_at')
+
+    @property
+    def paginator(self):
+        return IteratorPaginator(self._items(), self.limit)
+
+    def location(self, item):
+        return reverse(self.url_name, kwargs={'slug': item['slug']})
+
+    def lastmod(self, item):
+        return item['updated_at']
+
+    def get_latest_lastmod(self):
+        return self.published().aggregate(latest=Max('updated_at'))['latest']
+
+
+class NewsSitemap(ContentSitemap):
+    model = News
+    url_name = 'bulletin:news_detail'
+    changefreq = 'monthly'
+
+
+class EventSitemap(ContentSitemap):
+    model = Event
+    url_name = 'bulletin:event_detail'
+
+
+class SpecialSitemap(ContentSitemap):
+    model = Special
+    url_name = 'bulletin:special_detail'
+
+
+class PromotionSitemap(ContentSitemap):
+    model = Promotion
+    url_name = 'bulletin:promotion_detail'
+
+
+class ResourceSitemap(ContentSitemap):
+    model = Resource
+    url_name = 'bulletin:resource_detail'
+    changefreq = 'monthly'
+
+
+class StaticViewSitemap(Sitemap):
+    changefreq = 'daily'
+
+    def items(self):
+        return [
+            'bulletin:home',
+            'bulletin:timeline',
+            'bulletin:news_list',
+            'bulletin:event_list',
+            'bulletin:special_list',
+            'bulletin:promotion_list',
+            'bulletin:resource_list',
+            'bulletin:about',
+        ]
+
+    def location(self, item):
+        return reverse(item)
+
+
+SITEMAPS = {
+    'pages': StaticViewSitemap,
+    'news': NewsSitemap,
+    'events': EventSitemap,
+    'specials': SpecialSitemap,
+    'promotions': PromotionSitemap,
+    'resources': ResourceSitemap,
+}
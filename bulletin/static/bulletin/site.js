@@ -0,0 +1,27 @@
+// Behaviour shared by every public page. Settings come from the script tag:
+// data-staff-hint-cookie and (when offline support is on) data-service-worker.
+(() => {
+    const settings = document.currentScript.dataset;
+
+    document.addEventListener('DOMContentLoaded', () => {
+        // Pages are the same for every visitor; the admin sets this cookie for staff
+        if (document.cookie.split('; ').includes(`${settings.staffHintCookie}=1`)) {
+            document.getElementById('admin-link').classList.remove('is-hidden');
+        }
+
+        const $navbarBurgers = Array.prototype.slice.call(document.querySelectorAll('.navbar-burger'), 0);
+
+        $navbarBurgers.forEach( el => {
+            el.addEventListener('click', () => {
+                const target = el.dataset.target;
+                const $target = document.getElementById(target);
+                el.classList.toggle('is-active');
+                $target.classList.toggle('is-active');
+            });
+        });
+    });
+
+    if (settings.serviceWorker && 'serviceWorker' in navigator) {
+        window.addEventListener('load', () => navigator.serviceWorker.register(settings.serviceWorker));
+    }
+})();
@@ -0,0 +1,103 @@
+"""
+Content-addressed media storage.
+
+Uploads are stored once under the SHA-256 of their bytes
+(``blobs/ab/cd/abcd....jpg``) regardless of which field or file name they
+arrived with, so the same logo or flyer uploaded repeatedly shares one file.
+Because a name can never point at different bytes, these files are served
+with immutable cache headers. ``MediaBlob`` rows count the references from
+``Image.image`` and ``Organization.logo`` so a file is only deleted once
+nothing uses it.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+BLOB_PREFIX = 'blobs/'
+
+# Models and the file fields whose references are counted
+REFERENCE_FIELDS = {
+    'bulletin.Image': ('image',),
+    'bulletin.Organization': ('logo',),
+}
+
+
+def is_content_addressed(name):
+    return name.startswith(BLOB_PREFIX)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by their SHA-256 and dedupes identical uploads."""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is chosen in _save() from the content hash
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        directory = self.path(BLOB_PREFIX)
+        os.makedirs(directory, exist_ok=True)
+
+        # Hash while copying so the upload is read only once
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            hexdigest = digest.hexdigest()
+            name = f'{BLOB_PREFIX}{hexdigest[:2]}/{hexdigest[2:4]}/{hexdigest}{extension}'
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.remove(temp_path)
+                return name
+
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            # Identical names mean identical bytes, so a concurrent writer
+            # replacing the file is harmless
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+    def delete(self, name):
+        # FieldFile.delete() calls this directly; keep files other rows still use
+        from .models import MediaBlob
+
+        if MediaBlob.objects.filter(name=name, ref_count__gt=0).exists():
+            return
+        super().delete(name)
+
+
+def add_reference(name):
+    from .models import MediaBlob
+
+    if not name:
+        return
+    updated = MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+    if not updated:
+        MediaBlob.objects.get_or_create(name=name, defaults={'ref_count': 1})
+
+
+def release_reference(name, storage):
+    """Drop one reference to ``name`` and delete the file once nothing uses it."""
+    from .models import MediaBlob
+
+    if not name:
+        return
+    MediaBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    deleted, _ = MediaBlob.objects.filter(name=name, ref_count=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: storage.delete(name))
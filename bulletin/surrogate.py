@@ -0,0 +1,269 @@
+"""
+Surrogate-key tagging and purging for a caching reverse proxy.
+
+Public responses carry a ``Surrogate-Key`` header (see SURROGATE_KEY_HEADER)
+listing what they were built from: the model, the object, its organization,
+the city and, for list pages, the list's name. A proxy such as Varnish
+(xkey) or Fastly can then cache pages for a long time and evict exactly the
+affected ones when ``purge()`` sends it the keys of an edited object.
+
+Lists whose contents depend on today's date ("upcoming", "active") are also
+tagged ``dated`` and their proxy lifetime is capped at the city's next
+midnight, with ``stale-while-revalidate`` so the proxy refreshes them one
+request at a time instead of sending every miss to the workers at once.
+"""
+import datetime
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import singleflight
+from .models import (
+    City,
+    Organization,
+    News,
+    Event,
+    Special,
+    Promotion,
+    Resource,
+    ArchivedEvent,
+    ArchivedSpecial,
+    ArchivedPromotion,
+)
+
+logger = logging.getLogger(__name__)
+
+DATED_KEY = 'dated'
+
+# Archived rows keep their live twin's pk and URL, so they share its keys
+KEY_MODELS = {
+    ArchivedEvent: Event,
+    ArchivedSpecial: Special,
+    ArchivedPromotion: Promotion,
+}
+
+CONTENT_MODELS = (News, Event, Special, Promotion, Resource)
+
+# Lists that every content change in a city may affect
+SHARED_LISTS = ('home', 'timeline', 'sitemap')
+
+# Keys per purge request, to stay well under proxy header limits
+PURGE_BATCH_SIZE = 100
+
+_pending = threading.local()
+
+
+def model_key(model):
+    return KEY_MODELS.get(model, model)._meta.model_name
+
+
+def object_key(obj):
+    return f'{model_key(type(obj))}-{obj.pk}'
+
+
+def organization_key(organization_id):
+    return f'organization-{organization_id}'
+
+
+def city_key(city):
+    return f'city-{city.pk}' if city else 'city-none'
+
+
+def list_key(name, city):
+    return f'{name}-list-{city.pk if city else "none"}'
+
+
+def archive_key(content_type, city, year=None, month=None):
+    """Key of a year or month archive page or, without a period, of every page's month list."""
+    period = ''.join(f'-{part}' for part in (year, month) if part is not None)
+    return f'{content_type}-archive{period}-{city.pk if city else "none"}'
+
+
+def archive_keys(months):
+    """Keys of the archive pages showing ``months`` (see ``monthly.months_of``)."""
+    keys = set()
+    for (content_type, _), (city, periods) in months.items():
+        for year, month in periods:
+            keys |= {
+                archive_key(content_type, city, year),
+                archive_key(content_type, city, year, month),
+            }
+    return keys
+
+
+def cache_closed_period(request):
+    """Let the proxy keep the response for ARCHIVE_CACHE_SECONDS; only purges change it."""
+    request.surrogate_closed = True
+
+
+def add_keys(request, *keys, dated=False, max_age=None):
+    """Record surrogate keys (and optionally a shorter proxy lifetime) for the response."""
+    if not hasattr(request, 'surrogate_keys'):
+        request.surrogate_keys = set()
+    request.surrogate_keys.update(keys)
+    if dated:
+        request.surrogate_keys.add(DATED_KEY)
+    if max_age is not None:
+        request.surrogate_max_age = min(max_age, getattr(request, 'surrogate_max_age', max_age))
+
+
+def tag_list(request, model, dated=False, max_age=None):
+    add_keys(
+        request,
+        model_key(model),
+        list_key(model_key(model), request.city),
+        dated=dated,
+        max_age=max_age,
+    )
+
+
+def tag_object(request, obj):
+    keys = [model_key(type(obj)), object_key(obj)]
+    if getattr(obj, 'organization_id', None):
+        keys.append(organization_key(obj.organization_id))
+    if isinstance(obj, Resource):
+        # Resources link to any number of organizations
+        keys.extend(organization_key(organization.pk) for organization in obj.organizations.all())
+    add_keys(request, *keys)
+
+
+def tag_resource_organizations(request, resources):
+    """Tag a page of ``resources`` with the keys of the organizations they link to."""
+    organization_ids = Resource.organizations.through.objects.filter(
+        resource_id__in=[resource.pk for resource in resources]
+    ).values_list('organization_id', flat=True)
+    add_keys(request, *{organization_key(pk) for pk in organization_ids})
+
+
+def keys_for_change(instance):
+    """Keys to purge when ``instance`` is saved or deleted, or None if no page shows it."""
+    model = KEY_MODELS.get(type(instance), type(instance))
+    if model is City:
+        return {city_key(instance)}
+    if model is not Organization and model not in CONTENT_MODELS:
+        return None
+    city = instance.tenant
+    shared = {list_key(name, city) for name in SHARED_LISTS}
+    if model is Organization:
+        # Organization names appear on detail pages and most lists
+        lists = {list_key(model_key(content), city) for content in CONTENT_MODELS}
+        return {organization_key(instance.pk)} | lists | shared
+    keys = {object_key(instance), list_key(model_key(model), city)} | shared
+    if getattr(instance, 'organization_id', None):
+        keys.add(organization_key(instance.organization_id))
+    if model is Resource:
+        # Resources link to any number of organizations. Links added with a
+        # new resource are saved after it (see keys_for_resource_links), and
+        # a deleted one's links are gone by now, so it remembers them.
+        organization_ids = getattr(instance, '_organization_ids', None)
+        if organization_ids is None:
+            organization_ids = instance.organizations.values_list('pk', flat=True)
+        keys.update(organization_key(pk) for pk in organization_ids)
+    return keys
+
+
+def keys_for_resource_links(instance, reverse, pks):
+    """
+    Keys to purge when links between resources and organizations change:
+    ``instance`` is a resource and ``pks`` organizations, or the other way
+    round when ``reverse``.
+    """
+    if reverse:
+        resource_ids, organization_ids = pks, [instance.pk]
+    else:
+        resource_ids, organization_ids = [instance.pk], pks
+    return {f'{model_key(Resource)}-{pk}' for pk in resource_ids} | {
+        organization_key(pk) for pk in organization_ids
+    }
+
+
+def queue_purge(keys):
+    """Purge ``keys`` once the current transaction commits."""
+    if not settings.CACHE_PURGE_URL:
+        return
+    if not hasattr(_pending, 'keys'):
+        _pending.keys = set()
+    _pending.keys.update(keys)
+    transaction.on_commit(flush_purges)
+
+
+def flush_purges():
+    # The first callback after a commit sends everything queued so far;
+    # any later ones in the same batch find nothing left
+    keys = getattr(_pending, 'keys', None)
+    if keys:
+        _pending.keys = set()
+        purge(keys)
+
+
+def purge(keys):
+    """Ask the proxy at CACHE_PURGE_URL to drop every response tagged with ``keys``."""
+    # Imported here: most processes never purge, and urllib.request is slow to import
+    import urllib.error
+    import urllib.request
+
+    keys = sorted(keys)
+    for start in range(0, len(keys), PURGE_BATCH_SIZE):
+        batch = ' '.join(keys[start : start + PURGE_BATCH_SIZE])
+        request = urllib.request.Request(
+            settings.CACHE_PURGE_URL,
+            method=settings.CACHE_PURGE_METHOD,
+            headers={settings.SURROGATE_KEY_HEADER: batch},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=settings.CACHE_PURGE_TIMEOUT):
+                pass
+        except (urllib.error.URLError, OSError):
+            logger.warning("Cache purge failed for keys: %s", batch, exc_info=True)
+
+
+def seconds_until_midnight():
+    now = timezone.localtime()
+    midnight = datetime.datetime.combine(
+        now.date() + datetime.timedelta(days=1), datetime.time(), tzinfo=now.tzinfo
+    )
+    return max(int((midnight - now).total_seconds()), 1)
+
+
+class SurrogateKeyMiddleware:
+    """
+    Add the keys recorded during the request to the response, plus a
+    ``Surrogate-Control`` lifetime for anonymous responses.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with singleflight.tracking_stale():
+            response = self.get_response(request)
+            served_stale = singleflight.served_stale()
+        keys = getattr(request, 'surrogate_keys', None)
+        if keys is None or request.method not in ('GET', 'HEAD') or response.status_code != 200:
+            return response
+
+        keys.add(city_key(request.city))
+        response[settings.SURROGATE_KEY_HEADER] = ' '.join(sorted(keys))
+
+        # Signed-in users and responses setting cookies are never shared
+        if settings.SESSION_COOKIE_NAME in request.COOKIES or response.cookies:
+            return response
+        max_age = settings.SURROGATE_CACHE_SECONDS
+        if getattr(request, 'surrogate_closed', False):
+            max_age = settings.ARCHIVE_CACHE_SECONDS
+        if DATED_KEY in keys:
+            max_age = min(max_age, seconds_until_midnight())
+        max_age = min(max_age, getattr(request, 'surrogate_max_age', max_age))
+        if served_stale:
+            # Built from an outdated result while another worker refreshes it
+            max_age = min(max_age, settings.STAMPEDE_STALE_MAX_AGE)
+        if max_age > 0:
+            response['Surrogate-Control'] = f'max-age={max_age}'
+            if DATED_KEY in keys and settings.SURROGATE_STALE_SECONDS:
+                response[
+                    'Surrogate-Control'
+                ] += f', stale-while-revalidate={settings.SURROGATE_STALE_SECONDS}'
+        return response
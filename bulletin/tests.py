@@ -1,3 +1,1458 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import http.server
+import io
+import os
+import shutil
+import smtplib
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import recurrence
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, IntegrityError, transaction
+from django.http import Http404
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from . import (
+    archive,
+    backup,
+    bulk,
+    caching,
+    cities,
+    digest,
+    importer,
+    media,
+    monthly,
+    offline,
+    paginators,
+    ratelimit,
+    recurrences,
+    rendering,
+    replicas,
+    schedule,
+    singleflight,
+    storage,
+    timeline,
+    typeahead,
+)
+from .models import (
+    ArchivedEvent,
+    City,
+    Event,
+    EventFeed,
+    Image,
+    MediaBlob,
+    MonthlyCount,
+    News,
+    Organization,
+    Promotion,
+    Resource,
+    Special,
+    Subscriber,
+)
+
+
+class BulletinTestCase(TestCase):
+    """Empty caches and plain static storage for each test; no rate limits or purging."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            CACHES={
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': 'tests',
+                    'KEY_FUNCTION': 'bulletin.cities.make_cache_key',
+                },
+                'shared': {**settings.CACHES['shared'], 'LOCATION': cls.cache_dir},
+            },
+            STORAGES={
+                **settings.STORAGES,
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+            RATE_LIMIT_ENABLED=False,
+            CACHE_PURGE_URL='',
+        )
+        cls.settings_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+
+    def setUp(self):
+        for alias in ('default', 'shared'):
+            caches[alias].clear()
+        # City rows from earlier tests were rolled back without signals
+        cities.clear_host_cache()
+
+
+def make_city(slug='chi', **kwargs):
+    return City.objects.create(
+        **{
+            'name': slug.title(),
+            'state': 'IL',
+            'slug': slug,
+            'domain': f'{slug}.test',
+            **kwargs,
+        }
+    )
+
+
+def make_organization(**kwargs):
+    return Organization.objects.create(**{'name': 'Green Leaf', 'category': 'cafe', **kwargs})
+
+
+def make_news(slug='news', **kwargs):
+    return News.objects.create(
+        **{
+            'title': slug.title(),
+            'slug': slug,
+            'content': 'Body',
+            'summary': 'Summary',
+            **kwargs,
+        }
+    )
+
+
+def make_event(slug='event', start_date=None, **kwargs):
+    start_date = start_date or timezone.localdate()
+    return Event.objects.create(
+        **{
+            'title': slug.title(),
+            'slug': slug,
+            'description': 'Body',
+            'summary': 'Summary',
+            'start_date': start_date,
+            'end_date': start_date,
+            'address': '1 Main St',
+            'city': 'Chicago',
+            **kwargs,
+        }
+    )
+
+
+def make_special(organization, slug='special', **kwargs):
+    today = timezone.localdate()
+    return Special.objects.create(
+        **{
+            'title': slug.title(),
+            'slug': slug,
+            'description': 'Body',
+            'summary': 'Summary',
+            'start_date': today,
+            'end_date': today,
+            'organization': organization,
+            **kwargs,
+        }
+    )
+
+
+def make_promotion(organization, slug='promotion', **kwargs):
+    return Promotion.objects.create(
+        **{
+            'title': slug.title(),
+            'slug': slug,
+            'description': 'Body',
+            'summary': 'Summary',
+            'recurrence_type': 'daily',
+            'valid_from': timezone.localdate(),
+            'organization': organization,
+            **kwargs,
+        }
+    )
+
+
+def make_resource(slug='resource', **kwargs):
+    return Resource.objects.create(
+        **{
+            'title': slug.title(),
+            'slug': slug,
+            'resource_type': 'guide',
+            'content': 'Body',
+            'summary': 'Summary',
+            **kwargs,
+        }
+    )
+
+
+class FeedCursorTests(BulletinTestCase):
+    def test_round_trip(self):
+        entry = timeline.TimelineEntry(pk=7, sort_timestamp=timeline.EPOCH.replace(year=2026))
+        self.assertEqual(
+            timeline.decode_cursor(timeline.encode_cursor(entry)), (entry.sort_timestamp, 7)
+        )
+
+    def test_malformed_cursors_raise_value_error(self):
+        for cursor in ('', 'abc', '12-x', '99999999999999999999-1', '-99999999999999999999-1'):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                timeline.decode_cursor(cursor)
+
+    def test_out_of_range_cursor_is_a_bad_request(self):
+        response = self.client.get('/api/feed/', {'before': '99999999999999999999-1'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FeedPageTests(BulletinTestCase):
+    published_date = datetime.datetime(2024, 3, 15, 12, tzinfo=datetime.timezone.utc)
+
+    def walk(self, limit):
+        """Titles of each page, following the cursors through the API."""
+        pages = []
+        params = {'limit': limit}
+        while True:
+            response = self.client.get('/api/feed/', params).json()
+            pages.append([result['title'] for result in response['results']])
+            if response['next'] is None:
+                return pages
+            params['before'] = response['next']
+
+    def test_entries_with_the_same_timestamp_are_split_across_pages(self):
+        for i in range(5):
+            make_news(f'news-{i}', published_date=self.published_date)
+        pages = self.walk(2)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(sorted(sum(pages, [])), [f'News-{i}' for i in range(5)])
+
+    def test_full_last_page_has_no_next_cursor(self):
+        for i in range(4):
+            make_news(f'news-{i}', published_date=self.published_date + datetime.timedelta(hours=i))
+        self.assertEqual(self.walk(2), [['News-3', 'News-2'], ['News-1', 'News-0']])
+
+    def test_unpublished_and_empty(self):
+        self.assertEqual(self.walk(2), [[]])
+        make_news('draft', is_published=False)
+        self.assertEqual(self.walk(2), [[]])
+
+    def test_page_reads_past_an_entry_deleted_since(self):
+        news = [
+            make_news(f'news-{i}', published_date=self.published_date + datetime.timedelta(hours=i))
+            for i in range(3)
+        ]
+        _, cursor = timeline.get_page(limit=1)
+        news[2].delete()
+        self.assertEqual(
+            [entry.title for entry in timeline.get_page(cursor=cursor, limit=5)[0]],
+            ['News-1', 'News-0'],
+        )
+
+
+@override_settings(ALLOWED_HOSTS=['.test', 'testserver'])
+class CityTests(BulletinTestCase):
+    def setUp(self):
+        super().setUp()
+        self.chicago = make_city('chi')
+        self.new_york = make_city('nyc', name='New York', state='NY', timezone='America/New_York')
+        make_news('chicago-news', tenant=self.chicago)
+        make_news('new-york-news', tenant=self.new_york)
+
+    def news(self, host):
+        response = self.client.get('/news/', headers={'host': host})
+        self.assertEqual(response.status_code, 200)
+        return [news.slug for news in response.context['news_list']], response.wsgi_request
+
+    def test_host_selects_the_city(self):
+        slugs, request = self.news('nyc.test')
+        self.assertEqual(slugs, ['new-york-news'])
+        self.assertEqual(request.city, self.new_york)
+        self.assertEqual(self.news('CHI.test:8000')[0], ['chicago-news'])
+
+    def test_unknown_host_is_not_found(self):
+        self.assertEqual(self.client.get('/news/', headers={'host': 'other.test'}).status_code, 404)
+        # The admin works at any host
+        self.assertEqual(
+            self.client.get('/admin/', headers={'host': 'other.test'}).status_code, 302
+        )
+
+    def test_unknown_host_gets_the_default_city(self):
+        self.new_york.is_default = True
+        self.new_york.save()
+        self.assertEqual(self.news('other.test')[0], ['new-york-news'])
+
+    def test_without_cities_every_host_is_served(self):
+        City.objects.all().delete()
+        make_news('local-news')
+        self.assertEqual(self.news('other.test')[0], ['local-news'])
+
+    def test_cache_entries_are_kept_per_city(self):
+        cache = caches['default']
+        for city in (None, self.chicago, self.new_york):
+            with cities.activate_city(city):
+                cache.set('greeting', f'hello {city}')
+        for city in (None, self.chicago, self.new_york):
+            with cities.activate_city(city):
+                self.assertEqual(cache.get('greeting'), f'hello {city}')
+
+        with cities.activate_city(self.chicago):
+            cache.delete('greeting')
+        with cities.activate_city(self.new_york):
+            self.assertEqual(cache.get('greeting'), f'hello {self.new_york}')
+
+
+class ContentVersionTests(BulletinTestCase):
+    def test_bump_changes_version(self):
+        before = caching.get_content_version()
+        caching.bump_content_version()
+        self.assertGreater(caching.get_content_version(), before)
+
+    def test_saving_content_bumps_version_on_commit(self):
+        before = caching.get_content_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_news()
+            self.assertEqual(caching.get_content_version(), before)
+        self.assertNotEqual(caching.get_content_version(), before)
+
+    def test_rolled_back_save_keeps_the_version(self):
+        before = caching.get_content_version()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                make_news()
+                make_news()  # Same slug
+        self.assertEqual(callbacks, [])
+        self.assertEqual(caching.get_content_version(), before)
+
+    def test_version_does_not_expire(self):
+        caching.bump_content_version()
+        caching.bump_content_version()
+        version = caching.get_content_version()
+        later = time.time() + 60 * 60 * 24
+        with mock.patch('django.core.cache.backends.filebased.time.time', return_value=later):
+            self.assertEqual(caching.get_content_version(), version)
+
+    def test_lost_version_is_not_reused(self):
+        caching.bump_content_version()
+        version = caching.get_content_version()
+        caches['shared'].delete(caching.CONTENT_VERSION_KEY)
+        self.assertGreater(caching.get_content_version(), version)
+
+
+@override_settings(READ_REPLICAS=['replica1'])
+class ReplicaChoiceTests(BulletinTestCase):
+    def choose(self, as_of):
+        with mock.patch('bulletin.replicas.replica_as_of', return_value=as_of):
+            return replicas.choose_replica()
+
+    def test_unknown_change_time_reads_the_primary(self):
+        self.assertIsNone(self.choose(time.time() + 60))
+        self.assertIsNone(caching.get_content_changed_at())
+
+    def test_change_time_is_recorded_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_news()
+            self.assertIsNone(caching.get_content_changed_at())
+        self.assertLessEqual(caching.get_content_changed_at(), time.time())
+
+    def test_refresh_records_an_unknown_change_time(self):
+        caching.set_unknown_content_changed_at(1000.0)
+        self.assertEqual(self.choose(1000.0), 'replica1')
+
+        caching.bump_content_version()
+        changed_at = caching.get_content_changed_at()
+        caching.set_unknown_content_changed_at(1000.0)
+        self.assertEqual(caching.get_content_changed_at(), changed_at)
+
+    def test_replica_older_than_the_last_change_is_skipped(self):
+        caching.bump_content_version()
+        changed_at = caching.get_content_changed_at()
+        self.assertIsNone(self.choose(changed_at - 1))
+        self.assertEqual(self.choose(changed_at), 'replica1')
+
+    def test_unavailable_replica_is_skipped(self):
+        caching.bump_content_version()
+        self.assertIsNone(self.choose(None))
+
+
+@override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=100)
+class EstimatedCountPaginatorTests(BulletinTestCase):
+    def setUp(self):
+        super().setUp()
+        self.city = make_city()
+        make_news('one', tenant=self.city)
+        make_news('two', tenant=self.city)
+        make_news('elsewhere', tenant=make_city('nyc'))
+
+    def count(self, queryset):
+        return paginators.EstimatedCountPaginator(queryset, 20).count
+
+    @mock.patch('bulletin.paginators.estimate_row_count', return_value=5000)
+    def test_unfiltered_large_table_uses_estimate(self, estimate):
+        self.assertEqual(self.count(News.objects.all()), 5000)
+
+    @mock.patch('bulletin.paginators.estimate_row_count', return_value=5000)
+    def test_city_list_on_large_table_uses_cached_city_count(self, estimate):
+        self.assertEqual(self.count(News.objects.for_city(self.city)), 2)
+        make_news('three', tenant=self.city)
+        self.assertEqual(self.count(News.objects.for_city(self.city)), 2)
+
+    @mock.patch('bulletin.paginators.estimate_row_count', return_value=50)
+    def test_small_table_counts_exactly(self, estimate):
+        self.assertEqual(self.count(News.objects.for_city(self.city)), 2)
+        make_news('three', tenant=self.city)
+        self.assertEqual(self.count(News.objects.for_city(self.city)), 3)
+
+    @mock.patch('bulletin.paginators.estimate_row_count', return_value=5000)
+    def test_other_filters_count_up_to_limit(self, estimate):
+        queryset = News.objects.for_city(self.city).filter(title='One')
+        self.assertEqual(self.count(queryset), 1)
+
+
+class ArchiveTests(BulletinTestCase):
+    def archive(self, event):
+        archive.archive_rows(Event, ArchivedEvent, [event])
+
+    def test_archived_rows_keep_their_slug_and_url(self):
+        day = timezone.localdate() - datetime.timedelta(days=400)
+        self.archive(make_event('market', start_date=day, title='First market'))
+        self.archive(
+            make_event('market', start_date=day.replace(year=day.year + 1), title='Second market')
+        )
+
+        self.assertEqual(
+            list(ArchivedEvent.objects.values_list('slug', flat=True)), ['market', 'market']
+        )
+        response = self.client.get('/events/market/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['event'].title, 'Second market')
+
+    def test_live_row_wins_over_archived_slug(self):
+        self.archive(
+            make_event('market', start_date=timezone.localdate() - datetime.timedelta(days=30))
+        )
+        make_event('market', title='Live market')
+        self.assertEqual(self.client.get('/events/market/').context['event'].title, 'Live market')
+
+    def test_unknown_slug_is_not_found(self):
+        self.assertEqual(self.client.get('/events/nothing/').status_code, 404)
+
+
+class RenderedContentTests(BulletinTestCase):
+    def test_excerpt_matches_truncatewords(self):
+        texts = [
+            '',
+            'Short summary',
+            ' '.join(f'word{i}' for i in range(40)),
+            'Tofu & tempeh <b>bowls</b>\n\nwith  "extra"   spacing ' * 5,
+        ]
+        # Templates output the stored excerpt, so compare what each one renders
+        stored = Template('{{ excerpt }}')
+        for words in (5, 15, 20):
+            filtered = Template(f'{{{{ text|truncatewords:{words} }}}}')
+            for text in texts:
+                with self.subTest(words=words, text=text[:20]):
+                    self.assertEqual(
+                        stored.render(Context({'excerpt': rendering.excerpt(words)(text)})),
+                        filtered.render(Context({'text': text})),
+                    )
+
+    def test_home_page_shows_fifteen_words_of_a_special(self):
+        summary = ' '.join(f'word{i}' for i in range(30))
+        special = make_special(make_organization(), summary=summary)
+        self.assertEqual(special.home_excerpt, rendering.excerpt(15)(summary))
+        self.assertEqual(special.summary_excerpt, rendering.excerpt(20)(summary))
+
+        response = self.client.get('/')
+        self.assertContains(response, special.home_excerpt)
+        self.assertNotContains(response, 'word15')
+        self.assertContains(self.client.get('/specials/'), special.summary_excerpt)
+
+    def test_backfill_renders_stale_rows(self):
+        special = make_special(make_organization())
+        Special.objects.filter(pk=special.pk).update(summary='Fresh summary', home_excerpt='')
+        self.assertEqual(rendering.backfill(Special), 1)
+        special.refresh_from_db()
+        self.assertEqual(special.home_excerpt, 'Fresh summary')
+        self.assertEqual(special.summary_excerpt, 'Fresh summary')
+
+
+def make_png(width, height):
+    from PIL import Image as PILImage
+
+    output = io.BytesIO()
+    PILImage.new('RGB', (width, height)).save(output, format='PNG')
+    return SimpleUploadedFile('photo.png', output.getvalue(), content_type='image/png')
+
+
+class MediaTestCase(BulletinTestCase):
+    """Uploads go to a temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class ContentAddressedStorageTests(MediaTestCase):
+    def save(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Image.objects.create(image=upload, alt_text='Photo')
+
+    def ref_count(self, name):
+        return MediaBlob.objects.get(name=name).ref_count
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.save(make_png(20, 10))
+        second = self.save(make_png(20, 10))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith(storage.BLOB_PREFIX))
+        self.assertEqual(self.ref_count(first.image.name), 2)
+
+        different = self.save(make_png(10, 20))
+        self.assertNotEqual(different.image.name, first.image.name)
+
+    def test_file_is_kept_until_the_last_reference_goes(self):
+        first = self.save(make_png(20, 10))
+        second = self.save(make_png(20, 10))
+        name = first.image.name
+        path = first.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.ref_count(name), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_replacing_the_file_releases_the_old_one(self):
+        image = self.save(make_png(20, 10))
+        old_path = image.image.path
+        image.image = make_png(10, 20)
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(self.ref_count(image.image.name), 1)
+
+
+class MediaServingTests(BulletinTestCase):
+    content = b'0123456789'
+
+    def setUp(self):
+        super().setUp()
+        self.document_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.document_root, ignore_errors=True)
+        self.blob = f'{storage.BLOB_PREFIX}ab/cd/abcd1234.txt'
+        for name in (self.blob, 'uploads/notes.txt'):
+            path = os.path.join(self.document_root, name)
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as file:
+                file.write(self.content)
+
+    def get(self, path, **headers):
+        request = RequestFactory().get(f'/media/{path}', headers=headers)
+        return media.serve_media(request, path, self.document_root)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_content_addressed_files_are_immutable(self):
+        response = self.get(self.blob)
+        self.assertEqual(response['ETag'], '"abcd1234"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.body(response), self.content)
+
+        self.assertNotIn('Cache-Control', self.get('uploads/notes.txt'))
+
+    def test_if_none_match(self):
+        self.assertEqual(self.get(self.blob, if_none_match='"abcd1234"').status_code, 304)
+
+    def test_ranges(self):
+        for header, content_range, body in (
+            ('bytes=2-5', 'bytes 2-5/10', b'2345'),
+            ('bytes=7-', 'bytes 7-9/10', b'789'),
+            ('bytes=-3', 'bytes 7-9/10', b'789'),
+            ('bytes=8-100', 'bytes 8-9/10', b'89'),
+        ):
+            with self.subTest(header):
+                response = self.get(self.blob, range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(body)))
+                self.assertEqual(self.body(response), body)
+
+    def test_unsatisfiable_range(self):
+        response = self.get(self.blob, range='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_malformed_range_sends_the_whole_file(self):
+        response = self.get(self.blob, range='bytes=0-1,4-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+
+    def test_if_range(self):
+        current = self.get(self.blob, range='bytes=0-1', if_range='"abcd1234"')
+        self.assertEqual(current.status_code, 206)
+        stale = self.get(self.blob, range='bytes=0-1', if_range='"other"')
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(self.body(stale), self.content)
+
+    def test_dotfiles_and_escapes_are_not_found(self):
+        for path in ('uploads/.hidden', '../notes.txt', 'uploads/missing.txt'):
+            with self.subTest(path), self.assertRaises(Http404):
+                self.get(path)
+
+
+class MonthlyCountTests(BulletinTestCase):
+    published_date = datetime.datetime(2024, 3, 15, 12, tzinfo=datetime.timezone.utc)
+
+    def counts(self):
+        return list(MonthlyCount.objects.values_list('content_type', 'year', 'month', 'count'))
+
+    def test_saving_and_deleting_recounts_the_month(self):
+        first = make_news('first', published_date=self.published_date)
+        make_news('second', published_date=self.published_date)
+        self.assertEqual(self.counts(), [('news', 2024, 3, 2)])
+
+        first.is_published = False
+        first.save()
+        self.assertEqual(self.counts(), [('news', 2024, 3, 1)])
+
+        News.objects.get(slug='second').delete()
+        self.assertEqual(self.counts(), [])
+
+    def test_one_row_per_month_without_cities(self):
+        MonthlyCount.objects.create(content_type='news', year=2024, month=3, count=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            MonthlyCount.objects.create(content_type='news', year=2024, month=3, count=1)
+
+    def test_refresh_recounts_a_row_added_concurrently(self):
+        make_news('first', published_date=self.published_date)
+        MonthlyCount.objects.all().delete()
+        count_month = monthly.count_month
+        calls = []
+
+        def added_meanwhile(*args):
+            # Another process inserts the row after the first refresh found none
+            if not calls:
+                MonthlyCount.objects.create(content_type='news', year=2024, month=3, count=5)
+            calls.append(args)
+            return count_month(*args)
+
+        with mock.patch('bulletin.monthly.count_month', side_effect=added_meanwhile):
+            self.assertTrue(monthly.refresh_months('news', None, {(2024, 3)}))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.counts(), [('news', 2024, 3, 1)])
+
+    def test_archive_page_lists_the_month(self):
+        make_news('first', published_date=self.published_date)
+        response = self.client.get('/news/archive/2024/3/')
+        self.assertTemplateUsed(response, 'bulletin/archive.html')
+        self.assertEqual([news.slug for news in response.context['object_list']], ['first'])
+        self.assertEqual([row.count for row in response.context['months']], [1])
+
+
+@override_settings(CACHE_PURGE_URL='http://proxy.test/')
+class PurgeKeyTests(BulletinTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('bulletin.surrogate.purge')
+        self.purge = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def purged(self, change):
+        """Keys purged by the commit of ``change()``."""
+        self.purge.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        return set().union(*(call.args[0] for call in self.purge.call_args_list))
+
+    def test_saving_each_content_model_purges_its_keys(self):
+        organization = make_organization()
+        makers = {
+            'news': lambda: make_news(organization=organization),
+            'event': lambda: make_event(organization=organization),
+            'special': lambda: make_special(organization),
+            'promotion': lambda: make_promotion(organization),
+            'resource': make_resource,
+        }
+        for name, make in makers.items():
+            with self.subTest(model=name):
+                objects = []
+                keys = self.purged(lambda: objects.append(make()))
+                obj = objects[0]
+                self.assertIn(f'{name}-{obj.pk}', keys)
+                self.assertIn(f'{name}-list-none', keys)
+                if name != 'resource':
+                    self.assertIn(f'organization-{organization.pk}', keys)
+
+                self.assertIn(f'{name}-{obj.pk}', self.purged(obj.save))
+                self.assertIn(f'{name}-{obj.pk}', self.purged(obj.delete))
+
+    def test_resource_purges_its_organizations(self):
+        organizations = [make_organization(), make_organization(name='Sprout')]
+        resource = make_resource()
+        resource.organizations.set(organizations)
+        keys = self.purged(resource.save)
+        self.assertLessEqual(
+            {f'organization-{organization.pk}' for organization in organizations}, keys
+        )
+
+    def test_resource_links_purge_both_sides(self):
+        green, sprout = make_organization(), make_organization(name='Sprout')
+        resource = make_resource()
+        # Send what creating them queued
+        self.purged(resource.save)
+        resource_key = f'resource-{resource.pk}'
+        self.assertEqual(
+            self.purged(lambda: resource.organizations.add(green, sprout)),
+            {resource_key, f'organization-{green.pk}', f'organization-{sprout.pk}'},
+        )
+        self.assertEqual(
+            self.purged(lambda: resource.organizations.remove(green)),
+            {resource_key, f'organization-{green.pk}'},
+        )
+        self.assertEqual(
+            self.purged(resource.organizations.clear), {resource_key, f'organization-{sprout.pk}'}
+        )
+        self.assertEqual(
+            self.purged(lambda: green.resources.add(resource)),
+            {resource_key, f'organization-{green.pk}'},
+        )
+        self.assertEqual(
+            self.purged(green.resources.clear), {resource_key, f'organization-{green.pk}'}
+        )
+
+    def test_deleted_resource_purges_its_organizations(self):
+        organization = make_organization()
+        resource = make_resource()
+        resource.organizations.add(organization)
+        self.assertIn(f'organization-{organization.pk}', self.purged(resource.delete))
+
+    def test_resource_pages_are_tagged_with_their_organizations(self):
+        organization = make_organization()
+        resource = make_resource()
+        resource.organizations.add(organization)
+        for url in (resource.get_absolute_url(), '/resources/'):
+            with self.subTest(url=url):
+                keys = self.client.get(url)[settings.SURROGATE_KEY_HEADER].split()
+                self.assertIn(f'organization-{organization.pk}', keys)
+
+    def test_organization_purges_content_lists(self):
+        keys = self.purged(make_organization)
+        self.assertLessEqual({'news-list-none', 'event-list-none', 'resource-list-none'}, keys)
+
+    def test_city_keys_are_per_city(self):
+        city = make_city()
+        keys = self.purged(lambda: make_news(tenant=city))
+        self.assertIn(f'news-list-{city.pk}', keys)
+        self.assertNotIn('news-list-none', keys)
+
+    def test_other_models_do_not_purge(self):
+        self.assertEqual(self.purged(lambda: User.objects.create(username='editor')), set())
+
+
+class RecurrenceCacheTests(BulletinTestCase):
+    monday = datetime.date(2024, 1, 1)
+
+    def setUp(self):
+        super().setUp()
+        recurrences.cache_clear()
+        self.addCleanup(recurrences.cache_clear)
+        self.promotion = make_promotion(
+            make_organization(), valid_from=self.monday, recurrence_pattern=self.weekly('MO')
+        )
+
+    def weekly(self, day):
+        return recurrence.Recurrence(
+            rrules=[recurrence.Rule(recurrence.WEEKLY, byday=[getattr(recurrence, day)])]
+        )
+
+    def test_compiled_rules_are_reused(self):
+        tuesday = self.monday + datetime.timedelta(days=1)
+        self.assertTrue(self.promotion.is_active_on_date(self.monday))
+        self.assertFalse(self.promotion.is_active_on_date(tuesday))
+        self.assertFalse(Promotion.objects.get().is_active_on_date(tuesday))
+        info = recurrences.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (2, 1, 1))
+
+    def test_deferred_pattern_is_only_loaded_on_a_miss(self):
+        self.promotion.is_active_on_date(self.monday)
+        promotion = Promotion.objects.defer('recurrence_pattern').get()
+        with self.assertNumQueries(0):
+            self.assertTrue(promotion.is_active_on_date(self.monday))
+
+        recurrences.cache_clear()
+        with self.assertNumQueries(1):
+            self.assertTrue(promotion.is_active_on_date(self.monday))
+
+    def test_edit_uses_the_new_pattern(self):
+        self.assertTrue(self.promotion.is_active_on_date(self.monday))
+        self.promotion.recurrence_pattern = self.weekly('TU')
+        self.promotion.save()
+        self.assertFalse(self.promotion.is_active_on_date(self.monday))
+        self.assertTrue(self.promotion.is_active_on_date(self.monday + datetime.timedelta(days=1)))
+        self.assertEqual(recurrences.cache_info().misses, 2)
+
+    def test_promotion_without_a_pattern_runs_every_day(self):
+        promotion = make_promotion(make_organization(), slug='always', valid_from=self.monday)
+        for offset in range(7):
+            self.assertTrue(promotion.is_active_on_date(self.monday + datetime.timedelta(offset)))
+        self.assertEqual(recurrences.cache_info().misses, 1)
+
+
+class HappeningNowTests(BulletinTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organization = make_organization()
+        self.today = timezone.localdate()
+        self.yesterday = self.today - datetime.timedelta(days=1)
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(
+            datetime.datetime.combine(self.today, datetime.time(hour, minute))
+        )
+
+    def running(self, now):
+        return [promotion.slug for promotion in schedule.get_happening_now(now=now)]
+
+    def test_running_at(self):
+        lunch = (1, datetime.time(11), datetime.time(14))
+        late = (2, datetime.time(22), datetime.time(2))
+        all_day = (3, None, None)
+        from_five = (4, datetime.time(17), None)
+        today = [lunch, late, all_day, from_five]
+        for time, expected in (
+            (datetime.time(1), [3, 2]),
+            (datetime.time(11), [1, 3]),
+            (datetime.time(14), [3]),
+            (datetime.time(23), [2, 3, 4]),
+        ):
+            with self.subTest(time=time):
+                self.assertEqual(schedule.running_at(today, [late], time), expected)
+
+    def test_window_past_midnight_comes_from_yesterday(self):
+        make_promotion(
+            self.organization,
+            slug='late',
+            valid_from=self.yesterday,
+            valid_until=self.yesterday,
+            start_time=datetime.time(22),
+            end_time=datetime.time(2),
+        )
+        self.assertEqual(self.running(self.at(1, 30)), ['late'])
+        self.assertEqual(self.running(self.at(2)), [])
+
+    def test_time_windows_and_publication(self):
+        make_promotion(
+            self.organization,
+            slug='lunch',
+            start_time=datetime.time(11),
+            end_time=datetime.time(14),
+        )
+        make_promotion(self.organization, slug='all-day')
+        make_promotion(self.organization, slug='draft', is_published=False)
+        self.assertEqual(sorted(self.running(self.at(12))), ['all-day', 'lunch'])
+        self.assertEqual(self.running(self.at(15)), ['all-day'])
+
+    def test_schedule_is_rebuilt_after_an_edit(self):
+        promotion = make_promotion(self.organization, slug='lunch')
+        self.assertEqual(self.running(self.at(12)), ['lunch'])
+        promotion.valid_from = self.today + datetime.timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            promotion.save()
+        self.assertEqual(self.running(self.at(12, 1)), [])
+
+    def test_page_and_api(self):
+        make_promotion(self.organization, slug='all-day')
+        response = self.client.get('/promotions/now/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [promotion.slug for promotion in response.context['promotions']], ['all-day']
+        )
+
+        results = self.client.get('/api/promotions/now/').json()['results']
+        self.assertEqual(
+            [(result['title'], result['organization']) for result in results],
+            [('All-Day', 'Green Leaf')],
+        )
+        self.assertIsNone(results[0]['start_time'])
+
+
+class UnsubscribeTests(BulletinTestCase):
+    def setUp(self):
+        super().setUp()
+        self.subscriber = Subscriber.objects.create(email='reader@example.com')
+        self.url = self.subscriber.get_unsubscribe_url()
+
+    def test_opening_the_link_asks_for_confirmation(self):
+        response = self.client.get(self.url)
+        self.assertTemplateUsed(response, 'bulletin/unsubscribe.html')
+        self.subscriber.refresh_from_db()
+        self.assertTrue(self.subscriber.is_active)
+
+    def test_post_unsubscribes(self):
+        # As sent by a one-click (RFC 8058) mail client, without a CSRF token
+        client = self.client_class(enforce_csrf_checks=True)
+        response = client.post(self.url, {'List-Unsubscribe': 'One-Click'})
+        self.assertTemplateUsed(response, 'bulletin/unsubscribed.html')
+        self.subscriber.refresh_from_db()
+        self.assertFalse(self.subscriber.is_active)
+
+
+class SubscriberUniquenessTests(BulletinTestCase):
+    def assertDuplicateRejected(self, **kwargs):
+        Subscriber.objects.create(email='reader@example.com', **kwargs)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Subscriber.objects.create(email='reader@example.com', **kwargs)
+
+    def test_one_subscription_per_address_without_cities(self):
+        self.assertDuplicateRejected()
+
+    def test_one_subscription_per_address_and_city(self):
+        self.assertDuplicateRejected(tenant=make_city())
+
+    def test_same_address_in_two_cities(self):
+        Subscriber.objects.create(email='reader@example.com', tenant=make_city())
+        Subscriber.objects.create(email='reader@example.com', tenant=make_city('nyc'))
+        self.assertEqual(Subscriber.objects.count(), 2)
+
+
+class DroppingConnection:
+    """SMTP connection that drops after ``limit`` messages and refuses to reconnect."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.sent = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def open(self):
+        raise ConnectionRefusedError
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        if len(self.sent) >= self.limit:
+            raise smtplib.SMTPServerDisconnected
+        self.sent.extend(messages)
+        return len(messages)
+
+
+class DigestSendTests(BulletinTestCase):
+    def test_refused_reconnect_stops_and_records_who_was_sent(self):
+        for name in ('a', 'b', 'c'):
+            Subscriber.objects.create(email=f'{name}@example.com')
+        weekly = digest.build_digest(None)
+        connection = DroppingConnection(limit=2)
+        with mock.patch('bulletin.digest.get_connection', return_value=connection), self.assertLogs(
+            'bulletin.digest', 'ERROR'
+        ):
+            self.assertEqual(weekly.send(), (2, 0))
+
+        sent = Subscriber.objects.filter(last_digest_week=weekly.week).values_list(
+            'email', flat=True
+        )
+        self.assertEqual(sorted(sent), ['a@example.com', 'b@example.com'])
+        self.assertEqual(
+            list(weekly.pending_subscribers().values_list('email', flat=True)), ['c@example.com']
+        )
+
+    def test_default_city_mails_subscribers_without_a_city(self):
+        chicago = make_city(is_default=True)
+        new_york = make_city('nyc')
+        Subscriber.objects.create(email='legacy@example.com')
+        Subscriber.objects.create(email='both@example.com')
+        Subscriber.objects.create(email='both@example.com', tenant=chicago)
+        Subscriber.objects.create(email='chicago@example.com', tenant=chicago)
+        Subscriber.objects.create(email='nyc@example.com', tenant=new_york)
+
+        def pending(city):
+            return sorted(
+                digest.build_digest(city).pending_subscribers().values_list('email', flat=True)
+            )
+
+        self.assertEqual(
+            pending(chicago), ['both@example.com', 'chicago@example.com', 'legacy@example.com']
+        )
+        self.assertEqual(pending(new_york), ['nyc@example.com'])
+
+
+class FeedHandler(http.server.BaseHTTPRequestHandler):
+    """Serves ``body`` with ``etag``, answering 304 when the client has it."""
+
+    body = b''
+    etag = '"1"'
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_ics(*events):
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0']
+    for uid, summary, day, status in events:
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:{uid}',
+            f'SUMMARY:{summary}',
+            f'DTSTART;VALUE=DATE:{day:%Y%m%d}',
+            'DESCRIPTION:From the feed',
+            f'STATUS:{status}',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(lines).encode()
+
+
+class FeedImportTests(BulletinTestCase):
+    def setUp(self):
+        super().setUp()
+        FeedHandler.requests = []
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FeedHandler)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        self.day = timezone.localdate() + datetime.timedelta(days=7)
+        self.feed = EventFeed.objects.create(
+            organization=make_organization(city='Chicago'),
+            url=f'http://127.0.0.1:{server.server_port}/calendar.ics',
+        )
+        self.serve(
+            make_ics(('a', 'Potluck', self.day, 'CONFIRMED'), ('b', 'Film night', self.day, ''))
+        )
+
+    def serve(self, body, etag=None):
+        FeedHandler.body = body
+        FeedHandler.etag = etag or f'"{hashlib.sha1(body).hexdigest()}"'
+
+    def run_import(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            (feed,) = importer.import_feeds(EventFeed.objects.filter(pk=self.feed.pk))
+        return feed
+
+    def event(self, uid):
+        return Event.objects.get(source_feed=self.feed, source_uid=uid)
+
+    def test_unchanged_feed_answers_not_modified(self):
+        feed = self.run_import()
+        self.assertEqual((feed.last_status, feed.last_event_count), ('ok', 2))
+        self.assertEqual(Event.objects.filter(is_published=True).count(), 2)
+
+        feed = self.run_import()
+        self.assertEqual(feed.last_status, 'not_modified')
+        self.assertEqual(FeedHandler.requests[-1]['If-None-Match'], FeedHandler.etag)
+
+    def test_cancelled_item_is_unpublished(self):
+        self.run_import()
+        self.serve(
+            make_ics(('a', 'Potluck', self.day, 'CANCELLED'), ('b', 'Film night', self.day, ''))
+        )
+        feed = self.run_import()
+        self.assertEqual(feed.last_event_count, 1)
+        self.assertFalse(self.event('a').is_published)
+        self.assertTrue(self.event('b').is_published)
+
+    def test_reimport_keeps_editors_changes(self):
+        self.run_import()
+        Event.objects.filter(source_uid='a').update(
+            is_published=False, description='Bring a dish', cost='Free'
+        )
+        untouched = self.event('b').updated_at
+
+        # The feed renames the potluck and leaves the film night as it was
+        self.serve(
+            make_ics(('a', 'Big potluck', self.day, 'CONFIRMED'), ('b', 'Film night', self.day, ''))
+        )
+        feed = self.run_import()
+        self.assertEqual(feed.last_event_count, 1)
+        potluck = self.event('a')
+        self.assertEqual(potluck.title, 'Big potluck')
+        self.assertEqual((potluck.description, potluck.cost), ('Bring a dish', 'Free'))
+        self.assertFalse(potluck.is_published)
+        self.assertEqual(self.event('b').updated_at, untouched)
+
+    def test_malformed_feed_is_recorded(self):
+        self.feed.format = 'rss'
+        self.feed.save()
+        self.serve(b'<rss><channel><item>')
+        feed = self.run_import()
+        self.assertEqual(feed.last_status, 'error')
+        self.assertIn('Could not parse feed', feed.last_error)
+        # Without the validators the next run fetches the feed again
+        self.assertEqual(feed.etag, '')
+        self.assertFalse(Event.objects.exists())
+
+    def test_database_error_is_recorded(self):
+        with mock.patch.object(Event.objects, 'bulk_create', side_effect=DatabaseError('locked')):
+            feed = self.run_import()
+        self.assertEqual(feed.last_status, 'error')
+        self.assertEqual(feed.last_error, 'Could not save events: locked')
+        self.assertEqual(feed.etag, '')
+
+
+class ImageProcessingTests(MediaTestCase):
+    def save(self, upload):
+        return Image.objects.create(image=upload, alt_text='Photo')
+
+    @override_settings(IMAGE_MAX_DECODE_PIXELS=10_000)
+    def test_programmatic_save_checks_the_decode_limit(self):
+        with mock.patch('PIL.ImageFile.ImageFile.load') as load:
+            with self.assertRaises(ValidationError):
+                self.save(make_png(200, 200))
+        load.assert_not_called()
+        self.assertFalse(Image.objects.exists())
+
+    @override_settings(IMAGE_MAX_DIMENSION=50)
+    def test_programmatic_save_downscales(self):
+        from PIL import Image as PILImage
+
+        image = self.save(make_png(200, 100))
+        with PILImage.open(image.image.path) as stored:
+            self.assertEqual(stored.size, (50, 25))
+
+
+class BulkEditTests(BulletinTestCase):
+    def setUp(self):
+        super().setUp()
+        self.day = datetime.date(2030, 5, 4)
+        self.events = [make_event(f'event-{i}', start_date=self.day) for i in range(3)]
+
+    def test_update_changes_the_rows_and_bumps_the_version(self):
+        version = caching.get_content_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            count = bulk.update_content(Event.objects.all(), is_published=False)
+        self.assertEqual(count, 3)
+        self.assertFalse(Event.objects.filter(is_published=True).exists())
+        self.assertNotEqual(caching.get_content_version(), version)
+
+    def test_shift_dates_keeps_empty_dates_empty(self):
+        organization = make_organization()
+        make_promotion(organization, slug='open', valid_from=self.day)
+        make_promotion(organization, slug='until', valid_from=self.day, valid_until=self.day)
+        bulk.shift_dates(Promotion.objects.all(), ['valid_from', 'valid_until'], 2)
+        moved = self.day + datetime.timedelta(days=2)
+        self.assertEqual(
+            list(Promotion.objects.order_by('slug').values_list('valid_from', 'valid_until')),
+            [(moved, None), (moved, moved)],
+        )
+
+    def test_clones_move_dates_and_get_dated_slugs(self):
+        original = self.events[0]
+        Event.objects.filter(pk=original.pk).update(
+            end_date=self.day + datetime.timedelta(days=1), source_uid='feed-1'
+        )
+        week = datetime.timedelta(weeks=1)
+        (clone,) = bulk.clone_content(
+            Event.objects.filter(pk=original.pk), ['start_date', 'end_date'], week
+        )
+        clone.refresh_from_db()
+        self.assertEqual(clone.slug, f'event-0-{self.day + week}')
+        self.assertEqual(
+            (clone.start_date, clone.end_date),
+            (self.day + week, self.day + week + datetime.timedelta(days=1)),
+        )
+        self.assertEqual(clone.source_uid, '')
+
+        # Cloning the clone replaces its date; cloning the original again numbers it
+        (second,) = bulk.clone_content(
+            Event.objects.filter(pk=clone.pk), ['start_date', 'end_date'], week
+        )
+        self.assertEqual(second.slug, f'event-0-{self.day + 2 * week}')
+        (again,) = bulk.clone_content(
+            Event.objects.filter(pk=original.pk), ['start_date', 'end_date'], week
+        )
+        self.assertEqual(again.slug, f'event-0-{self.day + week}-2')
+
+    def test_admin_action(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = self.client.post(
+            '/admin/bulletin/event/',
+            {
+                'action': 'unpublish',
+                '_selected_action': [event.pk for event in self.events[:2]],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(Event.objects.filter(is_published=True).values_list('slug', flat=True)),
+            ['event-2'],
+        )
+
+
+class TypeaheadTests(BulletinTestCase):
+    def setUp(self):
+        super().setUp()
+        typeahead._indexes.clear()
+        self.addCleanup(typeahead._indexes.clear)
+
+    def titles(self, query, **kwargs):
+        return [result['title'] for result in typeahead.search(None, query, **kwargs)]
+
+    def test_any_word_starts_a_match(self):
+        make_organization(name='The Green Kitchen')
+        make_event('potluck', title='Potluck', venue_name='Kitchen Collective')
+        self.assertEqual(self.titles('kitch'), ['Potluck', 'The Green Kitchen'])
+        self.assertEqual(self.titles('green kit'), ['The Green Kitchen'])
+        self.assertEqual(self.titles('een'), [])
+
+    def test_accents_and_case_are_ignored(self):
+        make_organization(name='Café Pétale')
+        self.assertEqual(self.titles('CAFE PE'), ['Café Pétale'])
+
+    def test_matches_at_the_start_of_a_name_come_first(self):
+        make_news('sprout-news', title='Sprout opens')
+        make_organization(name='Green Sprout')
+        make_organization(name='Sprout')
+        self.assertEqual(self.titles('sprout'), ['Sprout', 'Sprout opens', 'Green Sprout'])
+        self.assertEqual(self.titles('sprout', limit=1), ['Sprout'])
+
+    def test_past_and_unpublished_content_is_left_out(self):
+        last_week = timezone.localdate() - datetime.timedelta(days=7)
+        make_event('over', title='Vegan fair', start_date=last_week)
+        make_news('draft', title='Vegan draft', is_published=False)
+        make_news('live', title='Vegan news')
+        self.assertEqual(self.titles('vegan'), ['Vegan news'])
+
+    def test_index_catches_up_with_changes(self):
+        news = make_news('market', title='Night market')
+        self.assertEqual(self.titles('night'), ['Night market'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            news.title = 'Morning market'
+            news.save()
+            make_organization(name='Nightshade')
+        self.assertEqual(self.titles('night'), ['Nightshade'])
+        self.assertEqual(self.titles('morning'), ['Morning market'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            news.delete()
+        self.assertEqual(self.titles('morning'), [])
+
+    def test_api(self):
+        for name in ('Sprout', 'Sprout Two', 'Sprout Three'):
+            make_organization(name=name)
+        response = self.client.get('/api/typeahead/', {'q': 'spr', 'limit': 2})
+        self.assertEqual(response.json()['query'], 'spr')
+        self.assertEqual(
+            response.json()['results'],
+            [
+                {'type': 'organization', 'title': 'Sprout', 'detail': 'Cafe', 'url': None},
+                {'type': 'organization', 'title': 'Sprout Two', 'detail': 'Cafe', 'url': None},
+            ],
+        )
+        self.assertEqual(self.client.get('/api/typeahead/').json()['results'], [])
+
+
+class OfflineTests(BulletinTestCase):
+    def setUp(self):
+        super().setUp()
+        for cached in (offline.precache_urls, offline.cache_version):
+            cached.cache_clear()
+            self.addCleanup(cached.cache_clear)
+
+    @override_settings(SITE_STYLESHEETS=['https://cdn.example.com/site.css'])
+    def test_service_worker(self):
+        response = self.client.get('/sw.js')
+        self.assertEqual(response['Content-Type'], 'text/javascript')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        script = response.content.decode()
+        self.assertIn(offline.cache_version(), script)
+        self.assertIn('"https://cdn.example.com/site.css"', script)
+        self.assertIn('"/api/"', script)
+
+    def test_version_follows_the_precache_list(self):
+        version = offline.cache_version()
+        offline.precache_urls.cache_clear()
+        offline.cache_version.cache_clear()
+        with override_settings(SITE_STYLESHEETS=['https://cdn.example.com/other.css']):
+            self.assertNotEqual(offline.cache_version(), version)
+
+    def test_manifest(self):
+        response = self.client.get('/manifest.webmanifest')
+        self.assertEqual(response['Content-Type'], 'application/manifest+json')
+        manifest = response.json()
+        self.assertEqual(manifest['name'], f'{settings.CITY_NAME} Vegan Bulletin')
+        self.assertEqual(manifest['start_url'], '/')
+        self.assertEqual(manifest['display'], 'standalone')
+
+
+class SingleFlightTests(BulletinTestCase):
+    def setUp(self):
+        super().setUp()
+        self.compute = mock.Mock(side_effect=['first', 'second'])
+
+    def get(self):
+        return singleflight.get_or_compute('result', self.compute, 60)
+
+    def test_result_is_computed_once_per_content_version(self):
+        self.assertEqual([self.get(), self.get()], ['first', 'first'])
+        caching.bump_content_version()
+        self.assertEqual(self.get(), 'second')
+        self.assertEqual(self.compute.call_count, 2)
+
+    def test_outdated_result_is_served_while_another_worker_recomputes(self):
+        self.get()
+        caching.bump_content_version()
+        caches['shared'].add('result:lease', time.time(), 30)
+        with singleflight.tracking_stale():
+            self.assertEqual(self.get(), 'first')
+            self.assertTrue(singleflight.served_stale())
+        self.assertEqual(self.compute.call_count, 1)
+
+    @override_settings(STAMPEDE_WAIT_SECONDS=0)
+    def test_computes_itself_with_nothing_to_fall_back_on(self):
+        caches['shared'].add('result:lease', time.time(), 30)
+        self.assertEqual(self.get(), 'first')
+
+    def test_warm_caches_builds_tomorrows_schedule(self):
+        make_promotion(make_organization())
+        out = io.StringIO()
+        call_command('warm_caches', '--tomorrow', stdout=out)
+        tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+        self.assertIn(f'default {tomorrow}: 1 promotion(s)', out.getvalue())
+        with mock.patch('bulletin.schedule.Promotion.objects') as promotions:
+            self.assertEqual(len(schedule.get_day_schedule(tomorrow)), 1)
+        promotions.for_city.assert_not_called()
+
+
+class CrawlerTests(TestCase):
+    def assertLowPriority(self, user_agent, expected):
+        request = RequestFactory().get('/', HTTP_USER_AGENT=user_agent)
+        self.assertIs(ratelimit.is_low_priority(request, 'page'), expected, user_agent)
+
+    def test_known_crawlers(self):
+        for user_agent in (
+            'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+            'Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)',
+            'Mozilla/5.0 (compatible; AhrefsBot/7.0; +http://ahrefs.com/robot/)',
+            'Mozilla/5.0 (compatible; Yahoo! Slurp; http://help.yahoo.com/help/us/ysearch/slurp)',
+            'curl/8.4.0',
+            'python-requests/2.31.0',
+            'Scrapy/2.11.0 (+https://scrapy.org)',
+        ):
+            self.assertLowPriority(user_agent, True)
+
+    def test_browsers(self):
+        for user_agent in (
+            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 '
+            '(KHTML, like Gecko) Version/17.0 Safari/605.1.15',
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
+            'Mozilla/5.0 (Linux; Android 14) AppleWebKit/537.36 (KHTML, like Gecko) '
+            'Chrome/120.0 Mobile Safari/537.36 PrefetchBrowser',
+            '',
+        ):
+            self.assertLowPriority(user_agent, False)
+
+
+class ClientIdTests(TestCase):
+    def client_id(self, address):
+        return ratelimit.client_id(RequestFactory().get('/', REMOTE_ADDR=address))
+
+    def test_ipv4_is_kept(self):
+        self.assertEqual(self.client_id('192.0.2.7'), '192.0.2.7')
+
+    def test_ipv6_is_limited_by_64_block(self):
+        for address in (
+            '2001:db8:1:2::1',
+            '2001:db8:1:2:aaaa:bbbb:cccc:dddd',
+            '2001:0db8:0001:0002:0000:0000:0000:0001',
+        ):
+            self.assertEqual(self.client_id(address), '2001:db8:1:2::/64', address)
+        # Compressed before the fourth group
+        self.assertEqual(self.client_id('2001:db8::1'), '2001:db8::/64')
+        self.assertEqual(self.client_id('fe80::1%eth0'), 'fe80::/64')
+
+    def test_ipv4_mapped_addresses_count_as_ipv4(self):
+        self.assertEqual(self.client_id('::ffff:192.0.2.7'), '192.0.2.7')
+
+    def test_unparseable_address_is_kept(self):
+        self.assertEqual(self.client_id('[2001:db8::1]:443'), '[2001:db8::1]:443')
+
+    @override_settings(RATE_LIMIT_CLIENT_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_forwarded_address(self):
+        request = RequestFactory().get(
+            '/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='198.51.100.1, 2001:db8:5::9'
+        )
+        self.assertEqual(ratelimit.client_id(request), '2001:db8:5::/64')
+
+
+class DatabaseBackupTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.database = sqlite3.connect(os.path.join(self.directory, 'source.sqlite3'))
+        self.addCleanup(self.database.close)
+        self.database.execute('CREATE TABLE note (body TEXT)')
+        self.database.executemany('INSERT INTO note VALUES (?)', [('x' * 1000,)] * 200)
+        self.database.commit()
+        self.backup_dir = os.path.join(self.directory, 'backups')
+
+    def test_backup_is_a_verified_copy(self):
+        report = backup.backup_database(
+            self.database, self.backup_dir, keep=3, step_pages=10, step_sleep=0
+        )
+        self.assertGreater(report['steps'], 1)
+        self.assertEqual(backup.list_backups(self.backup_dir), [report['path']])
+        copy = sqlite3.connect(report['path'])
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.execute('SELECT count(*) FROM note').fetchone()[0], 200)
+
+    def test_failed_integrity_check_keeps_nothing(self):
+        with mock.patch('bulletin.backup.integrity_errors', return_value=['page 2 is never used']):
+            with self.assertRaisesMessage(backup.BackupError, 'page 2 is never used'):
+                backup.backup_database(self.database, self.backup_dir, keep=3)
+        self.assertEqual(os.listdir(self.backup_dir), [])
+
+    def test_prune_keeps_the_newest(self):
+        os.makedirs(self.backup_dir)
+        names = [f'db-2024010{day}-000000.sqlite3' for day in range(1, 5)]
+        for name in names:
+            open(os.path.join(self.backup_dir, name), 'w').close()
+        backup.prune_backups(self.backup_dir, keep=2)
+        self.assertEqual([path.name for path in backup.list_backups(self.backup_dir)], names[2:])
+
+    def test_incremental_vacuum_returns_free_pages(self):
+        backup.enable_incremental_vacuum(self.database)
+        self.database.execute('DELETE FROM note')
+        self.database.commit()
+        report = backup.optimize_database(self.database, vacuum_pages=1000)
+        self.assertEqual(report['auto_vacuum'], 'incremental')
+        self.assertGreater(report['free_before'], 0)
+        self.assertEqual(report['free_after'], 0)
+        self.assertLess(report['bytes_after'], report['bytes_before'])
+
+    def test_vacuum_is_skipped_without_incremental_auto_vacuum(self):
+        self.database.execute('DELETE FROM note')
+        self.database.commit()
+        report = backup.optimize_database(self.database)
+        self.assertEqual(report['auto_vacuum'], 'none')
+        self.assertEqual(report['bytes_after'], report['bytes_before'])
@@ -0,0 +1,246 @@
+"""
+In-memory prefix index behind the search-as-you-type endpoint.
+
+Each worker keeps one index per city over organization names, event titles
+and venues, and news titles. Every word of a name is indexed as the start
+of a key ("green" and "kitchen" both find "The Green Kitchen"), and the keys
+live in one sorted list, so a lookup is a binary search plus a short scan
+instead of a ``LIKE`` query per keystroke.
+
+The index is tagged with the city's content version (see ``caching``).
+When a save elsewhere bumps it, the next lookup catches up incrementally:
+rows updated since the last sync are re-indexed and rows that have gone
+(deleted, unpublished, archived) are dropped. A worker's first lookup for a
+city builds the whole index.
+"""
+import bisect
+import datetime
+import heapq
+import re
+import threading
+import unicodedata
+
+from django.utils import timezone
+
+from .caching import get_content_version
+from .models import Event, News, Organization
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+# Words of a name indexed as a key start; later words only match as part of a phrase
+MAX_KEY_WORDS = 8
+# Keys examined per lookup, so one-letter queries stay as cheap as longer ones
+MAX_SCAN = 200
+# Rows saved this close to the previous sync are looked at again, in case
+# their transaction committed after it
+SYNC_OVERLAP = datetime.timedelta(seconds=60)
+
+WORD_RE = re.compile(r'\w+')
+
+# Ranking among equally good matches
+KIND_ORDER = {'organization': 0, 'event': 1, 'news': 2}
+
+
+def normalize(text):
+    """``text`` casefolded, without accents, as space-separated words."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(WORD_RE.findall(text.casefold()))
+
+
+def index_keys(text):
+    """``(position, key)`` for each word of ``text`` that starts a key."""
+    words = normalize(text).split()
+    return [
+        (position, ' '.join(words[position:])) for position in range(min(len(words), MAX_KEY_WORDS))
+    ]
+
+
+def organization_entry(organization):
+    return {
+        'type': 'organization',
+        'title': organization.name,
+        'detail': organization.get_category_display(),
+        'url': organization.website or None,
+    }, [organization.name]
+
+
+def event_entry(event):
+    return {
+        'type': 'event',
+        'title': event.title,
+        'detail': event.venue_name,
+        'url': event.get_absolute_url(),
+        'date': event.start_date.isoformat(),
+        'end_date': event.end_date,
+    }, [event.title, event.venue_name]
+
+
+def news_entry(news):
+    return {
+        'type': 'news',
+        'title': news.title,
+        'detail': news.organization.name if news.organization else '',
+        'url': news.get_absolute_url(),
+        'date': timezone.localdate(news.published_date).isoformat(),
+    }, [news.title]
+
+
+# Model -> (indexed rows, entry builder)
+SOURCES = {
+    Organization: (lambda city: Organization.objects.for_city(city), organization_entry),
+    Event: (
+        lambda city: Event.objects.for_city(city)
+        .filter(is_published=True)
+        .defer('description', 'description_html'),
+        event_entry,
+    ),
+    News: (
+        lambda city: News.objects.for_city(city)
+        .filter(is_published=True)
+        .select_related('organization')
+        .defer('content', 'content_html'),
+        news_entry,
+    ),
+}
+
+
+class PrefixIndex:
+    """
+    Sorted ``keys`` with a parallel list of ``(entry id, field, position)``
+    postings; ``entries`` maps ``(model, pk)`` to the result and its keys.
+    """
+
+    def __init__(self, city):
+        self.city = city
+        self.keys = []
+        self.postings = []
+        self.entries = {}
+        self.version = None
+        self.synced_at = None
+        self.lock = threading.Lock()
+
+    def _postings(self, entry_id, texts):
+        return [
+            (key, (entry_id, field, position))
+            for field, text in enumerate(texts)
+            if text
+            for position, key in index_keys(text)
+        ]
+
+    def build(self):
+        """Index every row from scratch."""
+        started = timezone.now()
+        entries = {}
+        pairs = []
+        for model, (rows, make_entry) in SOURCES.items():
+            for obj in rows(self.city):
+                entry, texts = make_entry(obj)
+                postings = self._postings((model, obj.pk), texts)
+                entries[(model, obj.pk)] = (entry, [key for key, _ in postings])
+                pairs.extend(postings)
+        pairs.sort(key=lambda pair: pair[0])
+        self.keys = [key for key, _ in pairs]
+        self.postings = [posting for _, posting in pairs]
+        self.entries = entries
+        self.synced_at = started
+
+    def add(self, entry_id, entry, texts):
+        self.remove(entry_id)
+        postings = self._postings(entry_id, texts)
+        for key, posting in postings:
+            i = bisect.bisect_right(self.keys, key)
+            self.keys.insert(i, key)
+            self.postings.insert(i, posting)
+        self.entries[entry_id] = (entry, [key for key, _ in postings])
+
+    def remove(self, entry_id):
+        indexed = self.entries.pop(entry_id, None)
+        if indexed is None:
+            return
+        for key in indexed[1]:
+            i = bisect.bisect_left(self.keys, key)
+            while i < len(self.keys) and self.keys[i] == key:
+                if self.postings[i][0] == entry_id:
+                    del self.keys[i], self.postings[i]
+                    break
+                i += 1
+
+    def sync(self):
+        """Re-index rows updated since the last sync and drop the ones that have gone."""
+        started = timezone.now()
+        since = self.synced_at - SYNC_OVERLAP
+        for model, (rows, make_entry) in SOURCES.items():
+            queryset = rows(self.city)
+            for obj in queryset.filter(updated_at__gte=since):
+                self.add((model, obj.pk), *make_entry(obj))
+            live = set(queryset.values_list('pk', flat=True))
+            for entry_id in [entry_id for entry_id in self.entries if entry_id[0] is model]:
+                if entry_id[1] not in live:
+                    self.remove(entry_id)
+        self.synced_at = started
+
+    def refresh(self, version):
+        if self.version == version:
+            return
+        if self.synced_at is None:
+            self.build()
+        else:
+            self.sync()
+        self.version = version
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Best ``limit`` entries with a key starting with ``query``."""
+        query = normalize(query)
+        if not query:
+            return []
+        today = timezone.localdate()
+        ranked = {}
+        start = bisect.bisect_left(self.keys, query)
+        for i in range(start, min(start + MAX_SCAN, len(self.keys))):
+            if not self.keys[i].startswith(query):
+                break
+            entry_id, field, position = self.postings[i]
+            entry = self.entries[entry_id][0]
+            if entry.get('end_date') and entry['end_date'] < today:
+                continue
+            # Matches at the start of a name first, then titles before venues,
+            # then organizations, events, news, then shorter names
+            rank = (
+                position > 0,
+                field,
+                KIND_ORDER[entry['type']],
+                len(entry['title']),
+                entry['title'],
+            )
+            if entry_id not in ranked or rank < ranked[entry_id]:
+                ranked[entry_id] = rank
+        best = heapq.nsmallest(limit, ranked, key=ranked.get)
+        return [self.entries[entry_id][0] for entry_id in best]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(city):
+    """This worker's index for ``city``, brought up to date with its content."""
+    key = city.pk if city else None
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = PrefixIndex(city)
+    with index.lock:
+        index.refresh(get_content_version())
+    return index
+
+
+def search(city, query, limit=DEFAULT_LIMIT):
+    """Ranked typeahead results for ``query`` in ``city``."""
+    index = get_index(city)
+    with index.lock:
+        results = index.search(query, max(1, min(limit, MAX_LIMIT)))
+    return [
+        {field: value for field, value in entry.items() if field != 'end_date'} for entry in results
+    ]
@@ -9,10 +9,22 @@ urlpatterns = [
 
     # News
     path('news/', views.NewsListView.as_view(), name='news_list'),
+    path('news/archive/<int:year>/', views.NewsArchiveView.as_view(), name='news_archive_year'),
+    path(
+        'news/archive/<int:year>/<int:month>/',
+        views.NewsArchiveView.as_view(),
+        name='news_archive_month',
+    ),
     path('news/<slug:slug>/', views.NewsDetailView.as_view(), name='news_detail'),
 
     # Events
     path('events/', views.EventListView.as_view(), name='event_list'),
+    path('events/archive/<int:year>/', views.EventArchiveView.as_view(), name='event_archive_year'),
+    path(
+        'events/archive/<int:year>/<int:month>/',
+        views.EventArchiveView.as_view(),
+        name='event_archive_month',
+    ),
     path('events/<slug:slug>/', views.EventDetailView.as_view(), name='event_detail'),
 
     # Specials
@@ -21,12 +33,41 @@ urlpatterns = [
 
     # Promotions
     path('promotions/', views.promotion_list, name='promotion_list'),
+    path('promotions/now/', views.happening_now, name='happening_now'),
     path('promotions/<slug:slug>/', views.PromotionDetailView.as_view(), name='promotion_detail'),
 
     # Resources
     path('resources/', views.ResourceListView.as_view(), name='resource_list'),
+    path(
+        'resources/archive/<int:year>/',
+        views.ResourceArchiveView.as_view(),
+        name='resource_archive_year',
+    ),
+    path(
+        'resources/archive/<int:year>/<int:month>/',
+        views.ResourceArchiveView.as_view(),
+        name='resource_archive_month',
+    ),
     path('resources/<slug:slug>/', views.ResourceDetailView.as_view(), name='resource_detail'),
 
+    # Timeline
+    path('feed/', views.timeline_feed, name='timeline'),
+    path('api/feed/', views.timeline_api, name='timeline_api'),
+    path('api/promotions/now/', views.happening_now_api, name='happening_now_api'),
+    path('api/typeahead/', views.typeahead_api, name='typeahead_api'),
+
+    # Crawlers
+    path('robots.txt', views.robots_txt, name='robots_txt'),
+    path('sitemap.xml', views.sitemap_index, name='sitemap_index'),
+    path('sitemap-<slug:section>.xml', views.sitemap_section, name='sitemap_section'),
+
+    # Offline support
+    path('sw.js', views.service_worker, name='service_worker'),
+    path('manifest.webmanifest', views.web_manifest, name='web_manifest'),
+
+    # Digest
+    path('unsubscribe/<uuid:token>/', views.unsubscribe, name='unsubscribe'),
+
     # About
     path('about/', views.about, name='about'),
 ]
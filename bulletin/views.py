@@ -1,88 +1,192 @@
+import datetime
+import json
+
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from django.http import Http404, HttpResponse, JsonResponse
+from django.templatetags.static import static
+from django.urls import reverse
 from django.utils import timezone
 from django.views.generic import ListView, DetailView
-from .models import News, Event, Special, Promotion, Resource, Organization
-from django.db.models import Q
+from .models import (
+    News,
+    Event,
+    Special,
+    Promotion,
+    Resource,
+    Organization,
+    Subscriber,
+    ArchivedEvent,
+    ArchivedSpecial,
+    ArchivedPromotion,
+)
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+from . import monthly, offline, schedule, timeline, typeahead
+from .cities import get_city_config
+from .caching import get_content_version
+from .surrogate import (
+    add_keys,
+    archive_key,
+    cache_closed_period,
+    list_key,
+    organization_key,
+    tag_list,
+    tag_object,
+    tag_resource_organizations,
+)
 
 
 def home(request):
     """Homepage with widgets showing recent/upcoming items from each category."""
-    today = timezone.now().date()
+    today = timezone.localdate()
+    city = request.city
 
     context = {
-        'recent_news': News.objects.filter(is_published=True)[:5],
-        'upcoming_events': Event.objects.filter(
-            is_published=True,
-            end_date__gte=today
-        ).order_by('start_date')[:5],
-        'active_specials': Special.objects.filter(
-            is_published=True,
-            start_date__lte=today,
-            end_date__gte=today
+        'recent_news': News.objects.for_city(city).filter(is_published=True)[:5],
+        'upcoming_events': Event.objects.for_city(city)
+        .filter(is_published=True, end_date__gte=today)
+        .order_by('start_date')[:5],
+        'active_specials': Special.objects.for_city(city).filter(
+            is_published=True, start_date__lte=today, end_date__gte=today
         )[:5],
-        'active_promotions': get_active_promotions(today)[:5],
-        'recent_resources': Resource.objects.filter(is_published=True)[:5],
+        'active_promotions': get_active_promotions(today, city)[:5],
+        'recent_resources': Resource.objects.for_city(city).filter(is_published=True)[:5],
     }
+    add_keys(
+        request,
+        list_key('home', city),
+        'news',
+        'event',
+        'special',
+        'promotion',
+        'resource',
+        dated=True,
+    )
     return render(request, 'bulletin/home.html', context)
 
 
-def get_active_promotions(check_date=None):
+def get_active_promotions(check_date=None, city=None):
     """Helper function to get promotions active on a given date."""
     if check_date is None:
-        check_date = timezone.now().date()
+        check_date = timezone.localdate()
 
-    promotions = Promotion.objects.filter(
-        is_published=True,
-        valid_from__lte=check_date
-    ).filter(
-        Q(valid_until__isnull=True) | Q(valid_until__gte=check_date)
+    # The recurrence check runs once per day and content version, not per request
+    pks = [pk for pk, start_time, end_time in schedule.get_day_schedule(check_date, city)]
+    promotions = (
+        Promotion.objects.select_related('organization').defer('recurrence_pattern').in_bulk(pks)
     )
+    return [promotions[pk] for pk in pks if pk in promotions]
+
+
+class SurrogateKeyMixin:
+    """Tag list and detail responses with surrogate keys for the caching proxy."""
+
+    # Lists whose contents change with the date, not just with edits
+    surrogate_dated = False
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if getattr(self, 'object', None) is not None:
+            tag_object(self.request, self.object)
+        else:
+            tag_list(self.request, self.model, dated=self.surrogate_dated)
+        return context
 
-    # Filter by recurrence pattern
-    active_promotions = []
-    for promotion in promotions:
-        if promotion.is_active_on_date(check_date):
-            active_promotions.append(promotion)
 
-    return active_promotions
+class ArchiveFallbackMixin:
+    """Detail view that falls back to ``archive_model`` for slugs moved out of the live table."""
+
+    archive_model = None
+    # Archived slugs may repeat; the most recent row wins
+    archive_latest = '-start_date'
+
+    def get_object(self, queryset=None):
+        try:
+            return super().get_object(queryset)
+        except Http404:
+            archived = (
+                self.archive_model.objects.for_city(self.request.city)
+                .filter(
+                    is_published=True,
+                    slug=self.kwargs['slug'],
+                )
+                .order_by(self.archive_latest, '-pk')
+                .first()
+            )
+            if archived is None:
+                raise
+            return archived
 
 
 # News Views
-class NewsListView(ListView):
+class NewsListView(SurrogateKeyMixin, ListView):
     model = News
     template_name = 'bulletin/news_list.html'
     context_object_name = 'news_list'
     paginate_by = 20
 
     def get_queryset(self):
-        return News.objects.filter(is_published=True)
+        return News.objects.for_city(self.request.city).filter(is_published=True)
 
 
-class NewsDetailView(DetailView):
+class NewsDetailView(SurrogateKeyMixin, DetailView):
     model = News
     template_name = 'bulletin/news_detail.html'
     context_object_name = 'news'
 
     def get_queryset(self):
-        return News.objects.filter(is_published=True)
+        return News.objects.for_city(self.request.city).filter(is_published=True)
 
 
 # Event Views
-class EventListView(ListView):
+class EventListView(SurrogateKeyMixin, ListView):
     model = Event
     template_name = 'bulletin/event_list.html'
     context_object_name = 'events'
     paginate_by = 20
 
+    # Columns the list template reads; past events come from both tables
+    list_fields = (
+        'title',
+        'slug',
+        'summary',
+        'start_date',
+        'end_date',
+        'start_time',
+        'venue_name',
+        'cost',
+        'registration_url',
+    )
+
+    @property
+    def surrogate_dated(self):
+        return not self.request.GET.get('show_past', False)
+
     def get_queryset(self):
         show_past = self.request.GET.get('show_past', False)
-        queryset = Event.objects.filter(is_published=True)
+        queryset = Event.objects.for_city(self.request.city).filter(is_published=True)
 
         if not show_past:
-            queryset = queryset.filter(end_date__gte=timezone.now().date())
+            return queryset.filter(end_date__gte=timezone.localdate())
 
-        return queryset
+        is_multiday = ExpressionWrapper(
+            Q(end_date__gt=F('start_date')), output_field=BooleanField()
+        )
+        archived = ArchivedEvent.objects.for_city(self.request.city).filter(is_published=True)
+        return (
+            queryset.order_by()
+            .values(*self.list_fields)
+            .annotate(is_multiday=is_multiday)
+            .union(
+                archived.order_by().values(*self.list_fields).annotate(is_multiday=is_multiday),
+                all=True,
+            )
+            .order_by('start_date', 'start_time')
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -90,45 +194,47 @@ class EventListView(ListView):
         return context
 
 
-class EventDetailView(DetailView):
+class EventDetailView(SurrogateKeyMixin, ArchiveFallbackMixin, DetailView):
     model = Event
+    archive_model = ArchivedEvent
     template_name = 'bulletin/event_detail.html'
     context_object_name = 'event'
 
     def get_queryset(self):
-        return Event.objects.filter(is_published=True)
+        return Event.objects.for_city(self.request.city).filter(is_published=True)
 
 
 # Special Views
-class SpecialListView(ListView):
+class SpecialListView(SurrogateKeyMixin, ListView):
     model = Special
     template_name = 'bulletin/special_list.html'
     context_object_name = 'specials'
     paginate_by = 20
+    surrogate_dated = True
 
     def get_queryset(self):
-        today = timezone.now().date()
-        return Special.objects.filter(
-            is_published=True,
-            start_date__lte=today,
-            end_date__gte=today
+        today = timezone.localdate()
+        return Special.objects.for_city(self.request.city).filter(
+            is_published=True, start_date__lte=today, end_date__gte=today
         )
 
 
-class SpecialDetailView(DetailView):
+class SpecialDetailView(SurrogateKeyMixin, ArchiveFallbackMixin, DetailView):
     model = Special
+    archive_model = ArchivedSpecial
     template_name = 'bulletin/special_detail.html'
     context_object_name = 'special'
 
     def get_queryset(self):
-        return Special.objects.filter(is_published=True)
+        return Special.objects.for_city(self.request.city).filter(is_published=True)
 
 
 # Promotion Views
 def promotion_list(request):
     """List view for promotions active today."""
-    today = timezone.now().date()
-    promotions = get_active_promotions(today)
+    today = timezone.localdate()
+    promotions = get_active_promotions(today, request.city)
+    tag_list(request, Promotion, dated=True)
 
     return render(request, 'bulletin/promotion_list.html', {
         'promotions': promotions,
@@ -136,36 +242,364 @@ def promotion_list(request):
     })
 
 
-class PromotionDetailView(DetailView):
+def happening_now(request):
+    """Promotions running right now: today's recurrence plus their time-of-day window."""
+    promotions = schedule.get_happening_now(request.city)
+    tag_list(request, Promotion, dated=True, max_age=schedule.seconds_until_next_bucket())
+    return render(
+        request,
+        'bulletin/happening_now.html',
+        {
+            'promotions': promotions,
+            'now': timezone.localtime(),
+        },
+    )
+
+
+def happening_now_api(request):
+    """JSON version of ``happening_now``."""
+    promotions = schedule.get_happening_now(request.city)
+    tag_list(request, Promotion, dated=True, max_age=schedule.seconds_until_next_bucket())
+    return JsonResponse(
+        {
+            'results': [
+                {
+                    'id': promotion.pk,
+                    'title': promotion.title,
+                    'summary': promotion.summary,
+                    'url': request.build_absolute_uri(promotion.get_absolute_url()),
+                    'organization': promotion.organization.name,
+                    'start_time': promotion.start_time.isoformat()
+                    if promotion.start_time
+                    else None,
+                    'end_time': promotion.end_time.isoformat() if promotion.end_time else None,
+                }
+                for promotion in promotions
+            ],
+            'as_of': timezone.localtime().isoformat(),
+        }
+    )
+
+
+def typeahead_api(request):
+    """Search-as-you-type over organization names, event titles and venues, and news titles."""
+    query = request.GET.get('q', '')[:100]
+    try:
+        limit = int(request.GET.get('limit', typeahead.DEFAULT_LIMIT))
+    except ValueError:
+        limit = typeahead.DEFAULT_LIMIT
+    city = request.city
+    # Organization edits purge every content list, so these two keys cover all three sources
+    add_keys(request, list_key('event', city), list_key('news', city), dated=True)
+    return JsonResponse({'query': query, 'results': typeahead.search(city, query, limit)})
+
+
+class PromotionDetailView(SurrogateKeyMixin, ArchiveFallbackMixin, DetailView):
     model = Promotion
+    archive_model = ArchivedPromotion
+    archive_latest = '-valid_from'
     template_name = 'bulletin/promotion_detail.html'
     context_object_name = 'promotion'
 
     def get_queryset(self):
-        return Promotion.objects.filter(is_published=True)
+        return Promotion.objects.for_city(self.request.city).filter(is_published=True)
 
 
 # Resource Views
-class ResourceListView(ListView):
+class ResourceListView(SurrogateKeyMixin, ListView):
     model = Resource
     template_name = 'bulletin/resource_list.html'
     context_object_name = 'resources'
     paginate_by = 20
 
     def get_queryset(self):
-        return Resource.objects.filter(is_published=True)
+        return Resource.objects.for_city(self.request.city).filter(is_published=True)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        tag_resource_organizations(self.request, context['resources'])
+        return context
 
 
-class ResourceDetailView(DetailView):
+class ResourceDetailView(SurrogateKeyMixin, DetailView):
     model = Resource
     template_name = 'bulletin/resource_detail.html'
     context_object_name = 'resource'
 
     def get_queryset(self):
-        return Resource.objects.filter(is_published=True)
+        return (
+            Resource.objects.for_city(self.request.city)
+            .filter(is_published=True)
+            .prefetch_related('organizations')
+        )
+
+
+# Date archives
+class ArchiveView(ListView):
+    """
+    One year or month of ``content_type``, selected with a range query on its
+    date column, beside the list of months from ``MonthlyCount``.
+    """
+
+    content_type = None
+    heading = None
+    item_template = None
+    template_name = 'bulletin/archive.html'
+    paginate_by = 20
+
+    def get(self, request, *args, **kwargs):
+        self.year = kwargs['year']
+        self.month = kwargs.get('month')
+        today = monthly.today(request.city)
+        if self.month is not None and not 1 <= self.month <= 12:
+            raise Http404("No such month")
+        if self.year < 1900 or (self.year, self.month or 1) > (today.year, today.month):
+            raise Http404("No archive for future dates")
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return self.get_period_queryset(self.model)
+
+    def get_period_queryset(self, model):
+        """Published ``model`` rows in the selected year or month."""
+        city = self.request.city
+        start, end = monthly.period_bounds(self.year, self.month)
+        return model.objects.for_city(city).filter(
+            is_published=True, **monthly.range_filter(model, self.content_type, city, start, end)
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        city = self.request.city
+        context.update(
+            {
+                'heading': self.heading,
+                'item_template': self.item_template,
+                'year': self.year,
+                'month': datetime.date(self.year, self.month, 1) if self.month else None,
+                'months': monthly.sidebar_months(self.content_type, city),
+                'year_url': f'bulletin:{self.content_type}_archive_year',
+                'month_url': f'bulletin:{self.content_type}_archive_month',
+            }
+        )
+
+        organizations = {
+            organization_key(item.organization_id)
+            for item in context['object_list']
+            if getattr(item, 'organization_id', None)
+        }
+        add_keys(
+            self.request,
+            archive_key(self.content_type, city),
+            archive_key(self.content_type, city, self.year, self.month),
+            *organizations,
+            dated=not monthly.is_closed(city, self.year, self.month),
+        )
+        if monthly.is_closed(city, self.year, self.month):
+            cache_closed_period(self.request)
+        return context
+
+
+class NewsArchiveView(ArchiveView):
+    model = News
+    content_type = 'news'
+    heading = 'News'
+    item_template = 'bulletin/includes/news_item.html'
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('organization', 'author')
+
+
+class EventArchiveView(ArchiveView):
+    model = Event
+    content_type = 'event'
+    heading = 'Past Events'
+    item_template = 'bulletin/includes/event_item.html'
+
+    def get_queryset(self):
+        city = self.request.city
+        fields = EventListView.list_fields
+        is_multiday = ExpressionWrapper(
+            Q(end_date__gt=F('start_date')), output_field=BooleanField()
+        )
+        querysets = [self.get_period_queryset(model) for model in (Event, ArchivedEvent)]
+        if not monthly.is_closed(city, self.year, self.month):
+            # Only the events of this month that are over
+            querysets = [
+                queryset.filter(end_date__lt=monthly.today(city)) for queryset in querysets
+            ]
+        live, archived = [
+            queryset.order_by().values(*fields).annotate(is_multiday=is_multiday)
+            for queryset in querysets
+        ]
+        return live.union(archived, all=True).order_by('start_date', 'start_time')
+
+
+class ResourceArchiveView(ArchiveView):
+    model = Resource
+    content_type = 'resource'
+    heading = 'Resources'
+    item_template = 'bulletin/includes/resource_item.html'
+
+
+# Timeline
+def _get_timeline_limit(request):
+    try:
+        limit = int(request.GET.get('limit', timeline.DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = timeline.DEFAULT_PAGE_SIZE
+    return max(1, min(limit, timeline.MAX_PAGE_SIZE))
+
+
+def timeline_feed(request):
+    """Combined "what's new" stream across all content types."""
+    try:
+        entries, next_cursor = timeline.get_page(request.city, request.GET.get('before'))
+    except ValueError:
+        entries, next_cursor = timeline.get_page(request.city)
+
+    add_keys(request, list_key('timeline', request.city))
+    return render(
+        request,
+        'bulletin/timeline.html',
+        {
+            'entries': entries,
+            'next_cursor': next_cursor,
+        },
+    )
+
+
+def timeline_api(request):
+    """JSON version of the combined feed with keyset pagination."""
+    try:
+        entries, next_cursor = timeline.get_page(
+            request.city, request.GET.get('before'), _get_timeline_limit(request)
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+
+    add_keys(request, list_key('timeline', request.city))
+    return JsonResponse(
+        {
+            'results': [
+                {
+                    'type': entry.content_type,
+                    'id': entry.object_id,
+                    'title': entry.title,
+                    'summary': entry.summary,
+                    'url': request.build_absolute_uri(entry.url),
+                    'timestamp': entry.sort_timestamp.isoformat(),
+                    'organization': entry.organization.name if entry.organization else None,
+                }
+                for entry in entries
+            ],
+            'next': next_cursor,
+        }
+    )
+
+
+# Sitemaps
+def _cached_sitemap(request, name, view, **kwargs):
+    """Serve a rendered sitemap from cache until the city's content changes."""
+    page = request.GET.get('p', '1')
+    key = f'sitemap:{name}:{page}:{request.scheme}:{request.get_host()}:{get_content_version()}'
+    cached = cache.get(key)
+    if cached is None:
+        # The sitemaps framework is only needed on a cache miss
+        from django.contrib.sitemaps import views as sitemap_views
+        from .sitemaps import SITEMAPS
+
+        response = getattr(sitemap_views, view)(request, SITEMAPS, **kwargs)
+        response.render()
+        cached = (response.content, response.get('Last-Modified'))
+        cache.set(key, cached, settings.SITEMAP_CACHE_TIMEOUT)
+
+    content, last_modified = cached
+    add_keys(request, list_key('sitemap', request.city))
+    response = HttpResponse(content, content_type='application/xml')
+    response['X-Robots-Tag'] = 'noindex, noodp, noarchive'
+    if last_modified:
+        response['Last-Modified'] = last_modified
+    return response
+
+
+def sitemap_index(request):
+    return _cached_sitemap(request, 'index', 'index', sitemap_url_name='bulletin:sitemap_section')
+
+
+def sitemap_section(request, section):
+    return _cached_sitemap(request, section, 'sitemap', section=section)
+
+
+def robots_txt(request):
+    """Point crawlers at the sitemaps instead of deep list pagination."""
+    add_keys(request, 'robots')
+    return render(request, 'robots.txt', content_type='text/plain')
+
+
+# Offline support
+def service_worker(request):
+    """The service worker, served from the root so it controls every page."""
+    response = render(
+        request,
+        'bulletin/service-worker.js',
+        {
+            'version': offline.cache_version(),
+            'precache_urls': json.dumps(offline.precache_urls()),
+            'network_only_paths': json.dumps(offline.NETWORK_ONLY_PATHS),
+            'home_url': reverse('bulletin:home'),
+            'page_limit': settings.SERVICE_WORKER_PAGE_LIMIT,
+        },
+        content_type='text/javascript',
+    )
+    # Browsers check for a new worker on navigation; no cache should delay that
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def web_manifest(request):
+    """Web app manifest, so the site can be added to a phone's home screen."""
+    city_config = get_city_config(request.city)
+    add_keys(request, 'web-manifest')
+    return JsonResponse(
+        {
+            'name': f"{city_config['CITY_NAME']} Vegan Bulletin",
+            'short_name': 'Vegan Bulletin',
+            'description': (
+                "Vegan news, events, and resources in "
+                f"{city_config['CITY_NAME']}, {city_config['CITY_STATE']}."
+            ),
+            'start_url': reverse('bulletin:home'),
+            'display': 'standalone',
+            'background_color': '#ffffff',
+            'theme_color': offline.THEME_COLOR,
+            'icons': [
+                {'src': static('bulletin/icon.svg'), 'sizes': 'any', 'type': 'image/svg+xml'}
+            ],
+        },
+        content_type='application/manifest+json',
+    )
+
+
+# Digest subscriptions
+@csrf_exempt  # One-click unsubscribe (RFC 8058) POSTs from the mail client
+@require_http_methods(['GET', 'POST'])
+def unsubscribe(request, token):
+    """
+    Stop sending the digest to the subscriber the emailed link was made for.
+    Opening the link only asks for confirmation, since mail scanners follow links.
+    """
+    subscriber = get_object_or_404(Subscriber, token=token)
+    if request.method == 'GET' and subscriber.is_active:
+        return render(request, 'bulletin/unsubscribe.html', {'subscriber': subscriber})
+    if subscriber.is_active:
+        subscriber.is_active = False
+        subscriber.save(update_fields=['is_active'])
+    return render(request, 'bulletin/unsubscribed.html', {'subscriber': subscriber})
 
 
 # About Us
 def about(request):
     """About us page."""
+    add_keys(request, 'about')
     return render(request, 'bulletin/about.html')
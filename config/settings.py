@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,15 +40,22 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.sitemaps',
     'recurrence',
     'bulletin',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'bulletin.querylog.SlowQueryMiddleware',  # Sampled slow-query log
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files efficiently
+    'bulletin.ratelimit.RateLimitMiddleware',  # Per-client limits and load shedding
+    'bulletin.middleware.AnonymousFastPathMiddleware',  # Cookie-free public pages
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'bulletin.middleware.CityMiddleware',  # Select city by host name
+    'bulletin.replicas.ReplicaMiddleware',  # Public pages read from replicas
+    'bulletin.surrogate.SurrogateKeyMiddleware',  # Tag responses for the caching proxy
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -97,6 +105,82 @@ DATABASES = {
     }
 }
 
+# Read replicas for the public pages (see bulletin/replicas.py). Set
+# READ_REPLICA_SNAPSHOTS to keep that many read-only copies of the SQLite
+# database next to it, refreshed every REPLICA_REFRESH_MINUTES by the
+# scheduler (`python manage.py refresh_replicas`); other backends can list
+# their replica aliases in READ_REPLICAS instead. A POST pins the client to
+# the primary for REPLICA_PIN_SECONDS.
+READ_REPLICA_SNAPSHOTS = config('READ_REPLICA_SNAPSHOTS', default=0, cast=int)
+for number in range(1, READ_REPLICA_SNAPSHOTS + 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': db_location.with_name(f'{db_location.stem}-replica{number}{db_location.suffix}'),
+        'OPTIONS': {'init_command': 'PRAGMA query_only=ON'},
+        'TEST': {'MIRROR': 'default'},
+    }
+READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['bulletin.replicas.ReplicaRouter']
+REPLICA_REFRESH_MINUTES = config('REPLICA_REFRESH_MINUTES', default=5, cast=int)
+REPLICA_MAX_LAG_SECONDS = config('REPLICA_MAX_LAG_SECONDS', default=5, cast=int)
+REPLICA_PIN_COOKIE = config('REPLICA_PIN_COOKIE', default='vb_primary')
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=30, cast=int)
+
+
+# Online backups and maintenance (`python manage.py db_maintenance`, run
+# nightly by the scheduler): backups are copied DB_BACKUP_STEP_PAGES pages
+# at a time, pausing DB_BACKUP_STEP_SLEEP seconds between steps, and the
+# newest DB_BACKUP_KEEP are kept. Each run frees up to DB_VACUUM_PAGES unused
+# pages (0 frees all) once incremental vacuum is enabled.
+DB_BACKUP_DIR = config('DB_BACKUP_DIR', default=str(db_location.parent / 'backups'))
+DB_BACKUP_KEEP = config('DB_BACKUP_KEEP', default=7, cast=int)
+DB_BACKUP_STEP_PAGES = config('DB_BACKUP_STEP_PAGES', default=1024, cast=int)
+DB_BACKUP_STEP_SLEEP = config('DB_BACKUP_STEP_SLEEP', default=0.01, cast=float)
+DB_VACUUM_PAGES = config('DB_VACUUM_PAGES', default=0, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Keys are namespaced per city (see bulletin.cities.make_cache_key). The
+# 'shared' cache is visible to every gunicorn worker and holds small
+# coordination values such as content versions.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='vegan-bulletin'),
+        'KEY_FUNCTION': 'bulletin.cities.make_cache_key',
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=1000, cast=int),
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config(
+            'SHARED_CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'vegan-bulletin-cache')
+        ),
+        'KEY_FUNCTION': 'bulletin.cities.make_cache_key',
+        # Coordination values are kept until replaced; culling starts well
+        # beyond the few entries per city and day that live here
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('SHARED_CACHE_MAX_ENTRIES', default=5000, cast=int),
+        },
+    },
+}
+
+# Admin: autocomplete widgets and estimated changelist counts for large tables
+ADMIN_SCALABLE_MODE = config('ADMIN_SCALABLE_MODE', default=True, cast=bool)
+# Unfiltered changelists use the planner's estimate above this many rows
+ADMIN_ESTIMATED_COUNT_THRESHOLD = config('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=10000, cast=int)
+# Filtered changelists stop counting after this many matches
+ADMIN_COUNT_LIMIT = config('ADMIN_COUNT_LIMIT', default=10000, cast=int)
+# In multi-city mode, large tables count one city's rows at most this often
+ADMIN_TENANT_COUNT_SECONDS = config('ADMIN_TENANT_COUNT_SECONDS', default=300, cast=int)
+
+# Rendered sitemaps are also invalidated whenever content changes
+SITEMAP_CACHE_TIMEOUT = config('SITEMAP_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -141,15 +225,55 @@ if os.path.exists(BASE_DIR / 'static') and os.listdir(BASE_DIR / 'static'):
 
 # WhiteNoise configuration for efficient static file serving
 STORAGES = {
+    # Uploads are stored once per unique content and served with immutable cache headers
+    "default": {
+        "BACKEND": "bulletin.storage.ContentAddressedStorage",
+    },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
 }
 
+# Third-party stylesheets every page loads
+SITE_STYLESHEETS = [
+    # Bulma
+    'https://cdn.jsdelivr.net/npm/bulma@0.9.4/css/bulma.min.css',
+    # Font Awesome icons
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+]
+
+# Offline support: the service worker at /sw.js precaches SITE_STYLESHEETS and
+# the collected static files matching these patterns (by their hashed names in
+# staticfiles.json), and keeps up to SERVICE_WORKER_PAGE_LIMIT pages for
+# stale-while-revalidate navigation. Pages only register the worker when
+# SERVICE_WORKER is on (off in development, where static files aren't hashed).
+SERVICE_WORKER = config('SERVICE_WORKER', default=not DEBUG, cast=bool)
+SERVICE_WORKER_PRECACHE = config('SERVICE_WORKER_PRECACHE', default='bulletin/*').split(',')
+SERVICE_WORKER_PAGE_LIMIT = config('SERVICE_WORKER_PAGE_LIMIT', default=50, cast=int)
+
 # Media files (User uploaded content)
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Serve MEDIA_URL from the app (with sendfile, byte ranges and conditional
+# requests). Turn off when nginx or a CDN serves the media directory instead.
+SERVE_MEDIA = config('SERVE_MEDIA', default=True, cast=bool)
+# Uploads are streamed to a temporary file instead of being held in memory
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+
+# Image uploads (see bulletin/images.py): larger files or images are rejected
+# by the admin form. Stored copies are scaled to fit IMAGE_MAX_DIMENSION; no
+# bitmap bigger than IMAGE_MAX_DECODE_PIXELS is decoded (JPEGs are decoded at
+# a reduced scale, so e.g. a 60-megapixel photo is accepted).
+IMAGE_MAX_UPLOAD_BYTES = config('IMAGE_MAX_UPLOAD_BYTES', default=25 * 1024 * 1024, cast=int)
+IMAGE_MAX_PIXELS = config('IMAGE_MAX_PIXELS', default=100_000_000, cast=int)
+IMAGE_MAX_DECODE_PIXELS = config('IMAGE_MAX_DECODE_PIXELS', default=12_000_000, cast=int)
+IMAGE_MAX_DIMENSION = config('IMAGE_MAX_DIMENSION', default=1600, cast=int)
+
+# How many media files' stat() results each worker remembers, and for how long
+MEDIA_STAT_CACHE_SIZE = config('MEDIA_STAT_CACHE_SIZE', default=1024, cast=int)
+MEDIA_STAT_CACHE_SECONDS = config('MEDIA_STAT_CACHE_SECONDS', default=60, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -159,3 +283,158 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CITY_NAME = config('CITY_NAME', default='Chicago')
 CITY_STATE = config('CITY_STATE', default='IL')
 CONTACT_EMAIL = config('CONTACT_EMAIL', default='chicagoveganbulletin@gmail.com')
+
+# Multi-city deployments: add City rows in the admin (each with its own host
+# name) and list every host in ALLOWED_HOSTS. The CITY_* settings above are
+# used when no City matches the request.
+CITY_HOST_CACHE_SECONDS = config('CITY_HOST_CACHE_SECONDS', default=60, cast=int)
+
+# Archival: past events, ended specials and expired promotions move to the
+# archive tables this many days after they end
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=7, cast=int)
+
+# Set (not HttpOnly, no secret) on admin pages for staff so public pages can
+# show the Admin link client-side without reading the session
+STAFF_HINT_COOKIE = config('STAFF_HINT_COOKIE', default='vb_staff')
+
+# Compiled promotion recurrence rules kept per worker process
+RECURRENCE_CACHE_SIZE = config('RECURRENCE_CACHE_SIZE', default=256, cast=int)
+
+# "Happening now" promotions are recomputed at most once per bucket of this many minutes
+HAPPENING_NOW_BUCKET_MINUTES = config('HAPPENING_NOW_BUCKET_MINUTES', default=1, cast=int)
+
+# Shared date-dependent results (promotion schedules) are recomputed by one
+# worker at a time, which holds a lease for up to STAMPEDE_LEASE_SECONDS.
+# The others serve the previous result, on pages the proxy keeps for at most
+# STAMPEDE_STALE_MAX_AGE, or with none wait up to STAMPEDE_WAIT_SECONDS.
+# `warm_caches` builds each city's next day within PREWARM_LEAD_MINUTES of
+# its midnight.
+STAMPEDE_LEASE_SECONDS = config('STAMPEDE_LEASE_SECONDS', default=30, cast=int)
+STAMPEDE_WAIT_SECONDS = config('STAMPEDE_WAIT_SECONDS', default=5, cast=float)
+STAMPEDE_STALE_MAX_AGE = config('STAMPEDE_STALE_MAX_AGE', default=10, cast=int)
+PREWARM_LEAD_MINUTES = config('PREWARM_LEAD_MINUTES', default=20, cast=int)
+
+# Caching reverse proxy (Varnish with xkey, Fastly, ...) in front of the site.
+# Public responses are tagged with SURROGATE_KEY_HEADER and cached by the
+# proxy for SURROGATE_CACHE_SECONDS; edits send a CACHE_PURGE_METHOD request
+# with the affected keys to CACHE_PURGE_URL (leave empty to disable purging).
+SURROGATE_KEY_HEADER = config('SURROGATE_KEY_HEADER', default='Surrogate-Key')
+SURROGATE_CACHE_SECONDS = config('SURROGATE_CACHE_SECONDS', default=60 * 60 * 24, cast=int)
+# Archive pages for months that have ended only change through edits (which
+# purge them), so the proxy may keep them much longer
+ARCHIVE_CACHE_SECONDS = config('ARCHIVE_CACHE_SECONDS', default=60 * 60 * 24 * 365, cast=int)
+# Lists that expire at midnight may be served this long past it while the
+# proxy fetches a fresh copy, so the rollover doesn't send every miss at once
+SURROGATE_STALE_SECONDS = config('SURROGATE_STALE_SECONDS', default=60, cast=int)
+CACHE_PURGE_URL = config('CACHE_PURGE_URL', default='')
+CACHE_PURGE_METHOD = config('CACHE_PURGE_METHOD', default='PURGE')
+CACHE_PURGE_TIMEOUT = config('CACHE_PURGE_TIMEOUT', default=2, cast=float)
+
+# Slow-query log: on SLOW_QUERY_SAMPLE_RATE of requests (0 disables, 1 logs
+# every request) statements taking at least SLOW_QUERY_MS are written with
+# their EXPLAIN output to SLOW_QUERY_LOG, rotated at SLOW_QUERY_LOG_MAX_BYTES.
+# Summarize with `python manage.py slow_queries`.
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=200, cast=float)
+SLOW_QUERY_SAMPLE_RATE = config('SLOW_QUERY_SAMPLE_RATE', default=0.05, cast=float)
+SLOW_QUERY_LOG = config('SLOW_QUERY_LOG', default=str(db_location.parent / 'slow_queries.log'))
+SLOW_QUERY_LOG_MAX_BYTES = config('SLOW_QUERY_LOG_MAX_BYTES', default=5 * 1024 * 1024, cast=int)
+SLOW_QUERY_LOG_BACKUPS = config('SLOW_QUERY_LOG_BACKUPS', default=3, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': SLOW_QUERY_LOG_MAX_BYTES,
+            'backupCount': SLOW_QUERY_LOG_BACKUPS,
+            'formatter': 'message',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'bulletin.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Rate limiting (bulletin.ratelimit): each client gets a token bucket per
+# route class, refilled at the first number (requests per minute) up to the
+# second (burst). 'deep' is pagination past page 1 and past-event listings.
+# Buckets are shared by the workers through the SQLite file RATE_LIMIT_STORE.
+# Behind a proxy, set RATE_LIMIT_CLIENT_HEADER to the META key holding the
+# client address (e.g. HTTP_X_FORWARDED_FOR). `python manage.py rate_limits`
+# shows how many requests were throttled and shed.
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMITS = {
+    'page': (config('RATE_LIMIT_PAGE_PER_MINUTE', default=120, cast=int), 60),
+    'deep': (config('RATE_LIMIT_DEEP_PER_MINUTE', default=20, cast=int), 10),
+    'api': (config('RATE_LIMIT_API_PER_MINUTE', default=60, cast=int), 30),
+}
+RATE_LIMIT_STORE = config(
+    'RATE_LIMIT_STORE',
+    default=os.path.join(tempfile.gettempdir(), 'vegan-bulletin-ratelimit.sqlite3'),
+)
+RATE_LIMIT_STORE_TIMEOUT = config('RATE_LIMIT_STORE_TIMEOUT', default=0.1, cast=float)
+RATE_LIMIT_CLIENT_HEADER = config('RATE_LIMIT_CLIENT_HEADER', default='')
+RATE_LIMIT_PRUNE_SECONDS = 60
+# Seconds after which a request still marked in flight is assumed to be from a killed worker
+RATE_LIMIT_INFLIGHT_TIMEOUT = 120
+
+# Load shedding: low-priority requests ('deep' ones and known crawlers) get
+# a 503 while at least LOAD_SHED_INFLIGHT other requests are in flight or
+# after waiting LOAD_SHED_QUEUE_MS in the proxy's queue (from
+# X-Request-Start); every request does after LOAD_SHED_ALL_QUEUE_MS. 0
+# disables a queue threshold. Requests in flight are counted across all
+# workers on the host, so the default is every other request slot busy:
+# WEB_CONCURRENCY workers times GUNICORN_THREADS threads (both passed to
+# gunicorn by docker-entrypoint.sh), less one.
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=3, cast=int)
+GUNICORN_THREADS = config('GUNICORN_THREADS', default=1, cast=int)
+LOAD_SHED_INFLIGHT = config(
+    'LOAD_SHED_INFLIGHT', default=max(WEB_CONCURRENCY * GUNICORN_THREADS - 1, 1), cast=int
+)
+LOAD_SHED_QUEUE_MS = config('LOAD_SHED_QUEUE_MS', default=500, cast=int)
+LOAD_SHED_ALL_QUEUE_MS = config('LOAD_SHED_ALL_QUEUE_MS', default=10_000, cast=int)
+LOAD_SHED_RETRY_AFTER = config('LOAD_SHED_RETRY_AFTER', default=30, cast=int)
+
+# Event feed importer (`python manage.py import_feeds`)
+IMPORT_CONCURRENCY = config('IMPORT_CONCURRENCY', default=8, cast=int)
+IMPORT_TIMEOUT = config('IMPORT_TIMEOUT', default=20, cast=int)
+IMPORT_MAX_BYTES = config('IMPORT_MAX_BYTES', default=5 * 1024 * 1024, cast=int)
+
+# Email (weekly digest). Point EMAIL_HOST/EMAIL_PORT at a local SMTP
+# stand-in such as `python -m aiosmtpd -n -l localhost:1025` to try it out.
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=30, cast=int)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default=CONTACT_EMAIL)
+
+# Base URL for links in emails when no City is configured (cities use their
+# domain with this URL's scheme)
+SITE_URL = config('SITE_URL', default='http://localhost:8000')
+
+# Periodic jobs run by `python manage.py run_scheduler` (started by
+# docker-entrypoint.sh unless RUN_SCHEDULER=False). Each job runs a
+# management command either daily `at` "HH:MM" in TIME_ZONE (optionally on
+# one `weekday`, Monday=0) or `every` N minutes.
+SCHEDULED_JOBS = [
+    {'command': 'archive_expired', 'at': '03:30'},
+    {'command': 'db_maintenance', 'at': '04:00'},
+    {'command': 'send_digest', 'at': '08:00', 'weekday': 0},
+    {'command': 'import_feeds', 'every': 60},
+    {'command': 'warm_caches', 'every': 15},
+]
+if READ_REPLICA_SNAPSHOTS:
+    SCHEDULED_JOBS.append({'command': 'refresh_replicas', 'every': REPLICA_REFRESH_MINUTES})
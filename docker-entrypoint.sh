@@ -7,10 +7,16 @@ python manage.py migrate --noinput
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
+if [ "${RUN_SCHEDULER:-True}" = "True" ]; then
+    echo "Starting background job scheduler..."
+    python manage.py run_scheduler &
+fi
+
 echo "Starting Gunicorn server..."
 gunicorn config.wsgi:application \
     --bind 0.0.0.0:8000 \
-    --workers 3 \
+    --workers "${WEB_CONCURRENCY:-3}" \
+    --threads "${GUNICORN_THREADS:-1}" \
     --timeout 120 \
     --access-logfile - \
     --error-logfile - \
@@ -0,0 +1,87 @@
+// Service worker, rendered by bulletin.views.service_worker (see bulletin/offline.py).
+// Stylesheets, fonts and static files are served from the cache once fetched;
+// pages are served from the cache while a fresh copy is fetched for next time.
+const VERSION = '{{ version }}';
+const STATIC_CACHE = `static-${VERSION}`;
+const PAGE_CACHE = `pages-${VERSION}`;
+const PRECACHE_URLS = {{ precache_urls|safe }};
+const NETWORK_ONLY_PATHS = {{ network_only_paths|safe }};
+const HOME_URL = '{{ home_url|escapejs }}';
+const PAGE_LIMIT = {{ page_limit }};
+
+const precached = new Set(PRECACHE_URLS.map(url => new URL(url, self.location).href));
+// Fonts and images the stylesheets load come from the same (versioned) CDN paths
+const stylesheetOrigins = new Set(
+    PRECACHE_URLS.map(url => new URL(url, self.location).origin).filter(origin => origin !== self.location.origin)
+);
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(STATIC_CACHE)
+            .then(cache => cache.addAll(PRECACHE_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    // Drop the caches of earlier versions
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(
+                names.filter(name => name !== STATIC_CACHE && name !== PAGE_CACHE).map(name => caches.delete(name))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+
+    if (request.mode === 'navigate') {
+        if (url.origin === self.location.origin && !NETWORK_ONLY_PATHS.some(path => url.pathname.startsWith(path))) {
+            event.respondWith(staleWhileRevalidate(event));
+        }
+    } else if (precached.has(url.href) || stylesheetOrigins.has(url.origin)) {
+        event.respondWith(cacheFirst(request));
+    }
+});
+
+function cacheFirst(request) {
+    return caches.match(request, {cacheName: STATIC_CACHE}).then(cached => cached || fetch(request).then(response => {
+        if (response.ok) {
+            const copy = response.clone();
+            caches.open(STATIC_CACHE).then(cache => cache.put(request, copy));
+        }
+        return response;
+    }));
+}
+
+function staleWhileRevalidate(event) {
+    const request = event.request;
+    const fetched = fetch(request);
+    // Registered before the page reads the response, so the clone comes first
+    event.waitUntil(fetched.then(response => {
+        if (!response.ok || response.type !== 'basic' || response.redirected) {
+            return;
+        }
+        const copy = response.clone();
+        return caches.open(PAGE_CACHE)
+            .then(cache => cache.put(request, copy).then(() => trimPages(cache)));
+    }).catch(() => {}));
+
+    return caches.match(request, {cacheName: PAGE_CACHE}).then(cached => cached || fetched.catch(
+        // Offline and never visited: the home page is better than an error
+        () => caches.match(HOME_URL, {cacheName: PAGE_CACHE}).then(home => home || Response.error())
+    ));
+}
+
+function trimPages(cache) {
+    // Keys are in insertion order, and re-caching a page moves it to the end
+    return cache.keys().then(keys => Promise.all(
+        keys.slice(0, Math.max(keys.length - PAGE_LIMIT, 0)).map(key => cache.delete(key))
+    ));
+}